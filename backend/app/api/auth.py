@@ -1,42 +1,41 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from datetime import timedelta, datetime
-from jose import JWTError, jwt
 from app.core.database import get_db
+from app.core.security import create_access_token
 from app.models.user import User
 from app.utils.hashing import Hash
+from app.core.crypto_utils import KeyManager
 
 router = APIRouter(tags=["Authentication"])
 
-SECRET_KEY = "super-secret-fixed-key-change-this-in-production"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7 # 7 Days
+# DB helpers: the auth routes are async (bcrypt is awaited in the crypto pool),
+# so their blocking session calls are pushed to the threadpool.
+def _find_user(db: Session, email: str):
+    return db.query(User).filter(User.email == email).first()
 
-def create_access_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+def _save_user(db: Session, user: User):
+    db.add(user)
+    db.commit()
+    db.refresh(user)
 
 # 1. REGISTER
 @router.post("/register")
-def register(user_data: dict, db: Session = Depends(get_db)):
+async def register(user_data: dict, db: Session = Depends(get_db)):
     # Check if user exists
-    user = db.query(User).filter(User.email == user_data["email"]).first()
+    user = await run_in_threadpool(_find_user, db, user_data["email"])
     if user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
     new_user = User(
         email=user_data["email"],
-        hashed_password=Hash.bcrypt(user_data["password"]),
-        full_name=user_data.get("full_name", "User")
+        hashed_password=await Hash.abcrypt(user_data["password"]),
+        full_name=user_data.get("full_name", "User"),
+        wrapped_master_key=KeyManager.create_master_key()
     )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await run_in_threadpool(_save_user, db, new_user)
     
     # Auto-login after register
     access_token = create_access_token(data={"sub": new_user.email})
@@ -44,13 +43,13 @@ def register(user_data: dict, db: Session = Depends(get_db)):
 
 # 2. LOGIN
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await run_in_threadpool(_find_user, db, form_data.username)
     
     if not user:
         raise HTTPException(status_code=404, detail="Invalid Credentials")
     
-    if not Hash.verify(form_data.password, user.hashed_password):
+    if not await Hash.averify(form_data.password, user.hashed_password):
         raise HTTPException(status_code=404, detail="Incorrect Password")
     
     access_token = create_access_token(data={"sub": user.email})
@@ -1,40 +1,44 @@
-from typing import Generator, Optional
+import time
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
-from app.core.database import SessionLocal
+from app.core.database import get_db
 from app.models.user import User
-
-# --- CONFIGURATION (MUST MATCH auth.py EXACTLY) ---
-SECRET_KEY = "super-secret-fixed-key-change-this-in-production"
-ALGORITHM = "HS256"
+from app.core.principal_cache import Principal, principal_cache
+from app.core.security import ALGORITHM, SECRET_KEY
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_db() -> Generator:
-    try:
-        db = SessionLocal()
-        yield db
-    finally:
-        db.close()
-
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Sync on purpose: FastAPI runs it in the threadpool, so the DB lookup never blocks the event loop
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        # Decode the token using the SAME key used to sign it
+        # Decode the token using the SAME key used to sign it (always: signature + expiry)
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-        
-    user = db.query(User).filter(User.email == username).first()
+
+    # Only the DB lookup is cached, never longer than the token itself lives
+    cache_key = (username, payload.get("jti"))
+    principal = principal_cache.get(cache_key)
+    if principal is not None:
+        return principal
+
+    user = db.query(User.id, User.email, User.full_name, User.dedup_enabled).filter(User.email == username).first()
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    principal = Principal(user.id, user.email, user.full_name, user.dedup_enabled)
+    if "exp" in payload:
+        principal_cache.put(cache_key, principal, ttl=payload["exp"] - time.time())
+    else:
+        principal_cache.put(cache_key, principal)
+    return principal
@@ -1,13 +1,22 @@
 import os
-from typing import Optional
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Response, Form
+from typing import List, Optional
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request, Response, Form, Body
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.api import deps
-from app.models.user import File as FileModel
-from app.core.crypto_utils import CryptoUtils
-from app.services.encryption import FileEncryptor
-from app.services.s3 import S3Service
+from app.models.user import File as FileModel, User
+from app.core.admission import admission
+from app.core.crypto_utils import KeyManager
+from app.services.downloads import download_cost, file_etag, stream_download
+from app.services.http_cache import conditional_listing, etag_matches, not_modified
+from app.services.transfer import working_set
+from app.services.usage import UsageService
+from app.services.trash import TrashService
+from app.services.bulk import BulkService, UPLOAD_BATCH_MAX_FILES, ZIP_COLUMNS
+from app.services.listing import ListingService, check_sort, DEFAULT_PAGE_SIZE
+from app.schemas.file import FilePage
 
 router = APIRouter(tags=["Files"])
 
@@ -19,80 +28,80 @@ async def upload_file(
     current_user = Depends(deps.get_current_user),
     db: Session = Depends(get_db)
 ):
-    # A. Read and Encrypt
-    file_bytes = await file.read()
-    
-    salt = CryptoUtils.generate_salt()
-    file_key = CryptoUtils.derive_key(str(current_user.id), salt)
-    
-    encryptor = FileEncryptor(file_key)
-    encrypted_data, nonce = encryptor.encrypt(file_bytes)
-    
-    # B. S3 Upload
-    safe_filename = f"enc_{CryptoUtils.encode_salt(salt)[:8]}_{file.filename}"
-    S3Service.upload_file(encrypted_data, safe_filename)
-    
-    # C. Calculate Size
-    size_mb = len(file_bytes) / (1024 * 1024)
-    size_str = f"{size_mb:.2f} MB" if size_mb > 1 else f"{len(file_bytes)/1024:.2f} KB"
-
-    # D. Save Metadata
-    new_file = FileModel(
-        filename=file.filename,
-        file_type=file.filename.split('.')[-1] if '.' in file.filename else "unknown",
-        size=size_str,
-        encryption_key=file_key.hex(),
-        nonce=nonce.hex(),
-        storage_path=safe_filename,
-        owner_id=current_user.id,
-        folder_id=folder_id 
-    )
-    
-    db.add(new_file)
-    db.commit()
-    db.refresh(new_file)
-    
+    # Key, (dedup), (compression), encryption and storage: see BulkService.stage_uploads
+    with await admission.admit(current_user.id, BulkService.upload_cost([file])):
+        [(new_file, deduplicated)] = await BulkService.stage_uploads(db, current_user, [file], folder_id)
+        await run_in_threadpool(db.commit) # blocking Session work stays off the event loop
+    await run_in_threadpool(db.refresh, new_file)
+
+    if deduplicated:
+        return {"message": "File uploaded", "file_id": new_file.id, "deduplicated": True}
     return {"message": "File uploaded", "file_id": new_file.id}
 
+# 1b. UPLOAD MANY (one commit for the whole batch)
+@router.post("/upload/batch")
+async def upload_files(
+    files: List[UploadFile] = File(...),
+    folder_id: Optional[int] = Form(None),
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    if len(files) > UPLOAD_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {UPLOAD_BATCH_MAX_FILES} files per batch")
+
+    with await admission.admit(current_user.id, BulkService.upload_cost(files)):
+        staged = await BulkService.stage_uploads(db, current_user, files, folder_id)
+        await run_in_threadpool(db.commit)
+
+    file_ids = await run_in_threadpool(lambda: [new_file.id for new_file, _ in staged]) # ids reload after commit
+    return {"message": f"{len(staged)} files uploaded", "file_ids": file_ids}
+
 # 2. LIST FILES
-@router.get("/files")
-def get_my_files(current_user = Depends(deps.get_current_user), db: Session = Depends(get_db)):
-    return current_user.files
+@router.get("/files", response_model=FilePage)
+def get_my_files(
+    request: Request,
+    response: Response,
+    sort: str = "date", # name | date | size
+    order: str = "desc",
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None, # next_cursor of the previous page
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    check_sort(sort, order, limit)
+    # Nothing changed since the client's copy: 304 before the listing query
+    unchanged = conditional_listing(request, response, db, current_user.id)
+    if unchanged:
+        return unchanged
+    items, next_cursor = ListingService.files(db, current_user.id, sort, order, limit, cursor)
+    return {"items": items, "next_cursor": next_cursor}
 
 # 3. DOWNLOAD
 @router.get("/files/{file_id}/download")
 def download_file(
     file_id: int,
+    request: Request,
     current_user = Depends(deps.get_current_user),
     db: Session = Depends(get_db)
 ):
     file_record = db.query(FileModel).filter(
         FileModel.id == file_id, 
-        FileModel.owner_id == current_user.id
+        FileModel.owner_id == current_user.id,
+        FileModel.deleted_at.is_(None)
     ).first()
     
     if not file_record:
         raise HTTPException(status_code=404, detail="File not found")
 
-    try:
-        encrypted_data = S3Service.download_file(file_record.storage_path)
-    except:
-        raise HTTPException(status_code=404, detail="File missing from Cloud Storage")
-
-    try:
-        key_bytes = bytes.fromhex(file_record.encryption_key)
-        nonce_bytes = bytes.fromhex(file_record.nonce)
-        
-        encryptor = FileEncryptor(key_bytes)
-        decrypted_data = encryptor.decrypt(encrypted_data, nonce_bytes)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Decryption failed")
-
-    return Response(
-        content=decrypted_data,
-        media_type="application/octet-stream",
-        headers={"Content-Disposition": f"attachment; filename={file_record.filename}"}
-    )
+    # The client's copy is current: no key unwrap, storage fetch or decryption
+    etag = file_etag(file_record)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    # Held until the body is sent; 429 / 503 + Retry-After when saturated
+    with admission.admit_sync(current_user.id, download_cost(file_record)) as ticket:
+        key_bytes = KeyManager.file_key(db, file_record)
+        return ticket.until_sent(stream_download(request, file_record, key_bytes))
 
 # 4. DELETE
 @router.delete("/files/{file_id}")
@@ -101,69 +110,93 @@ def delete_file(
     current_user = Depends(deps.get_current_user),
     db: Session = Depends(get_db)
 ):
-    file_record = db.query(FileModel).filter(
-        FileModel.id == file_id, 
-        FileModel.owner_id == current_user.id
-    ).first()
-    
-    if not file_record:
+    # Trash only: no storage call in the request; the purger deletes the object later
+    if not TrashService.trash(db, current_user.id, FileModel.id == file_id):
         raise HTTPException(status_code=404, detail="File not found")
-
-    S3Service.delete_file(file_record.storage_path)
-
-    db.delete(file_record)
     db.commit()
-
-    return {"message": "File deleted securely from Cloud"}
+    return {"message": "File moved to trash"}
 
 # 5. STORAGE STATS (NEW)
 @router.get("/files/stats")
-def get_storage_stats(current_user = Depends(deps.get_current_user), db: Session = Depends(get_db)):
-    files = current_user.files
-    total_bytes = 0.0
-    
-    # Categories
-    type_sizes = {"Images": 0.0, "Documents": 0.0, "Videos": 0.0, "Audio": 0.0, "Others": 0.0}
-    
-    # Definition of types
-    cat_map = {
-        "Images": ['jpg', 'jpeg', 'png', 'gif', 'svg', 'webp'],
-        "Documents": ['pdf', 'doc', 'docx', 'txt', 'xls', 'xlsx', 'ppt', 'pptx'],
-        "Videos": ['mp4', 'mov', 'avi', 'mkv', 'webm'],
-        "Audio": ['mp3', 'wav', 'aac', 'ogg']
-    }
+def get_storage_stats(
+    request: Request,
+    response: Response,
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    unchanged = conditional_listing(request, response, db, current_user.id)
+    if unchanged:
+        return unchanged
 
-    for f in files:
-        # 1. Parse Size String (e.g. "5.20 MB" -> 5452595 bytes)
-        try:
-            val_str, unit = f.size.split()
-            val = float(val_str)
-            if unit.upper() == "KB": val *= 1024
-            elif unit.upper() == "MB": val *= (1024 * 1024)
-            elif unit.upper() == "GB": val *= (1024 * 1024 * 1024)
-        except:
-            val = 0
-            
-        total_bytes += val
-        
-        # 2. Categorize
-        ext = f.filename.split('.')[-1].lower() if '.' in f.filename else "unknown"
-        category = "Others"
-        for cat, exts in cat_map.items():
-            if ext in exts:
-                category = cat
-                break
-        
-        type_sizes[category] += val
+    # Reads the per-category totals maintained on upload/delete: no file rows touched
+    by_category = UsageService.summary(db, current_user.id)
+    total_bytes = sum(c["bytes"] for c in by_category.values())
+    stored_bytes = sum(c["stored_bytes"] for c in by_category.values())
+    file_count = sum(c["count"] for c in by_category.values())
 
     # Format for Frontend (Convert back to MB)
     chart_data = []
-    for k, v in type_sizes.items():
-        if v > 0:
-            chart_data.append({"name": k, "value": round(v / (1024 * 1024), 2)}) # in MB
+    for k, v in by_category.items():
+        if v["bytes"] > 0:
+            chart_data.append({"name": k, "value": round(v["bytes"] / (1024 * 1024), 2)}) # in MB
 
     return {
         "total_used_mb": round(total_bytes / (1024 * 1024), 2),
-        "file_count": len(files),
-        "chart_data": chart_data
-    }
\ No newline at end of file
+        "total_bytes": total_bytes,
+        # Compression: bytes actually stored, and so read back from storage per full download
+        "stored_bytes": stored_bytes,
+        "saved_bytes": total_bytes - stored_bytes,
+        "compression_ratio": round(stored_bytes / total_bytes, 4) if total_bytes else 1.0,
+        "file_count": file_count,
+        "chart_data": chart_data,
+        "categories": by_category
+    }
+
+# 6. DEDUP SETTING (opt-in, per user)
+@router.put("/files/dedup")
+def set_dedup(
+    data: dict = Body(...), # Expects { "enabled": true }
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    user = db.query(User).filter(User.id == current_user.id).first()
+    user.dedup_enabled = bool(data.get("enabled"))
+    db.commit() # ORM update: cached principals of this user are dropped
+    return {"dedup_enabled": user.dedup_enabled}
+
+# 7. DELETE MANY
+@router.post("/files/batch-delete")
+def delete_files(
+    data: dict = Body(...), # Expects { "file_ids": [1, 2, 3] }
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    file_ids = [int(i) for i in data.get("file_ids") or []]
+    if not file_ids:
+        raise HTTPException(status_code=400, detail="file_ids required")
+
+    trashed = TrashService.trash(db, current_user.id, FileModel.id.in_(file_ids))
+    db.commit()
+    return {"message": "Files moved to trash", "trashed": trashed}
+
+# 8. DOWNLOAD MANY (ZIP, streamed)
+@router.post("/files/zip")
+def download_zip(
+    data: dict = Body(...), # Expects { "file_ids": [1, 2, 3] }
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    file_ids = [int(i) for i in data.get("file_ids") or []]
+    rows = db.query(*ZIP_COLUMNS).filter(
+        FileModel.owner_id == current_user.id, FileModel.id.in_(file_ids), FileModel.deleted_at.is_(None)
+    ).order_by(FileModel.id).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    with admission.admit_sync(current_user.id, working_set(None)) as ticket: # one file streams at a time
+        entries = BulkService.zip_entries(db, current_user.id, rows)
+        return ticket.until_sent(StreamingResponse(
+            BulkService.zip_stream(entries),
+            media_type="application/zip",
+            headers={"Content-Disposition": "attachment; filename=files.zip"}
+        ))
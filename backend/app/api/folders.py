@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Body
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.api import deps
-from app.models.user import Folder, File as FileModel
+from app.core.admission import admission
+from fastapi.responses import StreamingResponse
+from app.services.folder_tree import FolderTree
+from app.services.bulk import BulkService
+from app.services.transfer import working_set
+from app.services.http_cache import conditional_listing
+from app.services.listing import ListingService, check_sort, DEFAULT_PAGE_SIZE
+from app.schemas.file import FolderContent
 
 router = APIRouter(tags=["Folders"])
 
@@ -19,38 +27,101 @@ def create_folder(
     if not name:
         raise HTTPException(status_code=400, detail="Folder name required")
 
-    new_folder = Folder(
-        name=name,
-        parent_id=parent_id,
-        owner_id=current_user.id
-    )
-    db.add(new_folder)
-    db.commit()
-    db.refresh(new_folder)
-    
-    return new_folder
+    return FolderTree.create(db, current_user.id, name, parent_id)
 
 # 2. Get Folder Contents (Files + Subfolders)
-@router.get("/folders/content")
+# Folders and files page independently: keep following whichever next_* cursor is set
+@router.get("/folders/content", response_model=FolderContent)
 def get_folder_content(
+    request: Request,
+    response: Response,
     folder_id: int = None, # If None, get "Root" (Home)
+    sort: str = "name", # name | date | size
+    order: str = "asc",
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None, # files
+    folder_cursor: Optional[str] = None, # subfolders
     current_user = Depends(deps.get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Get Subfolders in this location
-    subfolders = db.query(Folder).filter(
-        Folder.owner_id == current_user.id,
-        Folder.parent_id == folder_id
-    ).all()
+    check_sort(sort, order, limit)
+    unchanged = conditional_listing(request, response, db, current_user.id)
+    if unchanged:
+        return unchanged
+
+    # Get Subfolders in this location (only on the first page or while they last)
+    subfolders, next_folder_cursor = [], None
+    if folder_cursor or not cursor:
+        subfolders, next_folder_cursor = ListingService.folders(
+            db, current_user.id, folder_id, sort, order, limit, folder_cursor
+        )
 
     # Get Files in this location
-    files = db.query(FileModel).filter(
-        FileModel.owner_id == current_user.id,
-        FileModel.folder_id == folder_id
-    ).all()
+    files, next_cursor = [], None
+    if cursor or not folder_cursor:
+        files, next_cursor = ListingService.files(
+            db, current_user.id, sort, order, limit, cursor, folder_id=folder_id, all_folders=False
+        )
 
     return {
         "folders": subfolders,
         "files": files,
-        "current_folder_id": folder_id
-    }
\ No newline at end of file
+        "current_folder_id": folder_id,
+        "next_folder_cursor": next_folder_cursor,
+        "next_cursor": next_cursor
+    }
+
+# 3. Breadcrumbs (Home > ... > this folder)
+@router.get("/folders/{folder_id}/breadcrumbs")
+def get_breadcrumbs(
+    folder_id: int,
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    return FolderTree.breadcrumbs(db, current_user.id, folder_id)
+
+# 4. Recursive Size (all subfolders included)
+@router.get("/folders/{folder_id}/size")
+def get_folder_size(
+    folder_id: int,
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    return FolderTree.size(db, current_user.id, folder_id)
+
+# 5. Move a Folder (with everything inside it)
+@router.post("/folders/{folder_id}/move")
+def move_folder(
+    folder_id: int,
+    data: dict = Body(...), # Expects { "parent_id": 7 } (null = Home)
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    return FolderTree.move(db, current_user.id, folder_id, data.get("parent_id"))
+
+# 6. Delete a Folder (with everything inside it)
+@router.delete("/folders/{folder_id}")
+def delete_folder(
+    folder_id: int,
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Files inside go to the trash; storage is cleaned up by the purger
+    trashed = FolderTree.delete(db, current_user.id, folder_id)
+    return {"message": "Folder deleted", "trashed": trashed}
+
+# 7. Download a Folder (ZIP of everything inside it, streamed)
+@router.get("/folders/{folder_id}/zip")
+def download_folder(
+    folder_id: int,
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    folder, prefixes, rows = FolderTree.zip_rows(db, current_user.id, folder_id)
+    with admission.admit_sync(current_user.id, working_set(None)) as ticket: # one file streams at a time
+        entries = BulkService.zip_entries(db, current_user.id, rows, prefixes)
+        return ticket.until_sent(StreamingResponse(
+            BulkService.zip_stream(entries),
+            media_type="application/zip",
+            headers={"Content-Disposition": f"attachment; filename={folder.name}.zip"}
+        ))
@@ -0,0 +1,22 @@
+from typing import Optional
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from app.core.database import get_db
+from app.api import deps
+from app.services.search import SearchService, SEARCH_PAGE_SIZE
+from app.schemas.file import SearchPage
+
+router = APIRouter(tags=["Search"])
+
+# 1. SEARCH: file names, file types and folder names, best match first
+@router.get("/search", response_model=SearchPage)
+def search(
+    q: str,
+    kind: str = "all", # all | files | folders
+    limit: int = SEARCH_PAGE_SIZE,
+    cursor: Optional[str] = None, # next_cursor of the previous page
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    items, next_cursor, truncated = SearchService.search(db, current_user.id, q, kind, limit, cursor)
+    return {"items": items, "next_cursor": next_cursor, "truncated": truncated}
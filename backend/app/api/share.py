@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, Body
+from fastapi import APIRouter, Depends, HTTPException, Request, Body
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
+from typing import Optional
 import secrets
 from app.core.database import get_db
 from app.api import deps
 from app.models.user import File as FileModel, SharedLink
-from app.services.s3 import S3Service
-from app.services.encryption import FileEncryptor
+from app.services.downloads import download_cost, stream_download
+from app.services.share_links import ShareLinks
 from app.utils.hashing import Hash 
+from app.core.crypto_utils import KeyManager
+from app.core.executor import crypto_executor
+from app.core.admission import admission
 
 router = APIRouter(tags=["Share"])
 
@@ -23,7 +27,9 @@ def create_share_link(
     expires_minutes = data.get("expires_minutes")
 
     # Verify ownership
-    file = db.query(FileModel).filter(FileModel.id == file_id, FileModel.owner_id == current_user.id).first()
+    file = db.query(FileModel).filter(
+        FileModel.id == file_id, FileModel.owner_id == current_user.id, FileModel.deleted_at.is_(None)
+    ).first()
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
 
@@ -31,7 +37,7 @@ def create_share_link(
     unique_hash = secrets.token_urlsafe(5) 
 
     # Hash password if provided
-    pwd_hash = Hash.bcrypt(password) if password else None
+    pwd_hash = crypto_executor.run_sync("bcrypt_hash", Hash.bcrypt, password) if password else None
 
     # Calculate Expiration Time
     expires_at = datetime.utcnow() + timedelta(minutes=int(expires_minutes)) if expires_minutes else None
@@ -52,63 +58,76 @@ def create_share_link(
 # 2. Get Share Info (Public Access - No Login Required)
 @router.get("/share/{unique_hash}/info")
 def get_share_info(unique_hash: str, db: Session = Depends(get_db)):
-    link = db.query(SharedLink).filter(SharedLink.unique_hash == unique_hash).first()
-    
-    if not link:
-        raise HTTPException(status_code=404, detail="Link not found")
-        
-    # Check Expiration
-    if link.expires_at and link.expires_at < datetime.utcnow():
-        raise HTTPException(status_code=410, detail="Link expired")
+    # Link + file in one (cached) query; raises 404 / 410
+    link = ShareLinks.lookup(db, unique_hash)
 
     # Return public info (Don't reveal the key or location!)
     return {
-        "filename": link.file.filename,
-        "size": link.file.size,
+        "filename": link.filename,
+        "size": link.size,
         "is_protected": link.password_hash is not None,
-        "upload_date": link.file.upload_date
+        "upload_date": link.upload_date
     }
 
 # 3. Download Shared File (Public Access - Password Protected)
 @router.post("/share/{unique_hash}/download")
 def download_shared_file(
     unique_hash: str, 
+    request: Request,
+    password_data: dict = Body(default={}), # {password: "user-input"} or {token: "..."} (also ?token=...)
+    token: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    link = ShareLinks.lookup(db, unique_hash)
+
+    # Verify Password (if one was set). A download token from an earlier check skips bcrypt.
+    issued = None
+    if link.password_hash and not ShareLinks.check_token(link, token or password_data.get("token")):
+        _verify_password(link, password_data.get("password", ""))
+        issued = ShareLinks.issue_token(link)
+
+    # Stream, decrypting on the fly (honours Range / If-Range); anonymous callers are capped per client address
+    client = request.client.host if request.client else "unknown"
+    with admission.admit_sync(f"share:{client}", download_cost(link)) as ticket:
+        key_bytes = KeyManager.file_key(db, link)
+        response = stream_download(request, link, key_bytes)
+        if issued:
+            response.headers["X-Download-Token"] = issued[0]
+            response.headers["X-Download-Token-Expires-In"] = str(issued[1])
+        return ticket.until_sent(response)
+
+# 4. Exchange the password for a download token (for ranged / resumed downloads)
+@router.post("/share/{unique_hash}/token")
+def create_download_token(
+    unique_hash: str,
     password_data: dict = Body(default={}), # {password: "user-input"}
     db: Session = Depends(get_db)
 ):
-    link = db.query(SharedLink).filter(SharedLink.unique_hash == unique_hash).first()
-    
+    link = ShareLinks.lookup(db, unique_hash)
+    if link.password_hash:
+        _verify_password(link, password_data.get("password", ""))
+    token, expires_in = ShareLinks.issue_token(link)
+    return {"token": token, "expires_in": expires_in}
+
+# 5. Revoke Share Link (User Only)
+@router.delete("/share/{unique_hash}")
+def revoke_share_link(
+    unique_hash: str,
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    link = db.query(SharedLink).join(FileModel, SharedLink.file_id == FileModel.id).filter(
+        SharedLink.unique_hash == unique_hash, FileModel.owner_id == current_user.id
+    ).first()
     if not link:
         raise HTTPException(status_code=404, detail="Link not found")
 
-    # Check Expiration
-    if link.expires_at and link.expires_at < datetime.utcnow():
-        raise HTTPException(status_code=410, detail="Link expired")
+    db.delete(link)
+    db.commit()
+    ShareLinks.forget(unique_hash)
+    return {"message": "Link revoked"}
 
-    # Verify Password (if one was set)
-    if link.password_hash:
-        input_pass = password_data.get("password", "")
-        if not input_pass or not Hash.verify(input_pass, link.password_hash):
-             raise HTTPException(status_code=401, detail="Incorrect Password")
-
-    # Retrieve File
-    file_record = link.file
-    
-    # S3 Download & Decrypt
-    try:
-        encrypted_data = S3Service.download_file(file_record.storage_path)
-        
-        key_bytes = bytes.fromhex(file_record.encryption_key)
-        nonce_bytes = bytes.fromhex(file_record.nonce)
-        
-        encryptor = FileEncryptor(key_bytes)
-        decrypted_data = encryptor.decrypt(encrypted_data, nonce_bytes)
-        
-        return Response(
-            content=decrypted_data,
-            media_type="application/octet-stream",
-            headers={"Content-Disposition": f"attachment; filename={file_record.filename}"}
-        )
-    except Exception as e:
-        print(f"Share download error: {e}")
-        raise HTTPException(status_code=500, detail="Download failed")
\ No newline at end of file
+
+def _verify_password(link, input_pass: str):
+    if not input_pass or not crypto_executor.run_sync("bcrypt_verify", Hash.verify, input_pass, link.password_hash):
+        raise HTTPException(status_code=401, detail="Incorrect Password")
@@ -0,0 +1,114 @@
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+from app.core.admission import admission
+from app.core.config import settings
+from app.core.crypto_utils import master_key_cache
+from app.core.database import get_db
+from app.core.executor import crypto_executor
+from app.core.metrics import registry
+from app.core.principal_cache import principal_cache
+from app.services.object_cache import CachingStorage
+from app.services.share_links import share_link_cache
+from app.services.storage import get_storage
+from app.services.trash import trash_purger
+
+def require_system_token(request: Request):
+    """
+    Operational endpoints reveal timings, queue and cache state of the whole
+    service: only for callers holding SYSTEM_TOKEN, and off without one.
+    """
+    expected: Optional[str] = settings.system_token
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid system token", headers={"WWW-Authenticate": "Bearer"})
+
+
+router = APIRouter(tags=["System"], dependencies=[Depends(require_system_token)])
+
+# Live values read at scrape time (the request / stage / storage series fill themselves)
+_CACHES = {"principal": principal_cache, "share_link": share_link_cache, "master_key": master_key_cache}
+registry.gauge("ecd_admission_budget_bytes", "Transfer memory budget of this process.", lambda: admission.budget_bytes)
+registry.gauge("ecd_admission_in_flight_bytes", "Transfer memory currently admitted.", lambda: admission.in_flight_bytes)
+registry.gauge("ecd_admission_active", "Transfers running.", lambda: admission.active)
+registry.gauge("ecd_admission_waiting", "Transfers queued for budget.", lambda: admission.waiting)
+registry.gauge("ecd_admission_rejected_total", "Transfers turned away.", lambda: {
+    ("user_limit",): admission.rejected_user, ("busy",): admission.rejected_busy, ("timeout",): admission.timed_out,
+}, ("reason",), kind="counter")
+registry.gauge("ecd_crypto_pending", "Crypto operations queued or running.", lambda: crypto_executor.pending)
+registry.gauge("ecd_crypto_operations_total", "Crypto operations finished.", lambda: {
+    (op,): stats.count for op, stats in list(crypto_executor.stats.items())
+}, ("operation",), kind="counter")
+registry.gauge("ecd_crypto_seconds_total", "Crypto time, queue wait included.", lambda: {
+    (op,): stats.total_seconds for op, stats in list(crypto_executor.stats.items())
+}, ("operation",), kind="counter")
+registry.gauge("ecd_cache_entries", "Entries per in-process cache.", lambda: {
+    (name,): len(cache) for name, cache in _CACHES.items()
+}, ("cache",))
+registry.gauge("ecd_cache_hits_total", "Cache hits.", lambda: {
+    (name,): cache.hits for name, cache in _CACHES.items()
+}, ("cache",), kind="counter")
+registry.gauge("ecd_cache_misses_total", "Cache misses.", lambda: {
+    (name,): cache.misses for name, cache in _CACHES.items()
+}, ("cache",), kind="counter")
+
+def _object_cache_stats() -> dict:
+    storage = get_storage()
+    return storage.stats() if isinstance(storage, CachingStorage) else {}
+
+for _key, _help, _kind in (
+    ("hits", "Object cache hits.", "counter"),
+    ("misses", "Object cache misses.", "counter"),
+    ("evictions", "Object cache evictions (size bound).", "counter"),
+    ("bytes_served", "Ciphertext bytes served from the object cache.", "counter"),
+    ("bytes", "Ciphertext bytes held by the object cache.", "gauge"),
+):
+    registry.gauge(
+        f"ecd_object_cache_{_key}" + ("_total" if _kind == "counter" else ""), _help,
+        lambda key=_key: _object_cache_stats().get(key, 0), kind=_kind,
+    )
+registry.gauge("ecd_trash_purged_objects_total", "Stored objects deleted by the trash purger.",
+               lambda: trash_purger.purged_objects, kind="counter")
+registry.gauge("ecd_trash_failed_batches_total", "Purge batches that failed and were rescheduled.",
+               lambda: trash_purger.failed_batches, kind="counter")
+registry.gauge("ecd_trash_orphans_queued_total", "Unreferenced objects found by reconciliation.",
+               lambda: trash_purger.orphans_queued, kind="counter")
+
+# 0. Prometheus scrape endpoint
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# 1. Crypto pool: queue depth + per-operation timings
+@router.get("/system/crypto")
+def crypto_stats():
+    return crypto_executor.snapshot()
+
+# 2. Authenticated-principal cache: hit/miss counters for sizing
+@router.get("/system/principal-cache")
+def principal_cache_stats():
+    return principal_cache.stats()
+
+# 3. Public share-link metadata cache
+@router.get("/system/share-cache")
+def share_cache_stats():
+    return share_link_cache.stats()
+
+# 4. Transfer admission: memory budget in use, queue, rejections
+@router.get("/system/admission")
+def admission_stats():
+    return admission.snapshot()
+
+# 5. On-disk ciphertext cache in front of S3 (OBJECT_CACHE_DIR)
+@router.get("/system/object-cache")
+def object_cache_stats():
+    return _object_cache_stats() or {"enabled": False}
+
+# 6. Trash purger: deletion queue depth, progress, failures
+@router.get("/system/trash")
+def trash_stats(db: Session = Depends(get_db)):
+    return trash_purger.snapshot(db)
@@ -0,0 +1,55 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Body
+from sqlalchemy.orm import Session
+from app.core.database import get_db
+from app.api import deps
+from app.models.user import File as FileModel
+from app.services.listing import check_sort, DEFAULT_PAGE_SIZE
+from app.services.trash import TrashService, TRASH_RETENTION_DAYS, trash_purger
+from app.schemas.file import TrashPage
+
+router = APIRouter(tags=["Trash"])
+
+# 1. LIST TRASH (most recently deleted first)
+@router.get("/trash", response_model=TrashPage)
+def get_trash(
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None, # next_cursor of the previous page
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    check_sort("date", "desc", limit)
+    items, next_cursor = TrashService.page(db, current_user.id, limit, cursor)
+    return {"items": items, "next_cursor": next_cursor}
+
+# 2. RESTORE
+@router.post("/trash/restore")
+def restore_files(
+    data: dict = Body(...), # Expects { "file_ids": [1, 2, 3] }
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    file_ids = [int(i) for i in data.get("file_ids") or []]
+    if not file_ids:
+        raise HTTPException(status_code=400, detail="file_ids required")
+
+    restored = TrashService.restore(db, current_user.id, file_ids)
+    db.commit()
+    return {"message": f"{restored} files restored", "restored": restored}
+
+# 3. EMPTY TRASH (all of it, or just some files: { "file_ids": [1, 2] })
+@router.post("/trash/empty")
+def empty_trash(
+    data: Optional[dict] = Body(None),
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    file_filter = ()
+    if data and data.get("file_ids"):
+        file_filter = (FileModel.id.in_([int(i) for i in data["file_ids"]]),)
+
+    # Rows go now; their objects are queued in the same transaction and deleted in the background
+    queued = TrashService.purge(db, current_user.id, *file_filter)
+    db.commit()
+    trash_purger.wake()
+    return {"message": "Trash emptied", "objects_queued": queued, "retention_days": TRASH_RETENTION_DAYS}
@@ -0,0 +1,100 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Body, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from app.core.database import get_db
+from app.api import deps
+from app.core.admission import admission
+from app.services.resumable import ResumableUploads
+
+router = APIRouter(tags=["Uploads"])
+
+# Resumable protocol:
+#   POST /uploads                      -> upload_id, chunk_size, chunk_count
+#   PUT  /uploads/{id}/chunks/{index}  raw chunk bytes, any order, in parallel
+#   GET  /uploads/{id}                 -> which chunks the server has
+#   POST /uploads/{id}/complete        -> file_id
+
+# 1. Start an Upload Session
+@router.post("/uploads")
+def create_upload(
+    background_tasks: BackgroundTasks,
+    data: dict = Body(...), # Expects { "filename": "big.iso", "size": 123456, "folder_id": null }
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    filename = data.get("filename")
+    size = data.get("size")
+    if not filename or not isinstance(size, int):
+        raise HTTPException(status_code=400, detail="filename and size required")
+
+    upload = ResumableUploads.create(db, current_user.id, filename, size, data.get("folder_id"))
+    # Sessions that were never finished get cleaned up every now and then
+    background_tasks.add_task(ResumableUploads.maybe_collect)
+    return _status(db, upload)
+
+# 2. Send a Chunk
+@router.put("/uploads/{upload_id}/chunks/{index}")
+async def put_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    upload = await run_in_threadpool(ResumableUploads.get_owned, db, current_user.id, upload_id)
+    expected = ResumableUploads.expected_size(upload, index)
+
+    # Body buffer, its copy and the ciphertext: admitted before anything is read
+    with await admission.admit(current_user.id, 3 * expected):
+        # Never hold more than one chunk of body, whatever the client sends
+        body = bytearray()
+        async for piece in request.stream():
+            body += piece
+            if len(body) > expected:
+                raise HTTPException(status_code=413, detail=f"Chunk {index} must be {expected} bytes")
+
+        await run_in_threadpool(ResumableUploads.put_chunk, db, upload, index, bytes(body))
+    # Not chunk.index: the committed row would reload on the event loop
+    return {"index": index, "size": len(body)}
+
+# 3. Upload Status (what to resend after a dropped connection)
+@router.get("/uploads/{upload_id}")
+def get_upload(
+    upload_id: str,
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    return _status(db, ResumableUploads.get_owned(db, current_user.id, upload_id))
+
+# 4. Finish: the file appears in listings from here on
+@router.post("/uploads/{upload_id}/complete")
+def complete_upload(
+    upload_id: str,
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    upload = ResumableUploads.get_owned(db, current_user.id, upload_id)
+    new_file = ResumableUploads.complete(db, upload)
+    return {"message": "File uploaded", "file_id": new_file.id}
+
+# 5. Cancel
+@router.delete("/uploads/{upload_id}")
+def cancel_upload(
+    upload_id: str,
+    current_user = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    ResumableUploads.abort(db, ResumableUploads.get_owned(db, current_user.id, upload_id))
+    return {"message": "Upload cancelled"}
+
+
+def _status(db: Session, upload) -> dict:
+    return {
+        "upload_id": upload.id,
+        "filename": upload.filename,
+        "size": upload.total_size,
+        "chunk_size": upload.chunk_size,
+        "chunk_count": upload.chunk_count,
+        "received": ResumableUploads.received(db, upload),
+        "expires_at": upload.expires_at,
+    }
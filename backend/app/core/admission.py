@@ -0,0 +1,199 @@
+import threading
+import time
+from typing import Hashable, Optional
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import Response
+from app.core.config import settings
+
+# Bytes all transfers of this process may hold in memory at once (estimated per transfer)
+ADMISSION_MEMORY_BUDGET = int(settings.admission_memory_budget_mb * 1024 * 1024)
+# Transfers one user (or one anonymous client) may run at once, queued ones included
+ADMISSION_PER_USER = settings.admission_per_user
+# How long a transfer waits for budget before we answer 503
+ADMISSION_QUEUE_TIMEOUT = settings.admission_queue_timeout  # seconds
+# Waiters each hold a threadpool thread, so keep this well under its 40
+ADMISSION_MAX_WAITING = settings.admission_max_waiting
+ADMISSION_RETRY_AFTER = settings.admission_retry_after  # seconds
+
+
+class AdmissionController:
+    """
+    Memory-budgeted admission for uploads and downloads. Each transfer states
+    what it will hold in memory; it starts once that fits in the budget,
+    waits in a queue for up to `queue_timeout` otherwise, and is turned away
+    with a Retry-After: 429 when its user is over the concurrency cap,
+    503 when the process is saturated.
+    """
+
+    def __init__(self, budget_bytes: int = ADMISSION_MEMORY_BUDGET, per_user: int = ADMISSION_PER_USER,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT, max_waiting: int = ADMISSION_MAX_WAITING):
+        self.budget_bytes = max(1, budget_bytes)
+        self.per_user = max(1, per_user)
+        self.queue_timeout = queue_timeout
+        self.max_waiting = max(0, max_waiting)
+        self.in_flight_bytes = 0
+        self.peak_bytes = 0
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_user = 0
+        self.rejected_busy = 0
+        self.timed_out = 0
+        self._users = {}  # key -> transfers running or queued
+        self._cond = threading.Condition()
+
+    def admit_sync(self, key: Hashable, cost: int) -> "Ticket":
+        """Blocks (sync routes run on a threadpool thread) until `cost` bytes fit; raises 429 / 503."""
+        return self._acquire(key, cost, block=True)
+
+    async def admit(self, key: Hashable, cost: int) -> "Ticket":
+        """Same for async routes: admits right away if it fits, else waits off the event loop."""
+        ticket = self._acquire(key, cost, block=False)
+        if ticket is None:
+            ticket = await run_in_threadpool(self._acquire, key, cost, True)
+        return ticket
+
+    def _acquire(self, key: Hashable, cost: int, block: bool) -> Optional["Ticket"]:
+        # A transfer bigger than the whole budget may still run, alone
+        cost = max(0, min(int(cost), self.budget_bytes))
+        with self._cond:
+            if self._fits(cost):
+                return self._take(key, cost, reserve=True)
+            if not block:
+                return None
+            if self.waiting >= self.max_waiting:
+                self.rejected_busy += 1
+                raise _busy()
+
+            self._reserve(key)
+            self.waiting += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while not self._fits(cost):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        self._unreserve(key)
+                        raise _busy()
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            return self._take(key, cost, reserve=False)
+
+    def _fits(self, cost: int) -> bool:
+        return self.in_flight_bytes + cost <= self.budget_bytes
+
+    def _reserve(self, key: Hashable):
+        if self._users.get(key, 0) >= self.per_user:
+            self.rejected_user += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many transfers at once, please retry",
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+            )
+        self._users[key] = self._users.get(key, 0) + 1
+
+    def _unreserve(self, key: Hashable):
+        left = self._users.get(key, 0) - 1
+        if left > 0:
+            self._users[key] = left
+        else:
+            self._users.pop(key, None)
+
+    def _take(self, key: Hashable, cost: int, reserve: bool) -> "Ticket":
+        if reserve:
+            self._reserve(key)
+        self.in_flight_bytes += cost
+        self.peak_bytes = max(self.peak_bytes, self.in_flight_bytes)
+        self.active += 1
+        self.admitted += 1
+        return Ticket(self, key, cost)
+
+    def _release(self, key: Hashable, cost: int):
+        with self._cond:
+            self.in_flight_bytes -= cost
+            self.active -= 1
+            self._unreserve(key)
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "budget_bytes": self.budget_bytes,
+                "in_flight_bytes": self.in_flight_bytes,
+                "budget_used": round(self.in_flight_bytes / self.budget_bytes, 4),
+                "peak_bytes": self.peak_bytes,
+                "active": self.active,
+                "waiting": self.waiting,
+                "users": len(self._users),
+                "per_user_limit": self.per_user,
+                "admitted": self.admitted,
+                "rejected_user": self.rejected_user,
+                "rejected_busy": self.rejected_busy,
+                "timed_out": self.timed_out,
+            }
+
+
+class Ticket:
+    """
+    One admitted transfer. Use as a context manager around the route body:
+    the budget is returned on exit unless the response was handed over with
+    `until_sent()`, in which case it goes back once the body has been sent.
+    """
+
+    def __init__(self, controller: AdmissionController, key: Hashable, cost: int):
+        self.controller = controller
+        self.key = key
+        self.cost = cost
+        self._released = False
+        self._handed_off = False
+        self._lock = threading.Lock()
+
+    def release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self.controller._release(self.key, self.cost)
+
+    def until_sent(self, response: Response) -> Response:
+        self._handed_off = True
+        return _AdmittedResponse(response, self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None or not self._handed_off:
+            self.release()
+
+
+class _AdmittedResponse(Response):
+    """Sends the wrapped response, then releases its ticket (also on errors and disconnects)."""
+
+    def __init__(self, response: Response, ticket: Ticket):
+        self.response = response
+        self.ticket = ticket
+        self.status_code = response.status_code
+        self.raw_headers = response.raw_headers
+        self.background = None
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.response(scope, receive, send)
+        finally:
+            self.ticket.release()
+        if self.background is not None:
+            await self.background()
+
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server busy, please retry",
+        headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+    )
+
+
+admission = AdmissionController()
@@ -0,0 +1,113 @@
+from functools import lru_cache
+from typing import Optional
+from dotenv import find_dotenv
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """
+    Every setting the backend reads, parsed once from the environment and
+    .env (environment variables win). Field names are the variable names in
+    lower case: DB_POOL_SIZE -> db_pool_size. Modules keep their UPPER_CASE
+    constants, taken from here.
+    """
+
+    # .env next to the code (or above it), whatever the working directory
+    model_config = SettingsConfigDict(env_file=find_dotenv() or None, extra="ignore")
+
+    # --- app ---
+    # Startup creates missing tables and runs the idempotent migrations; turn
+    # off to run `python -m app.core.migrations` once per deploy instead
+    create_schema: bool = True
+
+    # --- database ---
+    database_url: str = "sqlite:///./sql_app.db"
+    # Pool: checkouts beyond size + overflow wait up to db_pool_timeout seconds
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    # SQLite: writers wait this long for the lock instead of failing with "database is locked"
+    sqlite_busy_timeout_ms: int = 5000
+    # Opt-in async engine (aiosqlite / asyncpg) next to the sync one
+    database_async: bool = False
+
+    # --- auth / keys ---
+    secret_key: str = "super-secret-fixed-key-change-this-in-production"
+    algorithm: str = "HS256"
+    access_token_expire_minutes: int = 60 * 24 * 7  # 7 days
+    # Wraps every user's master key; the app refuses to start without it. Deployments
+    # that ran on the old built-in fallback set it to "fallback-master-key-secret"
+    master_key_secret: Optional[str] = None
+    # Local development / tests only: start anyway, with keys wrapped under that public fallback
+    allow_insecure_master_key: bool = False
+    master_key_cache_size: int = 1024
+    master_key_cache_ttl: int = 300  # seconds
+    principal_cache_size: int = 10_000
+    principal_cache_ttl: int = 60  # seconds
+
+    # --- CPU / memory limits ---
+    # thread = cheap hand-off; process = full isolation from the API's interpreter
+    crypto_executor: str = "thread"
+    crypto_workers: Optional[int] = None  # CPU count when unset
+    crypto_max_queue: Optional[int] = None  # crypto_workers * 4 when unset
+    admission_memory_budget_mb: float = 512
+    admission_per_user: int = 4
+    admission_queue_timeout: float = 10  # seconds
+    admission_max_waiting: int = 16
+    admission_retry_after: int = 2  # seconds
+    slow_request_ms: float = 0
+    # /metrics and /system/*: Bearer token for scrapers and operators; unset = endpoints off (404)
+    system_token: Optional[str] = None
+
+    # --- storage ---
+    storage_backend: str = "s3"  # "s3" or "local"
+    local_storage_dir: str = "./uploads"
+    local_fsync: str = "data"
+    aws_access_key_id: Optional[str] = None
+    aws_secret_access_key: Optional[str] = None
+    aws_bucket_name: Optional[str] = None
+    aws_region: Optional[str] = None
+    s3_part_size_mb: float = 8
+    s3_max_concurrency: int = 4
+    object_cache_dir: str = ""
+    object_cache_max_mb: float = 1024
+    object_cache_max_object_mb: float = 64
+    object_cache_scan_seconds: float = 30  # re-read the directory: workers share it
+
+    # --- files ---
+    encryption_segment_size: int = 64 * 1024
+    # Segments are encrypted / decrypted on a thread pool (1 = serially, in the request's thread)
+    encryption_workers: Optional[int] = None  # CPU count when unset
+    encryption_batch_segments: int = 8  # segments per pool task
+    encryption_inflight_mb: float = 8  # per stream, read ahead of the consumer
+    # zlib | zstd | none. zstd is opt-in: every worker that serves downloads needs `zstandard`
+    compression_codec: str = "zlib"
+    compression_level: Optional[int] = None  # codec default when unset
+    compression_max_entropy: float = 7.5
+    upload_batch_max_files: int = 100
+    upload_batch_concurrency: int = 4
+    upload_session_ttl_hours: float = 24
+    upload_gc_interval: int = 600  # seconds
+    share_cache_size: int = 10_000
+    share_cache_ttl: int = 30  # seconds
+    share_token_ttl: int = 600  # seconds
+    search_candidates: int = 1000
+
+    # --- trash ---
+    trash_retention_days: float = 30
+    # Background purger: false turns it off (e.g. run it in one process only)
+    trash_purger: bool = True
+    purge_interval_seconds: float = 60
+    purge_retry_base_seconds: float = 30
+    purge_retry_max_seconds: float = 6 * 3600
+    reconcile_interval_hours: float = 24
+    reconcile_grace_hours: float = 24
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+settings = get_settings()
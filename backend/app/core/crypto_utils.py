@@ -1,8 +1,23 @@
 import os
 import base64
+from typing import Optional
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.keywrap import aes_key_wrap, aes_key_unwrap
 from cryptography.hazmat.backends import default_backend
+from app.core.config import settings
+from app.core.ttl_cache import TTLCache
+
+# --- KEY HIERARCHY ---
+# MASTER_KEY_SECRET --HKDF--> KEK --wraps--> per-user master key --wraps--> per-file data key
+# Rotating MASTER_KEY_SECRET makes every stored master key unreadable: re-wrap first.
+INSECURE_MASTER_KEY_SECRET = "fallback-master-key-secret"  # publicly known: see check_master_key_secret()
+MASTER_KEY_SECRET = settings.master_key_secret or INSECURE_MASTER_KEY_SECRET
+MASTER_KEY_CACHE_SIZE = settings.master_key_cache_size
+MASTER_KEY_CACHE_TTL = settings.master_key_cache_ttl  # seconds
+
+WRAPPED_PREFIX = "w1:"  # File.encryption_key / User.wrapped_master_key values written by AES key wrap
 
 class CryptoUtils:
     @staticmethod
@@ -10,11 +25,17 @@ class CryptoUtils:
         """Generates a random 16-byte salt."""
         return os.urandom(16)
 
+    @staticmethod
+    def generate_key() -> bytes:
+        """Random 32-byte (256-bit) key."""
+        return os.urandom(32)
+
     @staticmethod
     def derive_key(password: str, salt: bytes) -> bytes:
         """
         Turns a user password + salt into a 32-byte (256-bit) AES key.
         This is deterministic: Same password + Same salt = Same Key.
+        Deliberately slow (PBKDF2) - only for human passwords, not per request.
         """
         kdf = PBKDF2HMAC(
             algorithm=hashes.SHA256(),
@@ -25,6 +46,26 @@ class CryptoUtils:
         )
         return kdf.derive(password.encode())
 
+    @staticmethod
+    def hkdf(key_material: bytes, info: bytes, length: int = 32, salt: Optional[bytes] = None) -> bytes:
+        """Cheap sub-key derivation from high-entropy key material (microseconds)."""
+        return HKDF(algorithm=hashes.SHA256(), length=length, salt=salt, info=info).derive(key_material)
+
+    @staticmethod
+    def wrap_key(kek: bytes, key: bytes) -> str:
+        """AES key wrap (RFC 3394), stored as text in the DB."""
+        return WRAPPED_PREFIX + aes_key_wrap(kek, key).hex()
+
+    @staticmethod
+    def unwrap_key(kek: bytes, wrapped: str) -> bytes:
+        if not CryptoUtils.is_wrapped(wrapped):
+            raise ValueError("Not a wrapped key")
+        return aes_key_unwrap(kek, bytes.fromhex(wrapped[len(WRAPPED_PREFIX):]))
+
+    @staticmethod
+    def is_wrapped(stored: Optional[str]) -> bool:
+        return bool(stored) and stored.startswith(WRAPPED_PREFIX)
+
     @staticmethod
     def encode_salt(salt: bytes) -> str:
         """Helper to store bytes as string in DB"""
@@ -33,4 +74,82 @@ class CryptoUtils:
     @staticmethod
     def decode_salt(salt_str: str) -> bytes:
         """Helper to read string from DB back to bytes"""
-        return base64.b64decode(salt_str)
\ No newline at end of file
+        return base64.b64decode(salt_str)
+
+
+class MasterKeyCache(TTLCache):
+    """Bounded LRU of unwrapped master keys (user_id -> key) with TTL eviction."""
+
+    def __init__(self, max_size: int = MASTER_KEY_CACHE_SIZE, ttl: float = MASTER_KEY_CACHE_TTL):
+        super().__init__(max_size, ttl)
+
+
+def check_master_key_secret(app_settings=settings):
+    """Startup check: without MASTER_KEY_SECRET the whole key hierarchy hangs off a public constant."""
+    if app_settings.master_key_secret:
+        return
+    if not app_settings.allow_insecure_master_key:
+        raise RuntimeError(
+            "MASTER_KEY_SECRET is not set: refusing to wrap master keys under the public fallback "
+            "(ALLOW_INSECURE_MASTER_KEY=true for local development only)"
+        )
+    print("⚠️ MASTER_KEY_SECRET is not set: master keys are wrapped under a PUBLIC fallback secret. Never do this in production.")
+
+
+master_key_cache = MasterKeyCache()
+_kek = CryptoUtils.hkdf(MASTER_KEY_SECRET.encode(), b"ecd/kek/v1")
+
+
+class KeyManager:
+    @staticmethod
+    def create_master_key() -> str:
+        """New wrapped master key for a user row."""
+        return CryptoUtils.wrap_key(_kek, CryptoUtils.generate_key())
+
+    @staticmethod
+    def master_key(db, user_id: int) -> bytes:
+        """Unwrapped master key of a user: cache first, DB (+ one AES unwrap) on a miss."""
+        key = master_key_cache.get(user_id)
+        if key is not None:
+            return key
+
+        from app.models.user import User
+        with db.no_autoflush:  # a lookup leaves the caller's pending work alone
+            wrapped = db.query(User.wrapped_master_key).filter(User.id == user_id).scalar()
+        if not wrapped:
+            wrapped = KeyManager._create_legacy_master_key(db.get_bind(), user_id)
+
+        key = CryptoUtils.unwrap_key(_kek, wrapped)
+        master_key_cache.put(user_id, key)
+        return key
+
+    @staticmethod
+    def _create_legacy_master_key(bind, user_id: int) -> str:
+        """
+        Users created before the key hierarchy get their key in a session of its
+        own: it must be stored before anything is wrapped under it, and a key
+        lookup must not commit the caller's pending work. Only set if nobody beat
+        us to it, otherwise files wrapped under the other request's key would
+        become unreadable.
+        """
+        from sqlalchemy.orm import Session
+        from app.models.user import User
+        with Session(bind=bind) as own:
+            own.query(User).filter(User.id == user_id, User.wrapped_master_key.is_(None)).update(
+                {User.wrapped_master_key: KeyManager.create_master_key()}, synchronize_session=False
+            )
+            own.commit()
+            return own.query(User.wrapped_master_key).filter(User.id == user_id).scalar()
+
+    @staticmethod
+    def new_file_key(master_key: bytes) -> tuple[bytes, str]:
+        """Random data key for one file. Returns: (key, wrapped key for File.encryption_key)"""
+        key = CryptoUtils.generate_key()
+        return key, CryptoUtils.wrap_key(master_key, key)
+
+    @staticmethod
+    def file_key(db, file_record) -> bytes:
+        """Data key of a stored file (legacy rows hold the raw key as hex)."""
+        if not CryptoUtils.is_wrapped(file_record.encryption_key):
+            return bytes.fromhex(file_record.encryption_key)
+        return CryptoUtils.unwrap_key(KeyManager.master_key(db, file_record.owner_id), file_record.encryption_key)
@@ -1,32 +1,199 @@
 import os
-from sqlalchemy import create_engine
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.config import settings
 
-# Load .env
-load_dotenv()
+SQLALCHEMY_DATABASE_URL = settings.database_url
 
-# Read DB URL from .env
-SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sql_app.db")
+# Pool: checkouts beyond size + overflow wait up to DB_POOL_TIMEOUT seconds
+DB_POOL_SIZE = settings.db_pool_size
+DB_MAX_OVERFLOW = settings.db_max_overflow
+DB_POOL_TIMEOUT = settings.db_pool_timeout
+DB_POOL_RECYCLE = settings.db_pool_recycle
+# SQLite: writers wait this long for the lock instead of failing with "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = settings.sqlite_busy_timeout_ms
+# Opt-in async engine (aiosqlite / asyncpg) next to the sync one
+DATABASE_ASYNC = settings.database_async
 
-# Setup Engine
-if "sqlite" in SQLALCHEMY_DATABASE_URL:
-    # SQLite needs this specific check_same_thread setting
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-else:
-    # PostgreSQL and others don't need that arg
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(database_url: str) -> dict:
+    """create_engine() / create_async_engine() keyword arguments for this database."""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        # SQLite needs this specific check_same_thread setting
+        options = {"connect_args": {"check_same_thread": False}}
+        if not _is_memory_sqlite(url):
+            options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+            if url.get_driver_name() == "aiosqlite":
+                # aiosqlite defaults to NullPool (a connection per checkout): pool it like the sync engine
+                options["poolclass"] = AsyncAdaptedQueuePool
+        return options
+    # PostgreSQL and others: drop connections the server closed while idle
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def configure_sqlite(engine, database_url: str):
+    """
+    Per-connection PRAGMAs: WAL lets readers run while one writer commits,
+    synchronous=NORMAL is durable enough under WAL and skips an fsync per
+    commit, busy_timeout makes writers queue instead of erroring.
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite":
+        return
+    wal = not _is_memory_sqlite(url)
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if wal:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+
+def async_url(database_url: str) -> str:
+    """The same database through its asyncio driver (sqlite -> aiosqlite, postgresql -> asyncpg)."""
+    url = make_url(database_url)
+    driver = _ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver known for {url.get_backend_name()}")
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+# --- ENGINES: created on first use, one per process ---
+# Nothing connects at import time, and a worker forked from a parent that
+# already used the database builds its own pool instead of sharing sockets.
+# `database.engine` / `database.async_engine` still work (module __getattr__).
+_engines = {}  # kind -> (pid, engine)
+_engines_lock = threading.Lock()
+
+
+class _LazySessionmaker(sessionmaker):
+    """sessionmaker bound to this process's engine when the first session is made."""
+
+    def __call__(self, **local_kw):
+        get_engine()
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
+
+def get_engine():
+    """This process's engine. After a fork the parent's pool is dropped without closing its connections."""
+    pid = os.getpid()
+    current = _engines.get("sync")
+    if current is None or current[0] != pid:
+        with _engines_lock:
+            current = _engines.get("sync")
+            if current is None or current[0] != pid:
+                if current is not None:
+                    current[1].dispose(close=False)
+                engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
+                configure_sqlite(engine, SQLALCHEMY_DATABASE_URL)
+                SessionLocal.configure(bind=engine)
+                current = _engines["sync"] = (pid, engine)
+    return current[1]
+
+
+def dispose_engines():
+    """Closes this process's sync pool (app shutdown). Sessions made later open a new one."""
+    with _engines_lock:
+        current = _engines.pop("sync", None)
+    if current is not None and current[0] == os.getpid():
+        current[1].dispose()
+
+
+async def dispose_async_engine():
+    """The same for the async engine, whose connections close on the event loop."""
+    with _engines_lock:
+        current = _engines.pop("async", None)
+        _async_sessionmakers.clear()
+    if current is not None and current[0] == os.getpid():
+        await current[1].dispose()
+
+
+def __getattr__(name):
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    if name == "AsyncSessionLocal":
+        return get_async_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# The one request-scoped session: routes and deps.get_current_user share it (FastAPI caches it per request)
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# --- ASYNC (DATABASE_ASYNC=true; needs aiosqlite or asyncpg installed) ---
+_async_sessionmakers = {}  # async engine -> its async_sessionmaker
+
+def get_async_engine():
+    if not DATABASE_ASYNC:
+        return None
+    pid = os.getpid()
+    current = _engines.get("async")
+    if current is None or current[0] != pid:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        with _engines_lock:
+            current = _engines.get("async")
+            if current is None or current[0] != pid:
+                if current is not None:
+                    current[1].sync_engine.dispose(close=False)
+                url = async_url(SQLALCHEMY_DATABASE_URL)
+                engine = create_async_engine(url, **engine_options(url))
+                configure_sqlite(engine.sync_engine, url)
+                current = _engines["async"] = (pid, engine)
+    return current[1]
+
+def get_async_sessionmaker():
+    engine = get_async_engine()
+    if engine is None:
+        return None
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    factory = _async_sessionmakers.get(engine)
+    if factory is None:
+        factory = _async_sessionmakers[engine] = async_sessionmaker(
+            engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+    return factory
+
+async def get_async_db():
+    """
+    Request-scoped AsyncSession for async routes. Services take a sync
+    Session; call them with `await db.run_sync(Service.method, ...)`.
+    """
+    factory = get_async_sessionmaker()
+    if factory is None:
+        raise RuntimeError("Async database disabled: set DATABASE_ASYNC=true")
+    async with factory() as db:
+        yield db
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.metrics import span
+
+# thread  = cheap hand-off; bcrypt / AES / KDF in `cryptography` release the GIL
+# process = full isolation from the API's interpreter (arguments are pickled)
+CRYPTO_EXECUTOR = settings.crypto_executor.lower()
+CRYPTO_WORKERS = settings.crypto_workers or os.cpu_count() or 2
+# Operations allowed to wait or run at once; beyond that we answer 503 right away
+CRYPTO_MAX_QUEUE = settings.crypto_max_queue or CRYPTO_WORKERS * 4
+CRYPTO_RETRY_AFTER = 1  # seconds
+
+
+class OperationStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rejected = 0
+        self.total_seconds = 0.0  # queue wait + run
+        self.max_seconds = 0.0
+        self.run_seconds = 0.0    # run only
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "avg_ms": round(self.total_seconds / self.count * 1000, 3) if self.count else 0.0,
+            "avg_run_ms": round(self.run_seconds / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 3),
+        }
+
+
+class CryptoExecutor:
+    """
+    Bounded pool for CPU-heavy crypto, kept apart from the request threadpool
+    so a burst of logins queues here (or gets a 503) instead of starving
+    uploads and listings.
+    """
+
+    def __init__(self, kind: str = CRYPTO_EXECUTOR, workers: int = CRYPTO_WORKERS, max_queue: int = CRYPTO_MAX_QUEUE):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown CRYPTO_EXECUTOR: {kind}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.pending = 0
+        self.stats = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> Executor:
+        # Created on first use so pre-fork servers don't inherit worker threads/processes
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    if self.kind == "process":
+                        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="crypto")
+        return self._pool
+
+    def _admit(self, op: str) -> OperationStats:
+        with self._lock:
+            stats = self.stats.setdefault(op, OperationStats())
+            if self.pending >= self.max_queue:
+                stats.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Server busy, please retry",
+                    headers={"Retry-After": str(CRYPTO_RETRY_AFTER)},
+                )
+            self.pending += 1
+            return stats
+
+    def _done(self, stats: OperationStats, started: float, run_seconds: float, failed: bool):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.pending -= 1
+            stats.count += 1
+            stats.errors += failed
+            stats.total_seconds += elapsed
+            stats.run_seconds += run_seconds
+            stats.max_seconds = max(stats.max_seconds, elapsed)
+
+    async def run(self, op: str, fn, *args):
+        """Awaitable: the event loop stays free while `fn(*args)` runs in the pool."""
+        stats = self._admit(op)
+        started = time.perf_counter()
+        run_seconds, failed = 0.0, True
+        try:
+            with span(op):
+                result, run_seconds = await asyncio.get_running_loop().run_in_executor(self.pool, partial(_timed, fn, *args))
+            failed = False
+            return result
+        finally:
+            self._done(stats, started, run_seconds, failed)
+
+    def run_sync(self, op: str, fn, *args):
+        """Same, for sync routes (already on a threadpool thread): blocks until done."""
+        stats = self._admit(op)
+        started = time.perf_counter()
+        run_seconds, failed = 0.0, True
+        try:
+            with span(op):
+                result, run_seconds = self.pool.submit(_timed, fn, *args).result()
+            failed = False
+            return result
+        finally:
+            self._done(stats, started, run_seconds, failed)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "pending": self.pending,
+                "operations": {op: stats.as_dict() for op, stats in self.stats.items()},
+            }
+
+
+def _timed(fn, *args):
+    # Runs inside the worker, so queue wait and execution time can be told apart
+    started = time.perf_counter()
+    return fn(*args), time.perf_counter() - started
+
+
+crypto_executor = CryptoExecutor()
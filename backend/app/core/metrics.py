@@ -0,0 +1,323 @@
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Iterable, Iterator, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+
+# Requests slower than this are logged with their stage breakdown (0 = off)
+SLOW_REQUEST_MS = settings.slow_request_ms
+# WARNING per slow request; the numbers are also attached as record attributes for structured handlers
+slow_request_log = logging.getLogger("ecd.slow_requests")
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labelvalues, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labelvalues -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[slot] += 1
+            series[-1] += value
+
+    def count(self, *labelvalues) -> int:
+        series = self._series.get(labelvalues)
+        return sum(series[:-1]) if series else 0
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = sorted((k, list(v)) for k, v in self._series.items())
+        for labelvalues, values in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), values):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(values[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}"
+
+
+class Gauge:
+    """
+    Read at scrape time: `collect()` returns a number or {labelvalues tuple: number}.
+    kind="counter" for totals kept elsewhere (executor / cache counters).
+    """
+
+    def __init__(self, name: str, help: str, collect: Callable, labelnames: tuple = (), kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.collect = collect
+        self.kind = kind
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labelvalues, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def add(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        return self.add(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self.add(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, collect: Callable, labelnames: tuple = (), kind: str = "gauge") -> Gauge:
+        return self.add(Gauge(name, help, collect, labelnames, kind))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    "ecd_http_request_duration_seconds", "Time until the last response byte was sent.", ("method", "route", "status"))
+STAGE_SECONDS = registry.histogram(
+    "ecd_stage_duration_seconds", "Time one request spent in a pipeline stage (exclusive of nested stages).", ("stage",))
+REQUEST_QUERIES = registry.histogram(
+    "ecd_db_queries_per_request", "SQL statements executed by one request.", ("route",), QUERY_BUCKETS)
+DB_QUERIES = registry.counter("ecd_db_queries_total", "SQL statements executed.")
+STORAGE_BYTES = registry.counter("ecd_storage_bytes_total", "Bytes moved to / from object storage.", ("direction",))
+STORAGE_OPERATIONS = registry.counter("ecd_storage_operations_total", "Object storage calls.", ("operation",))
+
+
+# --- REQUEST TRACES: what one request spent where ---
+class RequestTrace:
+    __slots__ = ("stages", "db_queries", "done", "_lock")
+
+    def __init__(self):
+        self.stages = {}  # stage -> seconds
+        self.db_queries = 0
+        self.done = False
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count_query(self):
+        with self._lock:
+            self.db_queries += 1
+
+
+# Copied into threadpool threads (run_in_threadpool), so sync work still reports to its request
+_trace: ContextVar[Optional[RequestTrace]] = ContextVar("ecd_trace", default=None)
+_open_span: ContextVar[Optional["span"]] = ContextVar("ecd_span", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    trace = _trace.get()
+    return trace if trace is not None and not trace.done else None
+
+
+class span:
+    """
+    `with span("encrypt"):` adds the block's time to the current request's
+    stage breakdown. Time spent in nested spans is counted there instead, so
+    stages add up. Outside a request this costs two clock reads.
+    """
+    __slots__ = ("stage", "child_seconds", "_started", "_token")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.child_seconds = 0.0
+        self._token = _open_span.set(self)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started
+        _open_span.reset(self._token)
+        _charge_parent(elapsed)
+        trace = current_trace()
+        if trace is not None:
+            trace.add(self.stage, max(0.0, elapsed - self.child_seconds))
+
+
+def _charge_parent(elapsed: float):
+    parent = _open_span.get()
+    if parent is not None:
+        parent.child_seconds += elapsed
+
+
+def timed_iter(chunks: Iterable[bytes], stage: str, on_chunk: Optional[Callable[[int], None]] = None) -> Iterator[bytes]:
+    """Times each pull from a lazy iterator (a storage body) as `stage`."""
+    iterator = iter(chunks)
+    while True:
+        with span(stage):
+            chunk = next(iterator, None)
+        if chunk is None:
+            return
+        if on_chunk is not None:
+            on_chunk(len(chunk))
+        yield chunk
+
+
+# --- DB: statements per request, and their time as the "db" stage ---
+@event.listens_for(Engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("ecd_query_started", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("ecd_query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    DB_QUERIES.inc()
+    _charge_parent(elapsed)
+    trace = current_trace()
+    if trace is not None:
+        trace.count_query()
+        trace.add("db", elapsed)
+
+@event.listens_for(Engine, "handle_error")
+def _query_failed(context):
+    conn = context.connection
+    if conn is not None and conn.info.get("ecd_query_started"):
+        conn.info["ecd_query_started"].pop()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: opens a trace per HTTP request and, once the last body
+    byte is out, records latency by route template, stage totals and query
+    count, and prints slow requests (SLOW_REQUEST_MS) with their breakdown.
+    """
+
+    def __init__(self, app, slow_request_ms: float = SLOW_REQUEST_MS):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+        self._templates = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = _trace.set(trace)
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_and_watch(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                self._finish(scope, trace, status[0], started)
+
+        try:
+            await self.app(scope, receive, send_and_watch)
+        finally:
+            self._finish(scope, trace, status[0], started)
+            _trace.reset(token)
+
+    def _finish(self, scope, trace: RequestTrace, status: int, started: float):
+        # Background tasks run after the body: they are not part of the request's latency
+        if trace.done:
+            return
+        trace.done = True
+        seconds = time.perf_counter() - started
+        route = self._route(scope)
+        REQUEST_SECONDS.observe(seconds, scope["method"], route, str(status))
+        REQUEST_QUERIES.observe(trace.db_queries, route)
+        for stage, stage_seconds in trace.stages.items():
+            STAGE_SECONDS.observe(stage_seconds, stage)
+
+        if self.slow_request_ms and seconds * 1000 >= self.slow_request_ms:
+            breakdown = ", ".join(
+                f"{stage} {stage_seconds * 1000:.1f} ms"
+                for stage, stage_seconds in sorted(trace.stages.items(), key=lambda item: -item[1])
+            )
+            slow_request_log.warning(
+                "Slow request: %s %s %s in %.1f ms (%d queries) | %s",
+                scope["method"], route, status, seconds * 1000, trace.db_queries, breakdown or "no stages",
+                extra={"method": scope["method"], "route": route, "status": status,
+                       "duration_ms": round(seconds * 1000, 3), "db_queries": trace.db_queries,
+                       "stages_ms": {stage: round(s * 1000, 3) for stage, s in trace.stages.items()}},
+            )
+
+    def _route(self, scope) -> str:
+        # Templates ("/files/{file_id}/download"), never raw paths: label values stay bounded
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._templates is None and "app" in scope:
+            self._templates = {
+                route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")
+            }
+        return (self._templates or {}).get(endpoint, "unmatched")
@@ -0,0 +1,180 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+# create_all() only creates missing tables, so columns added to existing
+# tables are upgraded here. Every step is idempotent and runs on startup.
+# table -> [(column, SQL type + default)]
+COLUMN_UPGRADES = {
+    "users": [
+        ("wrapped_master_key", "VARCHAR"),
+        ("dedup_enabled", "BOOLEAN DEFAULT 0"),
+        ("listing_version", "BIGINT NOT NULL DEFAULT 0"),
+    ],
+    "files": [
+        ("folder_id", "INTEGER REFERENCES folders(id)"),
+        ("enc_version", "INTEGER DEFAULT 1"),
+        ("size_bytes", "BIGINT"),
+        ("category", "VARCHAR"),
+        ("object_id", "INTEGER REFERENCES stored_objects(id)"),
+        ("codec", "VARCHAR"),
+        ("stored_bytes", "BIGINT"),
+        ("deleted_at", "TIMESTAMP"),
+    ],
+    "stored_objects": [
+        ("codec", "VARCHAR"),
+        ("stored_bytes", "BIGINT"),
+    ],
+    "user_usage": [
+        ("stored_bytes", "BIGINT NOT NULL DEFAULT 0"),
+    ],
+    "folders": [
+        ("path", "VARCHAR"),
+    ],
+    "upload_sessions": [
+        ("segment_size", "INTEGER"),
+    ],
+    "upload_chunks": [
+        ("sha256", "VARCHAR"),
+    ],
+}
+
+BATCH_SIZE = 500
+
+def create_schema(engine):
+    """Creates missing tables, then upgrades existing ones: the startup step behind CREATE_SCHEMA."""
+    from app.core.database import Base
+    import app.models.user  # noqa: F401 (registers the tables)
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+
+def run_migrations(engine):
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, columns in COLUMN_UPGRADES.items():
+            if not inspector.has_table(table):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table)}
+            for name, ddl in columns:
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+    # Indexes declared on models after their table already existed
+    from app.core.database import Base
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    # Filename search: FTS5 tables + triggers (SQLite) / trigram indexes (PostgreSQL)
+    from app.services.search import create_search_index
+    create_search_index(engine)
+
+    # Listing ETags: users.listing_version bumped by triggers on files / folders / user_usage
+    from app.services.http_cache import create_listing_triggers
+    create_listing_triggers(engine)
+
+    with Session(engine) as db:
+        wrap_legacy_file_keys(db)
+        backfill_sizes(db)
+        backfill_folder_paths(db)
+
+def wrap_legacy_file_keys(db: Session) -> int:
+    """
+    Rows written before the key hierarchy store the raw data key as hex.
+    Wrap them under their owner's master key (the data key itself, and so
+    the stored ciphertext, stay the same). Returns the number of rows upgraded.
+    """
+    from app.core.crypto_utils import CryptoUtils, KeyManager, WRAPPED_PREFIX
+    from app.models.user import File
+
+    upgraded = 0
+    last_id = 0
+    while True:
+        batch = db.query(File.id, File.owner_id, File.encryption_key).filter(
+            File.id > last_id,
+            ~File.encryption_key.startswith(WRAPPED_PREFIX)
+        ).order_by(File.id).limit(BATCH_SIZE).all()
+        if not batch:
+            return upgraded
+        # Keys first: a missing one is created in its own transaction, which must not
+        # wait behind this batch's updates (SQLite has one writer)
+        master_keys = {owner_id: KeyManager.master_key(db, owner_id) for owner_id in {row.owner_id for row in batch}}
+        for file_id, owner_id, raw_key in batch:
+            wrapped = CryptoUtils.wrap_key(master_keys[owner_id], bytes.fromhex(raw_key))
+            db.query(File).filter(File.id == file_id).update({File.encryption_key: wrapped}, synchronize_session=False)
+        last_id = batch[-1].id
+        upgraded += len(batch)
+        db.commit()
+
+def backfill_sizes(db: Session) -> int:
+    """
+    Fills File.size_bytes / File.category for rows that predate them and
+    rebuilds the per-user usage totals. Sizes come from the stored display
+    string ("5.20 MB"), so they are approximate; reading the objects back
+    from storage on startup would be far slower. Returns the rows upgraded.
+    """
+    from app.models.user import File, UserUsage
+    from app.services.usage import UsageService
+    from app.utils.file_types import categorize, parse_size
+
+    upgraded = 0
+    last_id = 0
+    while True:
+        batch = db.query(File.id, File.filename, File.size).filter(
+            File.id > last_id,
+            File.size_bytes.is_(None)
+        ).order_by(File.id).limit(BATCH_SIZE).all()
+        if not batch:
+            break
+        for file_id, filename, size in batch:
+            db.query(File).filter(File.id == file_id).update({
+                File.size_bytes: parse_size(size),
+                File.category: categorize(filename or ""),
+            }, synchronize_session=False)
+        last_id = batch[-1].id
+        upgraded += len(batch)
+        db.commit()
+
+    # Totals table is new (or stale, or predates stored_bytes): recompute once from the files table
+    stale = db.query(UserUsage).filter(UserUsage.total_bytes > 0, UserUsage.stored_bytes == 0).first() is not None
+    if upgraded or stale or (db.query(UserUsage).first() is None and db.query(File.id).first() is not None):
+        UsageService.rebuild(db)
+    return upgraded
+
+def backfill_folder_paths(db: Session) -> int:
+    """
+    Computes Folder.path for folders created before materialized paths.
+    Only (id, parent_id) pairs are loaded, so even large trees fit in memory.
+    Returns the number of folders updated.
+    """
+    from app.models.user import Folder
+
+    if db.query(Folder.id).filter(Folder.path.is_(None)).first() is None:
+        return 0
+
+    parents = dict(db.query(Folder.id, Folder.parent_id).all())
+    paths = dict(db.query(Folder.id, Folder.path).filter(Folder.path.isnot(None)).all())
+    def path_of(folder_id):
+        # Iterative walk up to the first known path (or the root)
+        chain = []
+        while folder_id is not None and folder_id not in paths:
+            chain.append(folder_id)
+            folder_id = parents.get(folder_id)
+        prefix = paths.get(folder_id, "/")
+        for fid in reversed(chain):
+            prefix = paths[fid] = f"{prefix}{fid}/"
+        return prefix
+
+    missing = [fid for (fid,) in db.query(Folder.id).filter(Folder.path.is_(None)).order_by(Folder.id).all()]
+    for i in range(0, len(missing), BATCH_SIZE):
+        for fid in missing[i:i + BATCH_SIZE]:
+            db.query(Folder).filter(Folder.id == fid).update({Folder.path: path_of(fid)}, synchronize_session=False)
+        db.commit()
+    return len(missing)
+
+
+if __name__ == "__main__":
+    # python -m app.core.migrations  (once per deploy when CREATE_SCHEMA=false)
+    from app.core.database import get_engine
+    create_schema(get_engine())
+    print("✅ Migrations applied")
@@ -0,0 +1,43 @@
+from sqlalchemy import event, inspect
+from app.core.config import settings
+from app.core.ttl_cache import TTLCache
+from app.core.crypto_utils import master_key_cache
+from app.models.user import User
+
+PRINCIPAL_CACHE_SIZE = settings.principal_cache_size
+PRINCIPAL_CACHE_TTL = settings.principal_cache_ttl  # seconds
+
+
+class Principal:
+    """
+    What routes get as `current_user`: plain attributes, detached from any
+    Session, so nothing can trigger a lazy load of `files` / `folders`.
+    """
+    __slots__ = ("id", "email", "full_name", "dedup_enabled")
+
+    def __init__(self, id: int, email: str, full_name: str, dedup_enabled: bool = False):
+        self.id = id
+        self.email = email
+        self.full_name = full_name
+        self.dedup_enabled = bool(dedup_enabled)
+
+
+# (token subject, token id) -> Principal
+principal_cache = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+def invalidate_user(user_id: int) -> int:
+    """Drops every cached token of a user (all token ids, old emails included)."""
+    return principal_cache.forget_where(lambda _, principal: principal.id == user_id)
+
+
+# --- INVALIDATION: any ORM update / delete of a user row ---
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target):
+    invalidate_user(target.id)
+    if inspect(target).attrs.wrapped_master_key.history.has_changes():
+        master_key_cache.forget(target.id)
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target):
+    invalidate_user(target.id)
+    master_key_cache.forget(target.id)
@@ -1,19 +1,17 @@
-import os
+import secrets
 from datetime import datetime, timedelta
 from jose import jwt
-from dotenv import load_dotenv
+from app.core.config import settings
 
-# 1. Load the secrets from the .env file
-load_dotenv()
-
-# 2. Get the values (or use defaults if missing)
-SECRET_KEY = os.getenv("SECRET_KEY", "fallback-secret-key")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+# One key signs and checks every token (login JWTs, share download tokens)
+SECRET_KEY = settings.secret_key
+ALGORITHM = settings.algorithm
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
 
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # jti: token id, so cached principals can be keyed per token
+    to_encode.update({"exp": expire, "jti": secrets.token_urlsafe(8)})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
@@ -1,44 +1,73 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.core.database import engine, Base
-from app.api import auth, files, share  
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(
-    title="ECD - Encrypted Cloud Drive",
-    description="Zero-knowledge encrypted storage API",
-    version="1.0.0"
-)
-
-# ... (CORS middleware stays the same) ...
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"], 
-    allow_credentials=False,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(auth.router)
-app.include_router(files.router)
-app.include_router(share.router) # <--- 2. Add this line
-
-@app.get("/")
-def read_root():
-    return {"message": "Welcome to ECD Secure Backend", "status": "running"}
-
-@app.get("/health")
-def health_check():
-    return {"status": "ok"}
-
-# ... other imports
-from app.api import auth, files, share, folders # <--- Import folders
-
-# ...
-
-app.include_router(auth.router)
-app.include_router(files.router)
-app.include_router(folders.router) # <--- Register it
-app.include_router(share.router)
\ No newline at end of file
+from app.core.config import settings
+from app.core.crypto_utils import check_master_key_secret
+from app.core.database import dispose_async_engine, dispose_engines, get_engine
+from app.core.metrics import MetricsMiddleware
+from app.core.migrations import create_schema
+from app.services.compression import default_codec
+from app.services.storage import get_storage
+from app.services.trash import trash_purger
+from app.api import auth, files, folders, search, share, system, trash, uploads
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in every worker after it has started (after the fork on pre-fork
+    # servers), so connections, clients and threads belong to that worker
+    # 1. Fail now, not on the first upload: no MASTER_KEY_SECRET, or a COMPRESSION_CODEC that isn't installed
+    check_master_key_secret(settings)
+    default_codec()
+    # 2. Schema: create missing tables + migrations (CREATE_SCHEMA=false to run them once per deploy instead)
+    if settings.create_schema:
+        create_schema(get_engine())
+    # 3. Storage client, so the first request doesn't pay for it
+    get_storage()
+    # 4. Background purge of expired trash and queued storage deletes (TRASH_PURGER=false to run it elsewhere)
+    if settings.trash_purger:
+        trash_purger.start()
+    yield
+    trash_purger.stop()
+    dispose_engines()
+    await dispose_async_engine()
+
+
+def create_app() -> FastAPI:
+    """
+    Builds the API. Importing this module does no I/O: that waits for the lifespan startup.
+    Configuration is the environment (app.core.config.settings), which modules read at import.
+    """
+    app = FastAPI(
+        title="ECD - Encrypted Cloud Drive",
+        description="Zero-knowledge encrypted storage API",
+        version="1.0.0",
+        lifespan=lifespan,
+    )
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=False,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Per-route / per-stage timings, query counts, slow-request log (SLOW_REQUEST_MS)
+    app.add_middleware(MetricsMiddleware)
+
+    for module in (auth, files, folders, uploads, search, trash, share, system):
+        app.include_router(module.router)
+
+    @app.get("/")
+    def read_root():
+        return {"message": "Welcome to ECD Secure Backend", "status": "running"}
+
+    @app.get("/health")
+    def health_check():
+        return {"status": "ok"}
+
+    return app
+
+
+# uvicorn app.main:app  (or: uvicorn --factory app.main:create_app)
+app = create_app()
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, BigInteger, String, DateTime
 from sqlalchemy.orm import relationship, backref
 from datetime import datetime
 from app.core.database import Base
@@ -9,6 +9,10 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     full_name = Column(String)
+    wrapped_master_key = Column(String, nullable=True) # Per-user key, wrapped by the server KEK
+    dedup_enabled = Column(Boolean, default=False) # Opt-in: identical re-uploads share one stored object
+    # Bumped by triggers on every write to the user's files / folders / usage (listing ETags)
+    listing_version = Column(BigInteger, nullable=False, default=0, server_default="0")
     
     # Relationships
     files = relationship("File", back_populates="owner")
@@ -21,6 +25,9 @@ class Folder(Base):
     
     # Hierarchy: A folder can have a parent folder
     parent_id = Column(Integer, ForeignKey("folders.id"), nullable=True)
+    # Materialized path of ids, root first, self included: "/3/17/42/".
+    # A subtree is every folder whose path starts with this one's.
+    path = Column(String, index=True)
     owner_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -30,18 +37,31 @@ class Folder(Base):
     subfolders = relationship("Folder", backref=backref('parent', remote_side=[id]))
     files = relationship("File", back_populates="folder")
 
+    # Keyset pagination of a folder's subfolders: WHERE owner/parent ORDER BY <sort>, id
+    __table_args__ = (
+        Index("ix_folders_owner_parent_name", "owner_id", "parent_id", "name", "id"),
+        Index("ix_folders_owner_parent_created", "owner_id", "parent_id", "created_at", "id"),
+    )
+
 class File(Base):
     __tablename__ = "files"
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, index=True)
     file_type = Column(String)
-    size = Column(String)
+    size = Column(String) # Display string ("5.20 MB"); use size_bytes for maths
+    size_bytes = Column(BigInteger, default=0)
+    category = Column(String, default="Others") # Images / Documents / Videos / Audio / Others
     upload_date = Column(DateTime, default=datetime.utcnow)
     
     # Security Metadata
     encryption_key = Column(String) 
     nonce = Column(String)
     storage_path = Column(String)
+    enc_version = Column(Integer, default=1) # 1 = legacy single blob, 2 = segmented stream
+    object_id = Column(Integer, ForeignKey("stored_objects.id"), nullable=True) # Set when deduplicated
+    codec = Column(String, nullable=True) # Compression before encryption: None / "zlib" / "zstd"
+    stored_bytes = Column(BigInteger, nullable=True) # Plaintext bytes after compression (None = size_bytes)
+    deleted_at = Column(DateTime, nullable=True) # Set = in the trash; the purger removes it after TRASH_RETENTION_DAYS
     
     # Ownership & Location
     owner_id = Column(Integer, ForeignKey("users.id"))
@@ -50,6 +70,18 @@ class File(Base):
     owner = relationship("User", back_populates="files")
     folder = relationship("Folder", back_populates="files")
 
+    # Keyset pagination: one index per sort key, per folder and across all of a user's files
+    __table_args__ = (
+        Index("ix_files_owner_folder_name", "owner_id", "folder_id", "filename", "id"),
+        Index("ix_files_owner_folder_date", "owner_id", "folder_id", "upload_date", "id"),
+        Index("ix_files_owner_folder_size", "owner_id", "folder_id", "size_bytes", "id"),
+        Index("ix_files_owner_name", "owner_id", "filename", "id"),
+        Index("ix_files_owner_date", "owner_id", "upload_date", "id"),
+        Index("ix_files_owner_size", "owner_id", "size_bytes", "id"),
+        Index("ix_files_owner_deleted", "owner_id", "deleted_at", "id"), # Trash listing / expiry
+        Index("ix_files_storage_path", "storage_path"), # Orphan reconciliation
+    )
+
 class SharedLink(Base):
     __tablename__ = "shared_links"
     id = Column(Integer, primary_key=True, index=True)
@@ -59,4 +91,82 @@ class SharedLink(Base):
     expires_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    file = relationship("File")
\ No newline at end of file
+    file = relationship("File")
+
+class StoredObject(Base):
+    """
+    One encrypted object shared by a user's identical files (dedup). Scoped to
+    a single owner and found by a keyed per-user fingerprint, so nothing about
+    one user's content can be learned from another's uploads.
+    """
+    __tablename__ = "stored_objects"
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    fingerprint = Column(String, nullable=False) # HMAC-SHA256(user dedup key, plaintext)
+    storage_path = Column(String, nullable=False)
+    encryption_key = Column(String, nullable=False) # Wrapped, like File.encryption_key
+    nonce = Column(String, nullable=False)
+    enc_version = Column(Integer, default=2)
+    codec = Column(String, nullable=True)
+    size_bytes = Column(BigInteger, default=0)
+    stored_bytes = Column(BigInteger, nullable=True)
+    ref_count = Column(Integer, default=1, nullable=False) # File rows pointing here
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ux_stored_objects_owner_fingerprint", "owner_id", "fingerprint", unique=True),
+        Index("ix_stored_objects_storage_path", "storage_path"),
+    )
+
+class UploadSession(Base):
+    """A resumable upload in progress: chunks are encrypted and staged as storage parts."""
+    __tablename__ = "upload_sessions"
+    id = Column(String, primary_key=True) # Random token, also the URL id
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    filename = Column(String, nullable=False)
+    folder_id = Column(Integer, ForeignKey("folders.id"), nullable=True)
+    total_size = Column(BigInteger, nullable=False)
+    chunk_size = Column(Integer, nullable=False)
+    chunk_count = Column(Integer, nullable=False)
+    segment_size = Column(Integer, nullable=True) # ENCRYPTION_SEGMENT_SIZE at creation; NULL: older sessions
+
+    # Where the parts go, and the key / nonce prefix they are encrypted with
+    storage_path = Column(String, nullable=False)
+    storage_upload_id = Column(String, nullable=False)
+    encryption_key = Column(String, nullable=False)
+    nonce = Column(String, nullable=False)
+
+    status = Column(String, default="open") # open -> completing (claimed by one finalize call)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True) # Pushed back by every chunk; GC'd after
+
+class UploadChunk(Base):
+    __tablename__ = "upload_chunks"
+    session_id = Column(String, ForeignKey("upload_sessions.id"), primary_key=True)
+    index = Column(Integer, primary_key=True) # 0-based; storage part number is index + 1
+    etag = Column(String, nullable=False) # "" while the part is being encrypted / uploaded
+    size = Column(Integer, nullable=False)
+    # Chunks are encrypted under fixed nonces: a re-send must carry the same plaintext
+    sha256 = Column(String, nullable=True)
+
+class UserUsage(Base):
+    """Running totals per user and category, kept in step with files on upload/delete."""
+    __tablename__ = "user_usage"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    category = Column(String, primary_key=True)
+    total_bytes = Column(BigInteger, default=0, nullable=False)
+    stored_bytes = Column(BigInteger, default=0, nullable=False) # After compression
+    file_count = Column(Integer, default=0, nullable=False)
+
+class PendingDeletion(Base):
+    """
+    A stored object no row references any more, queued in the transaction
+    that dropped its last row. The purger deletes it, retrying with backoff.
+    """
+    __tablename__ = "pending_deletions"
+    id = Column(Integer, primary_key=True, index=True)
+    storage_path = Column(String, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True) # Also the lease of a claimed batch
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
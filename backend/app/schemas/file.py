@@ -0,0 +1,61 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel
+
+# Listing rows: only what the UI shows. Keys, nonces and storage paths never leave the DB.
+class FileShow(BaseModel):
+    id: int
+    filename: str
+    file_type: Optional[str] = None
+    size: Optional[str] = None
+    size_bytes: Optional[int] = None
+    category: Optional[str] = None
+    upload_date: Optional[datetime] = None
+    folder_id: Optional[int] = None
+    class Config:
+        from_attributes = True
+
+class FolderShow(BaseModel):
+    id: int
+    name: str
+    parent_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    class Config:
+        from_attributes = True
+
+# Pages (Out) - pass next_cursor back as ?cursor= to continue
+class FilePage(BaseModel):
+    items: List[FileShow]
+    next_cursor: Optional[str] = None
+
+class TrashShow(FileShow):
+    deleted_at: datetime
+
+class TrashPage(BaseModel):
+    items: List[TrashShow]
+    next_cursor: Optional[str] = None
+
+class FolderContent(BaseModel):
+    folders: List[FolderShow]
+    files: List[FileShow]
+    current_folder_id: Optional[int] = None
+    next_folder_cursor: Optional[str] = None
+    next_cursor: Optional[str] = None
+
+# Search hits: files and folders in one ranked list (folder_id = parent for folders)
+class SearchHit(BaseModel):
+    kind: str # "file" | "folder"
+    id: int
+    name: str
+    file_type: Optional[str] = None
+    size: Optional[str] = None
+    size_bytes: Optional[int] = None
+    category: Optional[str] = None
+    date: Optional[datetime] = None
+    folder_id: Optional[int] = None
+    score: float = 0.0
+
+class SearchPage(BaseModel):
+    items: List[SearchHit]
+    next_cursor: Optional[str] = None
+    truncated: bool = False # only the newest SEARCH_CANDIDATES matches were ranked: narrow the query
@@ -0,0 +1,238 @@
+import asyncio
+import io
+import zipfile
+from typing import Iterator, Optional
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.crypto_utils import CryptoUtils, KeyManager
+from app.core.metrics import span
+from app.models.user import File as FileModel, SharedLink
+from app.services.compression import CompressingReader, choose_codec
+from app.services.dedup import DedupService
+from app.services.downloads import plaintext_stream
+from app.services.encryption import StreamEncryptor, EncryptingReader, FORMAT_SEGMENTED
+from app.services.share_links import ShareLinks
+from app.services.storage import get_storage
+from app.services.transfer import working_set
+from app.services.usage import UsageService
+from app.utils.file_types import categorize, format_size
+
+UPLOAD_BATCH_MAX_FILES = settings.upload_batch_max_files
+# Files of one batch encrypted + uploaded at once
+UPLOAD_BATCH_CONCURRENCY = settings.upload_batch_concurrency
+# Storage objects removed per call (S3 DeleteObjects caps at 1000)
+PURGE_BATCH_SIZE = 1000
+
+# What an archive entry needs: name, place, and how to decrypt it
+ZIP_COLUMNS = (
+    FileModel.id, FileModel.filename, FileModel.folder_id, FileModel.upload_date, FileModel.owner_id,
+    FileModel.encryption_key, FileModel.nonce, FileModel.storage_path, FileModel.enc_version, FileModel.codec,
+)
+
+
+class BulkService:
+    """Uploads, deletes and downloads of many files with one commit / one stream."""
+
+    @staticmethod
+    async def stage_uploads(db: Session, user, uploads: list, folder_id: Optional[int] = None) -> list:
+        """
+        Stores every upload and adds its File row (+ usage, dedup refs) to the
+        session without committing: the caller commits once for the batch.
+        If any upload fails, objects already written are removed again.
+        Returns [(File row, deduplicated)] in upload order.
+        """
+        # A. Per-file data keys get wrapped under the user's (cached) master key
+        master_key = await run_in_threadpool(KeyManager.master_key, db, user.id)
+
+        # B. Dedup (opt-in): same content already stored for this user -> new row, no upload
+        plans = []
+        for upload in uploads:
+            fingerprint, shared = None, None
+            if user.dedup_enabled:
+                await upload.seek(0)
+                with span("fingerprint"):
+                    fingerprint = await run_in_threadpool(DedupService.fingerprint, upload.file, DedupService.fingerprint_key(master_key))
+                shared = await run_in_threadpool(DedupService.acquire, db, user.id, fingerprint)
+            plans.append((upload, fingerprint, shared))
+
+        # C. Store the rest, a few at a time
+        semaphore = asyncio.Semaphore(UPLOAD_BATCH_CONCURRENCY)
+        async def store(upload):
+            async with semaphore:
+                return await BulkService._store(upload, master_key)
+        pending = [upload for upload, _, shared in plans if shared is None]
+        results = await asyncio.gather(*(store(upload) for upload in pending), return_exceptions=True)
+        failed = [r for r in results if isinstance(r, BaseException)]
+        if failed:
+            written = [r["storage_path"] for r in results if not isinstance(r, BaseException)]
+            if written:
+                await get_storage().adelete_files(written)
+            raise failed[0]
+        stored = dict(zip(map(id, pending), results))
+
+        # D. Save Metadata (+ usage totals, same transaction): Session calls block, so off the event loop
+        return await run_in_threadpool(BulkService._add_rows, db, user.id, plans, stored, folder_id)
+
+    @staticmethod
+    def _add_rows(db: Session, owner_id: int, plans: list, stored: dict, folder_id: Optional[int]) -> list:
+        staged = []
+        for upload, fingerprint, shared in plans:
+            category = categorize(upload.filename)
+            metadata = dict(
+                filename=upload.filename,
+                file_type=upload.filename.split('.')[-1] if '.' in upload.filename else "unknown",
+                category=category,
+                owner_id=owner_id,
+                folder_id=folder_id
+            )
+            if shared is not None:
+                columns = dict(
+                    size=format_size(shared.size_bytes),
+                    size_bytes=shared.size_bytes,
+                    stored_bytes=shared.stored_bytes,
+                    codec=shared.codec,
+                    encryption_key=shared.encryption_key,
+                    nonce=shared.nonce,
+                    enc_version=shared.enc_version,
+                    storage_path=shared.storage_path,
+                    object_id=shared.id
+                )
+            else:
+                columns = stored[id(upload)]
+            new_file = FileModel(**metadata, **columns)
+            db.add(new_file)
+            if fingerprint and shared is None:
+                DedupService.register(db, new_file, fingerprint)
+            UsageService.record(db, owner_id, category, new_file.size_bytes, 1, new_file.stored_bytes)
+            staged.append((new_file, shared is not None))
+        return staged
+
+    @staticmethod
+    def upload_cost(uploads: list) -> int:
+        """Memory stage_uploads() holds at most (for admission): its largest concurrent stores."""
+        costs = sorted((working_set(upload.size) for upload in uploads), reverse=True)
+        return sum(costs[:UPLOAD_BATCH_CONCURRENCY])
+
+    @staticmethod
+    async def _store(upload: UploadFile, master_key: bytes) -> dict:
+        """Compresses (maybe), encrypts and uploads one file. Returns its File columns."""
+        file_key, wrapped_key = KeyManager.new_file_key(master_key)
+        salt = CryptoUtils.generate_salt()
+
+        # Compress first unless the type / a probe of the content says it won't pay off
+        await upload.seek(0)
+        with span("compress_probe"):
+            codec = await run_in_threadpool(choose_codec, upload.file, upload.filename)
+        source = CompressingReader(upload.file, codec) if codec else upload.file
+
+        # Stream Upload: spooled upload -> (compressor) -> encryptor -> storage, one segment in memory at a time
+        encryptor = StreamEncryptor(file_key)
+        reader = EncryptingReader(source, encryptor)
+        safe_filename = f"enc_{CryptoUtils.encode_salt(salt)[:8]}_{upload.filename}"
+        await get_storage().aupload_stream(reader, safe_filename)
+
+        # Sizes: original and as stored
+        stored_bytes = reader.plaintext_bytes
+        size_bytes = source.raw_bytes if codec else stored_bytes
+        return dict(
+            size=format_size(size_bytes),
+            size_bytes=size_bytes,
+            stored_bytes=stored_bytes,
+            codec=codec,
+            encryption_key=wrapped_key,
+            nonce=encryptor.nonce_prefix.hex(),
+            enc_version=FORMAT_SEGMENTED,
+            storage_path=safe_filename
+        )
+
+    @staticmethod
+    def delete_where(db: Session, owner_id: int, *file_filter) -> list:
+        """
+        Deletes a user's files matching `file_filter` with their share links,
+        dedup references and usage totals, in a fixed number of queries and
+        without committing. Returns the storage paths to purge after commit.
+        """
+        matching = (FileModel.owner_id == owner_id, *file_filter)
+        usage = db.query(
+            FileModel.category,
+            func.coalesce(func.sum(FileModel.size_bytes), 0),
+            func.coalesce(func.sum(func.coalesce(FileModel.stored_bytes, FileModel.size_bytes)), 0),
+            func.count(FileModel.id)
+        ).filter(*matching).group_by(FileModel.category).all()
+        storage_paths = DedupService.release_where(db, owner_id, *file_filter)
+
+        db.query(SharedLink).filter(
+            SharedLink.file_id.in_(select(FileModel.id).where(*matching))
+        ).delete(synchronize_session=False)
+        ShareLinks.forget_owner(owner_id)
+        db.query(FileModel).filter(*matching).delete(synchronize_session=False)
+        for category, total_bytes, stored_bytes, count in usage: # one row per category, at most 5
+            UsageService.record(db, owner_id, category or "Others", -total_bytes, -count, -stored_bytes)
+        return storage_paths
+
+    @staticmethod
+    def zip_entries(db: Session, owner_id: int, rows, prefixes: Optional[dict] = None) -> list:
+        """
+        (archive name, row, data key) for each file row. Keys are resolved now,
+        while the request's DB session is still open. `prefixes` maps
+        folder_id -> "Parent/Child/" for folder downloads.
+        """
+        entries, taken = [], set()
+        for row in rows:
+            name = (prefixes or {}).get(row.folder_id, "") + (row.filename or f"file-{row.id}")
+            unique, n = name, 1
+            while unique in taken:
+                stem, dot, ext = name.rpartition(".")
+                unique = f"{stem} ({n}).{ext}" if dot and stem else f"{name} ({n})"
+                n += 1
+            taken.add(unique)
+            entries.append((unique, row, KeyManager.file_key(db, row)))
+        return entries
+
+    @staticmethod
+    def zip_stream(entries: list) -> Iterator[bytes]:
+        """
+        Streams a ZIP of the entries. Each file is decrypted as it is written,
+        so memory holds about one segment, never the archive. Entries are
+        stored (no deflate): most uploads are either already compressed or
+        were just decompressed by us, and STORED keeps this I/O bound.
+        """
+        sink = _ZipSink()
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as archive:
+            for name, row, key_bytes in entries:
+                info = zipfile.ZipInfo(name, date_time=(row.upload_date.timetuple()[:6] if row.upload_date else (1980, 1, 1, 0, 0, 0)))
+                # Sizes are unknown to zipfile up front: always reserve zip64 fields
+                with archive.open(info, "w", force_zip64=True) as dest:
+                    for chunk in plaintext_stream(row, key_bytes):
+                        dest.write(chunk)
+                        if sink.pending:
+                            yield sink.drain()
+                if sink.pending:
+                    yield sink.drain()
+        yield sink.drain() # central directory
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, unseekable buffer: zipfile then writes data descriptors instead of seeking back."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self.pending = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        self.pending += len(b)
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self.pending = 0
+        return data
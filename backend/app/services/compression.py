@@ -0,0 +1,124 @@
+import math
+import zlib
+from typing import Iterable, Iterator, Optional
+from app.core.config import settings
+from app.core.metrics import span
+from app.utils.file_types import COMPRESSED_EXTENSIONS, file_extension
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is always there
+    zstandard = None
+
+# zlib | zstd | none. Objects stay readable only where their codec is installed,
+# so zstd (optional dependency) is never picked implicitly
+COMPRESSION_CODEC = settings.compression_codec.lower()
+COMPRESSION_LEVEL = settings.compression_level  # codec default when unset
+# Probe of the first bytes: above this many bits per byte the data is treated as incompressible
+COMPRESSION_MAX_ENTROPY = settings.compression_max_entropy
+PROBE_SIZE = 64 * 1024
+READ_SIZE = 256 * 1024
+
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+
+
+def available_codecs() -> list:
+    return [CODEC_ZLIB] + ([CODEC_ZSTD] if zstandard else [])
+
+def default_codec() -> Optional[str]:
+    """The configured codec; raises when it isn't installed (checked at startup)."""
+    if COMPRESSION_CODEC in ("none", "off", ""):
+        return None
+    if COMPRESSION_CODEC not in available_codecs():
+        raise ValueError(f"Compression codec not available: {COMPRESSION_CODEC}")
+    return COMPRESSION_CODEC
+
+
+def entropy(data: bytes) -> float:
+    """Shannon entropy in bits per byte (8.0 = random / already compressed)."""
+    if not data:
+        return 0.0
+    total = len(data)
+    counts = [data.count(bytes([b])) for b in set(data)]
+    return -sum(c / total * math.log2(c / total) for c in counts)
+
+def choose_codec(file_obj, filename: str, codec: Optional[str] = None) -> Optional[str]:
+    """
+    Codec for an upload, or None to store it as is: known compressed formats
+    are skipped by extension, anything else by probing its first bytes.
+    Reads from and rewinds to the current position.
+    """
+    codec = codec or default_codec()
+    if codec is None or file_extension(filename) in COMPRESSED_EXTENSIONS:
+        return None
+    start = file_obj.tell()
+    probe = file_obj.read(PROBE_SIZE)
+    file_obj.seek(start)
+    if not probe or entropy(probe) > COMPRESSION_MAX_ENTROPY:
+        return None
+    return codec
+
+
+def _compressor(codec: str):
+    level = COMPRESSION_LEVEL
+    if codec == CODEC_ZLIB:
+        return zlib.compressobj(6 if level is None else level)
+    if codec == CODEC_ZSTD and zstandard:
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compressobj()
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+def _decompressor(codec: str):
+    if codec == CODEC_ZLIB:
+        return zlib.decompressobj()
+    if codec == CODEC_ZSTD and zstandard:
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+
+class CompressingReader:
+    """
+    File-like view of `source` compressed on the fly; sits in front of the
+    encryptor. `raw_bytes` counts what was read from the source.
+    """
+
+    def __init__(self, source, codec: str):
+        self._source = source
+        self._compressor = _compressor(codec)
+        self._buffer = bytearray()
+        self._eof = False
+        self.raw_bytes = 0
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self._source.read(READ_SIZE)
+            if chunk:
+                self.raw_bytes += len(chunk)
+                with span("compress"):
+                    self._buffer += self._compressor.compress(chunk)
+            else:
+                with span("compress"):
+                    self._buffer += self._compressor.flush()
+                self._eof = True
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+def decompress_stream(chunks: Iterable[bytes], codec: Optional[str]) -> Iterator[bytes]:
+    """Streams decompressed bytes (pass-through when the file was stored as is)."""
+    if not codec:
+        yield from chunks
+        return
+    decompressor = _decompressor(codec)
+    for chunk in chunks:
+        with span("decompress"):
+            data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    if hasattr(decompressor, "flush"):
+        data = decompressor.flush()
+        if data:
+            yield data
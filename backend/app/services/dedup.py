@@ -0,0 +1,112 @@
+import hashlib
+import hmac
+from typing import Optional
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.crypto_utils import CryptoUtils
+from app.models.user import File as FileModel, StoredObject
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class DedupService:
+    """
+    Per-user content-addressed storage. A fingerprint is an HMAC of the
+    plaintext under a key derived from the user's master key, and lookups
+    always include the owner: equal files of two users get unrelated
+    fingerprints and separate objects, so dedup hits reveal nothing across users.
+    """
+
+    @staticmethod
+    def fingerprint_key(master_key: bytes) -> bytes:
+        return CryptoUtils.hkdf(master_key, b"ecd/dedup/v1")
+
+    @staticmethod
+    def fingerprint(file_obj, key: bytes) -> str:
+        """Hashes a (spooled) upload from its current position, then rewinds to it."""
+        start = file_obj.tell()
+        mac = hmac.new(key, digestmod=hashlib.sha256)
+        while True:
+            chunk = file_obj.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            mac.update(chunk)
+        file_obj.seek(start)
+        return mac.hexdigest()
+
+    @staticmethod
+    def acquire(db: Session, owner_id: int, fingerprint: str) -> Optional[StoredObject]:
+        """
+        Takes a reference on the user's object with this content, if any.
+        The conditional increment loses against a concurrent last release
+        (ref_count already 0), in which case the caller uploads as usual.
+        """
+        obj = db.query(StoredObject).filter(
+            StoredObject.owner_id == owner_id, StoredObject.fingerprint == fingerprint
+        ).first()
+        if obj is None:
+            return None
+        taken = db.query(StoredObject).filter(
+            StoredObject.id == obj.id, StoredObject.ref_count > 0
+        ).update({StoredObject.ref_count: StoredObject.ref_count + 1}, synchronize_session=False)
+        return obj if taken else None
+
+    @staticmethod
+    def register(db: Session, file_record: FileModel, fingerprint: str):
+        """
+        Makes a freshly uploaded file the first reference of a new object.
+        If a concurrent upload of the same content registered first, the file
+        simply stays un-deduplicated (it owns its own object).
+        """
+        obj = StoredObject(
+            owner_id=file_record.owner_id,
+            fingerprint=fingerprint,
+            storage_path=file_record.storage_path,
+            encryption_key=file_record.encryption_key,
+            nonce=file_record.nonce,
+            enc_version=file_record.enc_version,
+            codec=file_record.codec,
+            size_bytes=file_record.size_bytes,
+            stored_bytes=file_record.stored_bytes,
+            ref_count=1,
+        )
+        try:
+            with db.begin_nested():
+                db.add(obj)
+                db.flush()
+        except IntegrityError:
+            return
+        file_record.object_id = obj.id
+
+    @staticmethod
+    def release(db: Session, file_record: FileModel) -> list:
+        """Drops one file's reference; see release_where()."""
+        return DedupService.release_where(db, file_record.owner_id, FileModel.id == file_record.id)
+
+    @staticmethod
+    def release_where(db: Session, owner_id: int, *file_filter) -> list:
+        """
+        Drops the references held by every file matching `file_filter`, in a
+        fixed number of queries, inside the caller's transaction. Call before
+        deleting those rows. Returns the storage paths to delete after commit:
+        un-deduplicated files plus objects whose last reference just went.
+        """
+        matching = (FileModel.owner_id == owner_id, *file_filter)
+        paths = [p for (p,) in db.query(FileModel.storage_path).filter(*matching, FileModel.object_id.is_(None)).all()]
+
+        refs = select(func.count(FileModel.id)).where(
+            *matching, FileModel.object_id == StoredObject.id
+        ).scalar_subquery()
+        touched = select(FileModel.object_id).where(*matching, FileModel.object_id.isnot(None))
+        db.query(StoredObject).filter(StoredObject.id.in_(touched)).update(
+            {StoredObject.ref_count: StoredObject.ref_count - refs}, synchronize_session=False
+        )
+        dead = (StoredObject.owner_id == owner_id, StoredObject.ref_count <= 0)
+        paths.extend(p for (p,) in db.query(StoredObject.storage_path).filter(*dead).all())
+        # Unlink first: the caller deletes the file rows after us, in the same transaction
+        db.query(FileModel).filter(*matching, FileModel.object_id.in_(select(StoredObject.id).where(*dead))).update(
+            {FileModel.object_id: None}, synchronize_session=False
+        )
+        db.query(StoredObject).filter(*dead).delete(synchronize_session=False)
+        return paths
@@ -0,0 +1,222 @@
+import re
+from typing import Iterable, Iterator, Optional
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from app.services.storage import get_storage
+from app.core.executor import crypto_executor
+from app.services.compression import decompress_stream
+from app.services.http_cache import PRIVATE_CACHE_CONTROL
+from app.services.encryption import (
+    StreamDecryptor, decrypt_legacy, FORMAT_SEGMENTED, HEADER_SIZE, TAG_SIZE, plaintext_size,
+)
+from app.services.transfer import working_set
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def file_etag(file_record) -> str:
+    """Strong validator: the nonce is unique per stored object."""
+    return f'"{file_record.nonce}"'
+
+
+def download_cost(file_record) -> int:
+    """Memory a download holds (for admission): legacy blobs are fetched and decrypted whole."""
+    if file_record.enc_version != FORMAT_SEGMENTED:
+        return 2 * (file_record.size_bytes or 0)
+    return working_set(file_record.size_bytes)
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    Parses a single `bytes=` range into (start, end) with end inclusive.
+    Returns None when the header should be ignored (absent, multi-range, malformed).
+    Raises 416 when the range cannot be satisfied.
+    """
+    if not range_header or size == 0:
+        return None
+    match = _RANGE_RE.match(range_header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+def stream_download(request: Request, file_record, key_bytes: bytes) -> Response:
+    """
+    Builds the (partial) download response for a stored file. Segmented files
+    are decrypted while they stream and ranges only fetch the segments needed;
+    legacy single-blob files have to be fetched and decrypted whole.
+    """
+    headers = {
+        "Content-Disposition": f"attachment; filename={file_record.filename}",
+        "Accept-Ranges": "bytes",
+        "ETag": file_etag(file_record),
+        "Cache-Control": PRIVATE_CACHE_CONTROL,
+    }
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != headers["ETag"]:
+        range_header = None  # Client's copy is stale: send the whole new file
+
+    if file_record.enc_version != FORMAT_SEGMENTED:
+        return _legacy_download(file_record, key_bytes, range_header, headers)
+    if getattr(file_record, "codec", None):
+        return _compressed_download(file_record, key_bytes, range_header, headers)
+
+    if range_header:
+        # 16-byte GET: yields the segment size and the object size in one round trip
+        header_chunks, total_size = get_storage().get_stream(file_record.storage_path, 0, HEADER_SIZE - 1)
+        decryptor = _open_decryptor(key_bytes, b"".join(header_chunks))
+        size = plaintext_size(total_size, decryptor.segment_size)
+        byte_range = parse_range(range_header, size)
+        if byte_range:
+            return _ranged_download(file_record, decryptor, size, total_size, byte_range, headers)
+
+    chunks, total_size = get_storage().get_stream(file_record.storage_path)
+    header, chunks = _split_header(chunks)
+    decryptor = _open_decryptor(key_bytes, header)
+    headers["Content-Length"] = str(plaintext_size(total_size, decryptor.segment_size))
+    return StreamingResponse(
+        _guard(decryptor.decrypt_stream(chunks), file_record),
+        media_type="application/octet-stream",
+        headers=headers,
+    )
+
+
+def plaintext_stream(file_record, key_bytes: bytes) -> Iterator[bytes]:
+    """Decrypted (and decompressed) content of a stored file, as it streams from storage."""
+    if file_record.enc_version != FORMAT_SEGMENTED:
+        encrypted_data = get_storage().download_file(file_record.storage_path)
+        yield crypto_executor.run_sync("aes_decrypt", decrypt_legacy, key_bytes, bytes.fromhex(file_record.nonce), encrypted_data)
+        return
+    chunks, _ = get_storage().get_stream(file_record.storage_path)
+    header, chunks = _split_header(chunks)
+    decryptor = StreamDecryptor(key_bytes, header)
+    yield from decompress_stream(decryptor.decrypt_stream(chunks), getattr(file_record, "codec", None))
+
+
+def _ranged_download(file_record, decryptor: StreamDecryptor, size: int, total_size: int, byte_range, headers) -> Response:
+    start, end = byte_range
+    segment_size = decryptor.segment_size
+    enc_segment = segment_size + TAG_SIZE
+    first_segment, last_wanted = start // segment_size, end // segment_size
+    last_segment = max(0, -(-size // segment_size) - 1)
+
+    cipher_start = HEADER_SIZE + first_segment * enc_segment
+    cipher_end = min(HEADER_SIZE + (last_wanted + 1) * enc_segment, total_size) - 1
+    chunks, _ = get_storage().get_stream(file_record.storage_path, cipher_start, cipher_end)
+
+    plain = decryptor.decrypt_stream(chunks, first_segment=first_segment, last_segment=last_segment)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _guard(_slice(plain, start - first_segment * segment_size, end - start + 1), file_record),
+        status_code=206,
+        media_type="application/octet-stream",
+        headers=headers,
+    )
+
+
+def _compressed_download(file_record, key_bytes: bytes, range_header: Optional[str], headers) -> Response:
+    """
+    Compressed files have no plaintext offset -> segment mapping, so ranges
+    stream from the start and drop what comes before the range (still no
+    full copy in memory). Sizes come from the DB: the object holds the
+    compressed bytes.
+    """
+    size = file_record.size_bytes
+    byte_range = parse_range(range_header, size) if size is not None else None
+
+    chunks, _ = get_storage().get_stream(file_record.storage_path)
+    header, chunks = _split_header(chunks)
+    decryptor = _open_decryptor(key_bytes, header)
+    plain = decompress_stream(decryptor.decrypt_stream(chunks), file_record.codec)
+
+    if not byte_range:
+        if size is not None:
+            headers["Content-Length"] = str(size)
+        return StreamingResponse(_guard(plain, file_record), media_type="application/octet-stream", headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _guard(_slice(plain, start, end - start + 1), file_record),
+        status_code=206,
+        media_type="application/octet-stream",
+        headers=headers,
+    )
+
+
+def _legacy_download(file_record, key_bytes: bytes, range_header: Optional[str], headers) -> Response:
+    encrypted_data = get_storage().download_file(file_record.storage_path)
+    try:
+        decrypted_data = crypto_executor.run_sync("aes_decrypt", decrypt_legacy, key_bytes, bytes.fromhex(file_record.nonce), encrypted_data)
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=500, detail="Decryption failed")
+
+    byte_range = parse_range(range_header, len(decrypted_data))
+    if not byte_range:
+        return Response(content=decrypted_data, media_type="application/octet-stream", headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(decrypted_data)}"
+    return Response(content=decrypted_data[start:end + 1], status_code=206, media_type="application/octet-stream", headers=headers)
+
+
+def _open_decryptor(key_bytes: bytes, header: bytes) -> StreamDecryptor:
+    try:
+        return StreamDecryptor(key_bytes, header)
+    except Exception:
+        raise HTTPException(status_code=500, detail="Decryption failed")
+
+
+def _split_header(chunks: Iterable[bytes]) -> tuple[bytes, Iterator[bytes]]:
+    """Pulls the format header off the front of a chunk stream."""
+    chunks = iter(chunks)
+    header = b""
+    for chunk in chunks:
+        header += chunk
+        if len(header) >= HEADER_SIZE:
+            break
+
+    def rest():
+        if len(header) > HEADER_SIZE:
+            yield header[HEADER_SIZE:]
+        yield from chunks
+    return header[:HEADER_SIZE], rest()
+
+
+def _slice(chunks: Iterable[bytes], skip: int, length: int) -> Iterator[bytes]:
+    """Drops `skip` bytes, then yields exactly `length` bytes."""
+    for chunk in chunks:
+        if skip >= len(chunk):
+            skip -= len(chunk)
+            continue
+        chunk = chunk[skip:skip + length]
+        skip = 0
+        length -= len(chunk)
+        yield chunk
+        if length <= 0:
+            return
+
+
+def _guard(chunks: Iterable[bytes], file_record) -> Iterator[bytes]:
+    # Headers are already sent once streaming starts, so a failed segment can only abort the body
+    try:
+        yield from chunks
+    except Exception as e:
+        print(f"❌ Decryption failed mid-stream for file {file_record.id}: {e}")
+        raise
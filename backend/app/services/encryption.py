@@ -1,5 +1,46 @@
+import io
 import os
+import struct
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from typing import Iterable, Iterator, Optional
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from app.core.config import settings
+from app.core.metrics import span
+
+# --- STORAGE FORMATS ---
+# 1 = Legacy: one AES-GCM blob, nonce kept in the DB (whole file in memory)
+# 2 = Segmented: HEADER | SEG_0 | SEG_1 | ... | SEG_n  (constant memory)
+#
+#   HEADER = MAGIC (4) | VERSION (1) | SEGMENT_SIZE (4, big-endian) | NONCE_PREFIX (7)
+#   SEG_i  = AES-GCM(plaintext_i) -> len(plaintext_i) + 16 byte tag
+#
+# Every segment carries SEGMENT_SIZE plaintext bytes except the last one.
+# The nonce of segment i is NONCE_PREFIX | i (4 bytes) | last flag (1 byte) and
+# the header is the associated data, so segments cannot be reordered, dropped,
+# truncated or swapped in from another file without failing authentication.
+#
+# Segments are therefore independent: streams hand runs of them (batches) to a
+# thread pool and yield the results in order. `cryptography` releases the GIL
+# while it encrypts, so throughput scales with the cores given to the pool.
+FORMAT_LEGACY = 1
+FORMAT_SEGMENTED = 2
+
+MAGIC = b"ECDS"
+HEADER_SIZE = 16
+NONCE_PREFIX_SIZE = 7
+TAG_SIZE = 16
+SEGMENT_SIZE = settings.encryption_segment_size
+
+# Parallelism (1 worker = serial, in the caller's thread)
+ENCRYPTION_WORKERS = max(1, settings.encryption_workers or os.cpu_count() or 1)
+BATCH_SEGMENTS = max(1, settings.encryption_batch_segments)
+INFLIGHT_BYTES = int(settings.encryption_inflight_mb * 1024 * 1024)
+
+_HEADER_STRUCT = struct.Struct(">4sBI7s")
+
 
 class FileEncryptor:
     def __init__(self, key: bytes):
@@ -12,7 +53,7 @@ class FileEncryptor:
         Returns: (encrypted_data, nonce)
         """
         # AES-GCM requires a unique "nonce" (number used once) for every encryption
-        nonce = os.urandom(12) 
+        nonce = os.urandom(12)
         ciphertext = self.aesgcm.encrypt(nonce, data, None)
         return ciphertext, nonce
 
@@ -20,4 +61,286 @@ class FileEncryptor:
         """
         Decrypts data.
         """
-        return self.aesgcm.decrypt(nonce, ciphertext, None)
\ No newline at end of file
+        return self.aesgcm.decrypt(nonce, ciphertext, None)
+
+
+def decrypt_legacy(key: bytes, nonce: bytes, ciphertext: bytes) -> bytes:
+    """Module-level (picklable) so the crypto executor can ship it to a process pool."""
+    return FileEncryptor(key).decrypt(ciphertext, nonce)
+
+
+def encrypt_chunk(key: bytes, nonce_prefix: bytes, segment_size: int, first_segment: int, data: bytes,
+                  last_segment: int, with_header: bool) -> bytes:
+    """Module-level (picklable) StreamEncryptor.encrypt_segments() for the crypto executor."""
+    encryptor = StreamEncryptor(key, segment_size, nonce_prefix)
+    body = encryptor.encrypt_segments(first_segment, data, last_segment)
+    return encryptor.header + body if with_header else body
+
+
+# --- SEGMENT POOL ---
+_pools = {}  # workers -> ThreadPoolExecutor
+_pools_pid: Optional[int] = None
+_pools_lock = threading.Lock()
+
+
+def segment_pool(workers: int = ENCRYPTION_WORKERS) -> ThreadPoolExecutor:
+    """
+    Threads shared by every stream's segment work, kept apart from the crypto
+    executor: streams wait on it from inside their own request thread, and
+    a long download must not take slots that logins queue for. Created on
+    first use in each process, so pre-fork servers don't inherit threads.
+    """
+    global _pools, _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools, _pools_pid = {}, os.getpid()
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="segment-crypto")
+        return pool
+
+
+def _window(workers: int, batch_bytes: int) -> int:
+    """Batches in flight per stream: enough to keep every worker busy, within INFLIGHT_BYTES."""
+    return max(1, min(2 * workers, INFLIGHT_BYTES // max(1, batch_bytes)))
+
+
+def _in_order(stage: str, fn, tasks: Iterable[tuple], workers: int, window: int) -> Iterator:
+    """
+    Yields fn(*task) for each task, in order. With more than one worker and
+    task, up to `window` tasks run on the segment pool while the consumer
+    takes results; `tasks` is only pulled as slots free up, so the read
+    ahead stays bounded. The consumer's wait is its `stage` time.
+    """
+    tasks = iter(tasks)
+    head = list(islice(tasks, 2))
+    if workers <= 1 or window <= 1 or len(head) < 2:
+        for task in chain(head, tasks):
+            yield fn(*task)
+        return
+
+    pool = segment_pool(workers)
+    pending = deque()
+    try:
+        for task in chain(head, tasks):
+            pending.append(pool.submit(fn, *task))
+            if len(pending) >= window:
+                with span(stage):
+                    result = pending.popleft().result()
+                yield result
+        while pending:
+            with span(stage):
+                result = pending.popleft().result()
+            yield result
+    finally:
+        # Consumer stopped early (client went away, bad tag): skip the rest
+        for future in pending:
+            future.cancel()
+
+
+def _segment_nonce(prefix: bytes, index: int, final: bool) -> bytes:
+    return prefix + struct.pack(">IB", index, 1 if final else 0)
+
+
+def encrypted_size(plain_size: int, segment_size: int = SEGMENT_SIZE) -> int:
+    """Size of the stored object for a plaintext of `plain_size` bytes."""
+    segments = max(1, -(-plain_size // segment_size))
+    return HEADER_SIZE + plain_size + segments * TAG_SIZE
+
+
+def plaintext_size(cipher_size: int, segment_size: int = SEGMENT_SIZE) -> int:
+    """Inverse of encrypted_size()."""
+    body = cipher_size - HEADER_SIZE
+    segments = -(-body // (segment_size + TAG_SIZE))
+    return body - segments * TAG_SIZE
+
+
+class StreamEncryptor:
+    """Encrypts a file segment by segment into the segmented format."""
+
+    def __init__(self, key: bytes, segment_size: int = SEGMENT_SIZE, nonce_prefix: Optional[bytes] = None,
+                 workers: int = ENCRYPTION_WORKERS):
+        self.aesgcm = AESGCM(key)
+        self.segment_size = segment_size
+        self.nonce_prefix = nonce_prefix or os.urandom(NONCE_PREFIX_SIZE)
+        self.header = _HEADER_STRUCT.pack(MAGIC, FORMAT_SEGMENTED, segment_size, self.nonce_prefix)
+        self.workers = workers
+
+    def encrypt_segment(self, index: int, data: bytes, final: bool) -> bytes:
+        with span("encrypt"):
+            return self.aesgcm.encrypt(_segment_nonce(self.nonce_prefix, index, final), data, self.header)
+
+    def encrypt_segments(self, first_index: int, data: bytes, last_index: Optional[int]) -> bytes:
+        """
+        Encrypts a run of whole segments starting at `first_index` (resumable
+        uploads: chunks of the object are encrypted independently, in any
+        order). `last_index` is the object's final segment, None when it is
+        not in this run.
+        """
+        return b"".join(self._encrypt_run(first_index, data, last_index))
+
+    def _encrypt_run(self, first_index: int, data: bytes, last_index: Optional[int]) -> list:
+        view = memoryview(data)
+        out = []
+        index = first_index
+        offset = 0
+        while True:
+            out.append(self.encrypt_segment(index, view[offset:offset + self.segment_size], index == last_index))
+            offset += self.segment_size
+            index += 1
+            if offset >= len(data):
+                return out
+
+    def encrypt_stream(self, reader) -> Iterator[bytes]:
+        """
+        Reads plaintext from a file-like object and yields the header followed by
+        each encrypted segment. Batches of segments are encrypted on the segment
+        pool; memory is one batch of lookahead plus the batches in flight.
+        """
+        yield self.header
+        batch = BATCH_SEGMENTS * self.segment_size
+        for segments in _in_order("encrypt", self._encrypt_run, self._batches(reader, batch),
+                                  self.workers, _window(self.workers, batch)):
+            yield from segments
+
+    def _batches(self, reader, batch: int) -> Iterator[tuple]:
+        index = 0
+        current = _read_exact(reader, batch)
+        while True:
+            # One batch of lookahead: the final segment's nonce is flagged
+            following = _read_exact(reader, batch) if len(current) == batch else b""
+            segments = max(1, -(-len(current) // self.segment_size))
+            yield index, current, None if following else index + segments - 1
+            if not following:
+                return
+            current = following
+            index += segments
+
+
+class StreamDecryptor:
+    """Decrypts objects written by StreamEncryptor, whole or segment by segment."""
+
+    def __init__(self, key: bytes, header: bytes, workers: int = ENCRYPTION_WORKERS):
+        magic, version, segment_size, nonce_prefix = _HEADER_STRUCT.unpack(header[:HEADER_SIZE])
+        if magic != MAGIC or version != FORMAT_SEGMENTED or segment_size <= 0:
+            raise ValueError("Not a segmented ECD object")
+        self.aesgcm = AESGCM(key)
+        self.header = bytes(header[:HEADER_SIZE])
+        self.segment_size = segment_size
+        self.nonce_prefix = nonce_prefix
+        self.workers = workers
+
+    def decrypt_segment(self, index: int, data: bytes, final: bool) -> bytes:
+        with span("decrypt"):
+            return self.aesgcm.decrypt(_segment_nonce(self.nonce_prefix, index, final), data, self.header)
+
+    def decrypt_stream(self, chunks: Iterable[bytes], first_segment: int = 0, last_segment: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Decrypts a stream of ciphertext (without the header) starting at
+        `first_segment`. For a partial (ranged) stream pass the index of the
+        object's last segment as `last_segment`; otherwise the end of the
+        stream is treated as the end of the object, which is what makes a
+        truncated object fail authentication.
+        """
+        batch = BATCH_SEGMENTS * (self.segment_size + TAG_SIZE)
+        for segments in _in_order("decrypt", self._decrypt_run, self._batches(chunks, batch, first_segment, last_segment),
+                                  self.workers, _window(self.workers, batch)):
+            yield from segments
+
+    def _decrypt_run(self, first_index: int, data: bytes, last_index: Optional[int]) -> list:
+        enc_segment = self.segment_size + TAG_SIZE
+        view = memoryview(data)
+        out = []
+        index = first_index
+        offset = 0
+        while True:
+            out.append(self.decrypt_segment(index, view[offset:offset + enc_segment], index == last_index))
+            offset += enc_segment
+            index += 1
+            if offset >= len(data):
+                return out
+
+    def _batches(self, chunks: Iterable[bytes], batch: int, index: int, last_segment: Optional[int]) -> Iterator[tuple]:
+        segments = batch // (self.segment_size + TAG_SIZE)
+        buffer = bytearray()  # the start of the next batch
+        for chunk in chunks:
+            if len(buffer) + len(chunk) <= batch:
+                buffer += chunk
+                continue
+            view = memoryview(chunk)
+            if buffer:
+                fill = batch - len(buffer)
+                buffer += view[:fill]
+                view = view[fill:]
+                data, buffer = buffer, bytearray()
+                yield index, data, last_segment
+                index += segments
+            # Large chunks (a whole object in memory) are cut up without copies. Keep
+            # at least one byte back until we know which segment is the last one.
+            while len(view) > batch:
+                yield index, view[:batch], last_segment
+                view = view[batch:]
+                index += segments
+            buffer += view
+        if last_segment is None:
+            last_segment = index + max(1, -(-len(buffer) // (self.segment_size + TAG_SIZE))) - 1
+        yield index, buffer, last_segment
+
+    def decrypt(self, data: bytes) -> bytes:
+        """Decrypts a complete segmented object (header included)."""
+        return b"".join(self.decrypt_stream([memoryview(data)[HEADER_SIZE:]]))
+
+
+class EncryptingReader(io.RawIOBase):
+    """
+    Non-seekable file-like view of `encryptor.encrypt_stream(source)`, so storage
+    clients can pull ciphertext as they upload it instead of us building a blob.
+    """
+
+    def __init__(self, source, encryptor: StreamEncryptor):
+        super().__init__()
+        self._segments = encryptor.encrypt_stream(_CountingReader(source, self))
+        self._buffer = bytearray()
+        self.plaintext_bytes = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b) -> int:
+        while len(self._buffer) < len(b):
+            segment = next(self._segments, None)
+            if segment is None:
+                break
+            self._buffer += segment
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        del self._buffer[:n]
+        return n
+
+
+class _CountingReader:
+    def __init__(self, source, owner: EncryptingReader):
+        self._source = source
+        self._owner = owner
+
+    def read(self, size: int = -1) -> bytes:
+        with span("read"):
+            data = self._source.read(size)
+        self._owner.plaintext_bytes += len(data)
+        return data
+
+
+def _read_exact(reader, size: int) -> bytes:
+    """read() until `size` bytes or EOF (raw streams may return short reads)."""
+    data = reader.read(size)
+    if len(data) in (0, size):
+        return data
+    parts = [data]
+    remaining = size - len(data)
+    while remaining:
+        more = reader.read(remaining)
+        if not more:
+            break
+        parts.append(more)
+        remaining -= len(more)
+    return b"".join(parts)
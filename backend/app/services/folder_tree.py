@@ -0,0 +1,133 @@
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import func, literal, select
+from sqlalchemy.orm import Session
+from app.models.user import Folder, File as FileModel
+from app.services.bulk import ZIP_COLUMNS
+from app.services.trash import TrashService
+
+def _subtree(path: str):
+    # Paths are digits and slashes only, so no LIKE escaping is needed
+    return Folder.path.like(f"{path}%")
+
+
+class FolderTree:
+    """
+    Recursive folder operations on top of Folder.path. Each one runs a fixed
+    number of queries, however deep or wide the tree is.
+    """
+
+    @staticmethod
+    def get_owned(db: Session, owner_id: int, folder_id: int) -> Folder:
+        folder = db.query(Folder).filter(Folder.id == folder_id, Folder.owner_id == owner_id).first()
+        if not folder:
+            raise HTTPException(status_code=404, detail="Folder not found")
+        return folder
+
+    @staticmethod
+    def create(db: Session, owner_id: int, name: str, parent_id: Optional[int]) -> Folder:
+        parent_path = "/"
+        if parent_id is not None:
+            parent_path = FolderTree.get_owned(db, owner_id, parent_id).path
+
+        folder = Folder(name=name, parent_id=parent_id, owner_id=owner_id)
+        db.add(folder)
+        db.flush() # need the id for the path
+        folder.path = f"{parent_path}{folder.id}/"
+        db.commit()
+        db.refresh(folder)
+        return folder
+
+    @staticmethod
+    def breadcrumbs(db: Session, owner_id: int, folder_id: int) -> list:
+        """Root-first chain of (id, name) down to the folder: 2 queries."""
+        folder = FolderTree.get_owned(db, owner_id, folder_id)
+        ids = [int(part) for part in folder.path.strip("/").split("/")]
+        names = dict(db.query(Folder.id, Folder.name).filter(
+            Folder.owner_id == owner_id, Folder.id.in_(ids)
+        ).all())
+        return [{"id": fid, "name": names.get(fid)} for fid in ids]
+
+    @staticmethod
+    def size(db: Session, owner_id: int, folder_id: int) -> dict:
+        """Bytes, files and subfolders under a folder, all levels: 3 queries."""
+        folder = FolderTree.get_owned(db, owner_id, folder_id)
+        total_bytes, file_count = db.query(
+            func.coalesce(func.sum(FileModel.size_bytes), 0), func.count(FileModel.id)
+        ).join(Folder, FileModel.folder_id == Folder.id).filter(
+            Folder.owner_id == owner_id, _subtree(folder.path), FileModel.deleted_at.is_(None)
+        ).one()
+        folder_count = db.query(func.count(Folder.id)).filter(
+            Folder.owner_id == owner_id, _subtree(folder.path)
+        ).scalar()
+        return {
+            "folder_id": folder_id,
+            "total_bytes": total_bytes,
+            "file_count": file_count,
+            "folder_count": folder_count - 1, # not counting itself
+        }
+
+    @staticmethod
+    def move(db: Session, owner_id: int, folder_id: int, new_parent_id: Optional[int]) -> Folder:
+        """Re-roots a subtree under another folder (None = Home) with one UPDATE."""
+        folder = FolderTree.get_owned(db, owner_id, folder_id)
+        new_parent_path = "/"
+        if new_parent_id is not None:
+            new_parent = FolderTree.get_owned(db, owner_id, new_parent_id)
+            if new_parent.path.startswith(folder.path):
+                raise HTTPException(status_code=400, detail="Cannot move a folder into itself")
+            new_parent_path = new_parent.path
+
+        old_path = folder.path
+        new_path = f"{new_parent_path}{folder.id}/"
+        if new_path != old_path:
+            db.query(Folder).filter(Folder.owner_id == owner_id, _subtree(old_path)).update(
+                {Folder.path: literal(new_path) + func.substr(Folder.path, len(old_path) + 1)},
+                synchronize_session=False
+            )
+        db.query(Folder).filter(Folder.id == folder_id).update(
+            {Folder.parent_id: new_parent_id}, synchronize_session=False
+        )
+        db.commit()
+        db.refresh(folder)
+        return folder
+
+    @staticmethod
+    def delete(db: Session, owner_id: int, folder_id: int) -> int:
+        """
+        Removes a folder and its subfolders in one transaction. Their files go
+        to the trash and, their folders being gone, are restored to Home;
+        storage is not touched. Returns the number of files trashed.
+        """
+        folder = FolderTree.get_owned(db, owner_id, folder_id)
+        in_subtree = FileModel.folder_id.in_(select(Folder.id).where(Folder.owner_id == owner_id, _subtree(folder.path)))
+        trashed = TrashService.trash(db, owner_id, in_subtree)
+        db.query(FileModel).filter(FileModel.owner_id == owner_id, in_subtree).update(
+            {FileModel.folder_id: None}, synchronize_session=False
+        )
+        db.query(Folder).filter(Folder.owner_id == owner_id, _subtree(folder.path)).delete(synchronize_session=False)
+        db.commit()
+        return trashed
+
+    @staticmethod
+    def zip_rows(db: Session, owner_id: int, folder_id: int):
+        """
+        Everything a folder download needs, in 3 queries: the folder, archive
+        path prefixes per subfolder ("Folder/Sub/"), and the file rows.
+        """
+        folder = FolderTree.get_owned(db, owner_id, folder_id)
+        folders = db.query(Folder.id, Folder.name, Folder.path).filter(
+            Folder.owner_id == owner_id, _subtree(folder.path)
+        ).all()
+        names = {f.id: f.name for f in folders}
+        # Path ids from this folder down; the archive root is the folder itself
+        depth = folder.path.count("/") - 2
+        prefixes = {
+            f.id: "".join(f"{names[int(part)]}/" for part in f.path.strip("/").split("/")[depth:])
+            for f in folders
+        }
+        rows = db.query(*ZIP_COLUMNS).filter(
+            FileModel.owner_id == owner_id, FileModel.deleted_at.is_(None),
+            FileModel.folder_id.in_(select(Folder.id).where(Folder.owner_id == owner_id, _subtree(folder.path)))
+        ).order_by(FileModel.folder_id, FileModel.id).all()
+        return folder, prefixes, rows
@@ -0,0 +1,105 @@
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.models.user import User
+
+# Private content: browsers may keep a copy but must revalidate it (If-None-Match) before use;
+# shared caches and proxies never store it
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+# --- LISTING VERSION ---
+# users.listing_version goes up with every row written to a user's files,
+# folders or usage totals. Triggers do it in the writing transaction, so no
+# write path (uploads, bulk, resumable, trash, moves, migrations) can miss a
+# bump, and every worker sees the same version.
+_VERSIONED_TABLES = (("files", "owner_id"), ("folders", "owner_id"), ("user_usage", "user_id"))
+
+_SQLITE_DDL = tuple(
+    ddl
+    for table, owner in _VERSIONED_TABLES
+    for ddl in (
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_version_insert AFTER INSERT ON {table} BEGIN
+            UPDATE users SET listing_version = listing_version + 1 WHERE id = new.{owner};
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_version_update AFTER UPDATE ON {table} BEGIN
+            UPDATE users SET listing_version = listing_version + 1 WHERE id IN (old.{owner}, new.{owner});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_version_delete AFTER DELETE ON {table} BEGIN
+            UPDATE users SET listing_version = listing_version + 1 WHERE id = old.{owner};
+        END""",
+    )
+)
+
+_POSTGRES_DDL = tuple(
+    ddl
+    for table, owner in _VERSIONED_TABLES
+    for ddl in (
+        f"""CREATE OR REPLACE FUNCTION {table}_bump_listing_version() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                UPDATE users SET listing_version = listing_version + 1 WHERE id = OLD.{owner};
+            END IF;
+            IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.{owner} IS DISTINCT FROM OLD.{owner}) THEN
+                UPDATE users SET listing_version = listing_version + 1 WHERE id = NEW.{owner};
+            END IF;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql""",
+        f"DROP TRIGGER IF EXISTS {table}_listing_version ON {table}",
+        f"""CREATE TRIGGER {table}_listing_version AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {table}_bump_listing_version()""",
+    )
+)
+
+_TRIGGER_DDL = {"sqlite": _SQLITE_DDL, "postgresql": _POSTGRES_DDL}
+
+
+def create_listing_triggers(engine):
+    """Idempotent; runs with the migrations."""
+    ddl = _TRIGGER_DDL.get(engine.dialect.name)
+    if ddl is None:
+        print(f"❌ Listing ETags unavailable on {engine.dialect.name}: no version triggers")
+        return
+    with engine.begin() as conn:
+        for statement in ddl:
+            conn.execute(text(statement))
+
+
+def listing_version(db: Session, owner_id: int) -> int:
+    return db.query(User.listing_version).filter(User.id == owner_id).scalar() or 0
+
+
+# --- CONDITIONAL REQUESTS ---
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 asks for GET)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": PRIVATE_CACHE_CONTROL})
+
+
+def conditional_listing(request: Request, response: Response, db: Session, owner_id: int) -> Optional[Response]:
+    """
+    For per-user JSON reads (listings, stats). Sets ETag / Cache-Control on
+    `response` and returns a 304 to send instead when the client's copy is
+    current, after one primary-key lookup and before any listing query.
+    The tag covers the user, their listing version and the exact URL.
+    """
+    if db.get_bind().dialect.name not in _TRIGGER_DDL:
+        return None  # no version triggers: a tag could outlive the data it describes
+    version = listing_version(db, owner_id)
+    url = repr((request.url.path, sorted(request.query_params.multi_items())))
+    digest = hashlib.blake2b(url.encode(), digest_size=8).hexdigest()
+    etag = f'"{owner_id}-{version}-{digest}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = PRIVATE_CACHE_CONTROL
+    return None
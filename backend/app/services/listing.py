@@ -0,0 +1,94 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+from app.models.user import File as FileModel, Folder
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+SORTS = ("name", "date", "size")
+ORDERS = ("asc", "desc")
+
+# Columns a listing selects (never encryption_key / nonce / storage_path)
+FILE_COLUMNS = (
+    FileModel.id, FileModel.filename, FileModel.file_type, FileModel.size,
+    FileModel.size_bytes, FileModel.category, FileModel.upload_date, FileModel.folder_id,
+)
+FOLDER_COLUMNS = (Folder.id, Folder.name, Folder.parent_id, Folder.created_at)
+
+_FILE_SORT_COLUMNS = {"name": FileModel.filename, "date": FileModel.upload_date, "size": FileModel.size_bytes}
+# Folders have no size of their own: "size" falls back to name
+_FOLDER_SORT_COLUMNS = {"name": Folder.name, "date": Folder.created_at, "size": Folder.name}
+
+
+def encode_cursor(sort: str, value, row_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str):
+    """Returns (last sort value, last id). The cursor must come from the same sort."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, row_id = json.loads(raw)
+        if cursor_sort != sort or not isinstance(row_id, int):
+            raise ValueError(cursor_sort)
+        if sort == "date" and value is not None:
+            value = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, row_id
+
+def check_sort(sort: str, order: str, limit: int):
+    if sort not in SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORTS)}")
+    if order not in ORDERS:
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+
+def keyset_page(query, sort_column, id_column, sort: str, order: str, limit: int, cursor: Optional[str]):
+    """
+    One page of `query` ordered by (sort_column, id). Rows after the cursor are
+    found with a row-value comparison, so every page is an index range scan
+    no matter how deep it is (no OFFSET). Returns (rows, next_cursor).
+    """
+    key = tuple_(sort_column, id_column)
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        query = query.filter(key > tuple_(value, last_id) if order == "asc" else key < tuple_(value, last_id))
+    if order == "asc":
+        query = query.order_by(sort_column.asc(), id_column.asc())
+    else:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(sort, getattr(last, sort_column.key), last.id)
+
+
+class ListingService:
+    @staticmethod
+    def files(db: Session, owner_id: int, sort: str, order: str, limit: int, cursor: Optional[str] = None,
+              folder_id: Optional[int] = None, all_folders: bool = True):
+        query = db.query(*FILE_COLUMNS).filter(FileModel.owner_id == owner_id, FileModel.deleted_at.is_(None))
+        if not all_folders:
+            query = query.filter(FileModel.folder_id == folder_id)
+        return keyset_page(query, _FILE_SORT_COLUMNS[sort], FileModel.id, sort, order, limit, cursor)
+
+    @staticmethod
+    def folders(db: Session, owner_id: int, parent_id: Optional[int], sort: str, order: str, limit: int,
+                cursor: Optional[str] = None):
+        query = db.query(*FOLDER_COLUMNS).filter(Folder.owner_id == owner_id, Folder.parent_id == parent_id)
+        # Cursor sort tag is the effective one, so a "size" cursor is a "name" cursor for folders
+        effective = "name" if sort == "size" else sort
+        return keyset_page(query, _FOLDER_SORT_COLUMNS[sort], Folder.id, effective, order, limit, cursor)
@@ -0,0 +1,198 @@
+import mmap
+import os
+import shutil
+import uuid
+from typing import Iterator, Optional
+from urllib.parse import quote, unquote
+from fastapi import HTTPException
+from app.core.config import settings
+from app.services.storage import StorageBackend
+
+LOCAL_STORAGE_DIR = settings.local_storage_dir
+# always = fsync file + directory before an upload returns (survives power loss)
+# data   = fsync the file only
+# never  = leave it to the OS page cache (fastest; fine for benchmarks / scratch)
+LOCAL_FSYNC = settings.local_fsync.lower()
+
+COPY_CHUNK_SIZE = 1024 * 1024
+STREAM_CHUNK_SIZE = 256 * 1024
+
+
+class LocalStorage(StorageBackend):
+    """
+    Single-node backend on the local filesystem.
+    Writes go to a temp file in the same directory tree and are renamed into
+    place, so readers never see a half-written object. Reads are served from
+    mmap, and copies from real files use os.sendfile (zero-copy, in kernel).
+    """
+
+    def __init__(self, root: str = LOCAL_STORAGE_DIR, fsync: str = LOCAL_FSYNC):
+        if fsync not in ("always", "data", "never"):
+            raise ValueError(f"Unknown LOCAL_FSYNC policy: {fsync}")
+        self.root = os.path.abspath(root)
+        self.tmp_dir = os.path.join(self.root, ".tmp")
+        self.parts_dir = os.path.join(self.root, ".parts")  # staged multipart uploads, one dir each
+        self.fsync = fsync
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def _path(self, object_name: str) -> str:
+        # Keys carry user filenames: escape separators so nothing leaves the root
+        name = quote(object_name, safe=" ")
+        if name.startswith("."):
+            name = "%2E" + name[1:]
+        return os.path.join(self.root, name)
+
+    # --- WRITE ---
+    def upload_file(self, file_bytes: bytes, object_name: str):
+        return self._write_atomic(object_name, lambda fd: _write_all(fd, file_bytes))
+
+    def upload_stream(self, file_obj, object_name: str):
+        return self._write_atomic(object_name, lambda fd: _copy_into(fd, file_obj))
+
+    def _write_atomic(self, object_name: str, write):
+        tmp_path = os.path.join(self.tmp_dir, uuid.uuid4().hex)
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            try:
+                write(fd)
+                if self.fsync != "never":
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            os.replace(tmp_path, self._path(object_name))
+            if self.fsync == "always":
+                self._fsync_dir()
+            return True
+        except Exception as e:
+            _remove_quietly(tmp_path)
+            print(f"❌ Local Storage Write Error: {e}")
+            raise HTTPException(status_code=500, detail="Failed to write to storage")
+
+    def _fsync_dir(self):
+        # Makes the rename itself durable
+        dir_fd = os.open(self.root, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    # --- READ ---
+    def download_file(self, object_name: str) -> bytes:
+        try:
+            with open(self._path(object_name), "rb") as f:
+                return f.read()
+        except OSError as e:
+            print(f"❌ Local Storage Read Error: {e}")
+            raise HTTPException(status_code=404, detail="File not found in storage")
+
+    def get_stream(self, object_name: str, start: Optional[int] = None, end: Optional[int] = None) -> tuple[Iterator[bytes], int]:
+        try:
+            f = open(self._path(object_name), "rb")
+        except OSError as e:
+            print(f"❌ Local Storage Read Error: {e}")
+            raise HTTPException(status_code=404, detail="File not found in storage")
+        total_size = os.fstat(f.fileno()).st_size
+        start = start or 0
+        end = total_size - 1 if end is None else min(end, total_size - 1)
+        return _iter_mmap(f, start, end), total_size
+
+    # --- DELETE ---
+    def delete_file(self, object_name: str):
+        _remove_quietly(self._path(object_name))
+
+    def list_objects(self) -> Iterator[tuple[str, float]]:
+        # Dot entries are ours (.tmp, .parts); escaped names map back to their keys
+        for entry in os.scandir(self.root):
+            if entry.name.startswith(".") or not entry.is_file():
+                continue
+            yield unquote(entry.name), entry.stat().st_mtime
+
+    # --- STAGED (MULTIPART) WRITES ---
+    def _upload_dir(self, upload_id: str) -> str:
+        if not upload_id.isalnum():
+            raise HTTPException(status_code=404, detail="Upload not found")
+        return os.path.join(self.parts_dir, upload_id)
+
+    def create_multipart(self, object_name: str) -> str:
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._upload_dir(upload_id))
+        return upload_id
+
+    def upload_part(self, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+        upload_dir = self._upload_dir(upload_id)
+        if not os.path.isdir(upload_dir):
+            raise HTTPException(status_code=404, detail="Upload not found")
+        # Same temp-then-rename dance, so a re-sent part never leaves a torn file behind
+        tmp_path = os.path.join(upload_dir, f".{uuid.uuid4().hex}")
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            try:
+                _write_all(fd, data)
+                if self.fsync != "never":
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            os.replace(tmp_path, os.path.join(upload_dir, str(part_number)))
+        except Exception as e:
+            _remove_quietly(tmp_path)
+            print(f"❌ Local Storage Write Error: {e}")
+            raise HTTPException(status_code=500, detail="Failed to write to storage")
+        return f'"{uuid.uuid4().hex}"'
+
+    def complete_multipart(self, object_name: str, upload_id: str, parts: list[tuple[int, str]]):
+        upload_dir = self._upload_dir(upload_id)
+
+        def join(fd):
+            for part_number, _ in sorted(parts):
+                with open(os.path.join(upload_dir, str(part_number)), "rb") as part:
+                    _copy_into(fd, part)
+        self._write_atomic(object_name, join)
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+    def abort_multipart(self, object_name: str, upload_id: str):
+        shutil.rmtree(self._upload_dir(upload_id), ignore_errors=True)
+
+
+def _iter_mmap(f, start: int, end: int) -> Iterator[bytes]:
+    try:
+        if end < start:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in range(start, end + 1, STREAM_CHUNK_SIZE):
+                yield mapped[offset:min(offset + STREAM_CHUNK_SIZE, end + 1)]
+    finally:
+        f.close()
+
+
+def _copy_into(fd: int, file_obj):
+    """Copies a file-like object into `fd`; real files go through os.sendfile."""
+    try:
+        src_fd = file_obj.fileno()
+        offset = file_obj.tell()
+    except (AttributeError, OSError, ValueError):
+        src_fd = None
+    if src_fd is not None:
+        while True:
+            sent = os.sendfile(fd, src_fd, offset, COPY_CHUNK_SIZE * 64)
+            if sent == 0:
+                return
+            offset += sent
+    while True:
+        chunk = file_obj.read(COPY_CHUNK_SIZE)
+        if not chunk:
+            return
+        _write_all(fd, chunk)
+
+
+def _write_all(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,351 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Iterable, Iterator, Optional
+from app.core.config import settings
+from app.services.storage import StorageBackend
+
+# Directory of the read-through cache in front of S3 (unset = no cache)
+OBJECT_CACHE_DIR = settings.object_cache_dir
+OBJECT_CACHE_MAX_BYTES = int(settings.object_cache_max_mb * 1024 * 1024)
+# Bigger objects stream straight through: filling first would delay their first byte too long
+OBJECT_CACHE_MAX_OBJECT_BYTES = int(settings.object_cache_max_object_mb * 1024 * 1024)
+# Every worker of the host may use the same directory: each re-reads its size
+# from disk this often, so the cap holds for the directory, not per process
+OBJECT_CACHE_SCAN_SECONDS = settings.object_cache_scan_seconds
+# Temp files older than this are left over from a crashed fill
+STALE_TMP_SECONDS = 3600
+
+READ_CHUNK_SIZE = 256 * 1024
+
+
+class _Flight:
+    """One in-progress fill; concurrent misses for the same object wait on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.cached = False
+        self.error: Optional[BaseException] = None
+        self.stale = False  # deleted / overwritten while filling: don't publish
+
+
+class CachingStorage(StorageBackend):
+    """
+    Size-bounded, on-disk LRU of whole objects in front of a remote backend.
+    It only ever sees what the backend stores, i.e. ciphertext. Objects are
+    written under temp names and renamed into place, concurrent misses for
+    one object share a single GET, and writes / deletes through this backend
+    invalidate the entry. Ranged misses pass through (the cache fills on
+    full reads), ranged hits are served from disk.
+
+    Several processes can share the directory. Hits touch the file's mtime,
+    which is the LRU order all of them evict by, a miss first looks for a
+    file another process filled, and the size index is rebuilt from the
+    directory every scan_interval seconds, so together they stay near
+    max_bytes. The directory's bytes can still run over between scans:
+    by up to the fills every process does within one interval.
+    """
+
+    def __init__(self, backend: StorageBackend, root: str = OBJECT_CACHE_DIR,
+                 max_bytes: int = OBJECT_CACHE_MAX_BYTES, max_object_bytes: int = OBJECT_CACHE_MAX_OBJECT_BYTES,
+                 scan_interval: float = OBJECT_CACHE_SCAN_SECONDS):
+        self.backend = backend
+        self.root = os.path.abspath(root)
+        self.tmp_dir = os.path.join(self.root, ".tmp")
+        self.max_bytes = max_bytes
+        self.max_object_bytes = min(max_object_bytes, max_bytes)
+        self.scan_interval = scan_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.bytes_served = 0
+        self.bytes_filled = 0
+        self._entries = OrderedDict()  # digest -> size, least recently used first
+        self._size = 0
+        self._flights = {}  # digest -> _Flight
+        self._lock = threading.Lock()
+        self._scanned_at = 0.0
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._load()
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def _load(self):
+        """Drops temp files left by crashed fills (not ones other processes are writing), then scans."""
+        cutoff = time.time() - STALE_TMP_SECONDS
+        for entry in os.scandir(self.tmp_dir):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    _remove_quietly(entry.path)
+            except FileNotFoundError:
+                pass
+        self._scan()
+        self._evict()
+
+    def _scan(self):
+        """Rebuilds the index from the directory, oldest mtime first: what every process put there."""
+        found = []
+        for entry in os.scandir(self.root):
+            try:
+                if entry.is_file() and not entry.name.startswith("."):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.name, stat.st_size))
+            except FileNotFoundError:
+                pass  # evicted by another process while we looked
+        found.sort()
+        with self._lock:
+            self._entries = OrderedDict((digest, size) for _, digest, size in found)
+            self._size = sum(size for _, _, size in found)
+            self._scanned_at = time.monotonic()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest)
+
+    # --- READ ---
+    def download_file(self, object_name: str) -> bytes:
+        cached = self._open(object_name)
+        if cached is None:
+            chunks, _ = self._read_through(object_name)
+            return b"".join(chunks)
+        with cached:
+            data = cached.read()
+        self._served(len(data))
+        return data
+
+    def get_stream(self, object_name: str, start: Optional[int] = None, end: Optional[int] = None) -> tuple[Iterator[bytes], int]:
+        if start is not None and not self._has(object_name):
+            with self._lock:
+                self.misses += 1
+            return self.backend.get_stream(object_name, start, end)
+
+        cached = self._open(object_name)
+        if cached is None:
+            chunks, total_size = self._read_through(object_name)
+            if start is None:
+                return chunks, total_size
+            # Filled by someone else meanwhile, or too big: serve the range from the full stream
+            return _slice(chunks, start, total_size - 1 if end is None else min(end, total_size - 1)), total_size
+
+        total_size = os.fstat(cached.fileno()).st_size
+        first = start or 0
+        last = total_size - 1 if end is None else min(end, total_size - 1)
+        return self._iter_cached(cached, first, last), total_size
+
+    def _iter_cached(self, f, first: int, last: int) -> Iterator[bytes]:
+        try:
+            offset = first
+            while offset <= last:
+                chunk = os.pread(f.fileno(), min(READ_CHUNK_SIZE, last - offset + 1), offset)
+                if not chunk:
+                    return
+                offset += len(chunk)
+                self._served(len(chunk))
+                yield chunk
+        finally:
+            f.close()
+
+    def _served(self, n: int):
+        with self._lock:
+            self.bytes_served += n
+
+    def _has(self, object_name: str) -> bool:
+        return os.path.exists(self._path(_digest(object_name)))
+
+    def _open(self, object_name: str):
+        """The cached file, opened (unlinking it later is safe), or None on a miss."""
+        digest = _digest(object_name)
+        path = self._path(digest)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            # Never filled, or removed behind our back (another process evicted it): a miss
+            with self._lock:
+                size = self._entries.pop(digest, None)
+                if size is not None:
+                    self._size -= size
+            return None
+        with self._lock:
+            if digest not in self._entries:
+                # Filled by another process sharing the directory
+                size = os.fstat(f.fileno()).st_size
+                self._entries[digest] = size
+                self._size += size
+            self._entries.move_to_end(digest)
+            self.hits += 1
+        _touch(path)  # the LRU order the other processes see
+        return f
+
+    def _read_through(self, object_name: str) -> tuple[Iterator[bytes], int]:
+        """Miss: one caller fetches into the cache, concurrent ones wait for it."""
+        digest = _digest(object_name)
+        with self._lock:
+            self.misses += 1
+            flight = self._flights.get(digest)
+            leader = flight is None
+            if leader:
+                flight = self._flights[digest] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            cached = self._open(object_name) if flight.cached else None
+            if cached is None:
+                return self.backend.get_stream(object_name)
+            total_size = os.fstat(cached.fileno()).st_size
+            return self._iter_cached(cached, 0, total_size - 1), total_size
+
+        try:
+            chunks, total_size = self.backend.get_stream(object_name)
+            if total_size > self.max_object_bytes:
+                return chunks, total_size
+            tmp_path = self._fill(chunks)
+            with self._lock:
+                if flight.stale:
+                    publish = False
+                else:
+                    publish = True
+                    os.replace(tmp_path, self._path(digest))
+                    self._size += total_size - self._entries.pop(digest, 0)
+                    self._entries[digest] = total_size
+                    self.bytes_filled += total_size
+                    flight.cached = True
+            # Served from the file we just wrote (also when it could not be published)
+            f = open(self._path(digest) if publish else tmp_path, "rb")
+            if not publish:
+                os.remove(tmp_path)
+            self._evict()
+            return self._iter_cached(f, 0, total_size - 1), total_size
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(digest, None)
+            flight.done.set()
+
+    def _fill(self, chunks: Iterable[bytes]) -> str:
+        tmp_path = os.path.join(self.tmp_dir, uuid.uuid4().hex)
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            try:
+                for chunk in chunks:
+                    view = memoryview(chunk)
+                    while view:
+                        view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
+        except BaseException:
+            _remove_quietly(tmp_path)
+            raise
+        return tmp_path
+
+    def _evict(self):
+        if time.monotonic() - self._scanned_at >= self.scan_interval:
+            self._scan()
+        doomed = []
+        with self._lock:
+            while self._size > self.max_bytes and self._entries:
+                digest, size = self._entries.popitem(last=False)
+                self._size -= size
+                self.evictions += 1
+                doomed.append(digest)
+        for digest in doomed:
+            _remove_quietly(self._path(digest))
+
+    # --- INVALIDATION: anything written or deleted through us ---
+    def invalidate(self, object_name: str):
+        digest = _digest(object_name)
+        with self._lock:
+            flight = self._flights.get(digest)
+            if flight is not None:
+                flight.stale = True
+            if digest in self._entries:
+                self.invalidations += 1
+        self._forget(digest)
+
+    def _forget(self, digest: str):
+        with self._lock:
+            size = self._entries.pop(digest, None)
+            if size is not None:
+                self._size -= size
+        _remove_quietly(self._path(digest))
+
+    def upload_file(self, file_bytes: bytes, object_name: str):
+        self.invalidate(object_name)
+        return self.backend.upload_file(file_bytes, object_name)
+
+    def upload_stream(self, file_obj, object_name: str):
+        self.invalidate(object_name)
+        return self.backend.upload_stream(file_obj, object_name)
+
+    def delete_file(self, object_name: str):
+        self.invalidate(object_name)
+        return self.backend.delete_file(object_name)
+
+    def delete_files(self, object_names: Iterable[str]):
+        object_names = list(object_names)
+        for object_name in object_names:
+            self.invalidate(object_name)
+        return self.backend.delete_files(object_names)
+
+    def create_multipart(self, object_name: str) -> str:
+        return self.backend.create_multipart(object_name)
+
+    def upload_part(self, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+        return self.backend.upload_part(object_name, upload_id, part_number, data)
+
+    def complete_multipart(self, object_name: str, upload_id: str, parts: list[tuple[int, str]]):
+        self.invalidate(object_name)
+        return self.backend.complete_multipart(object_name, upload_id, parts)
+
+    def abort_multipart(self, object_name: str, upload_id: str):
+        return self.backend.abort_multipart(object_name, upload_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "bytes_served": self.bytes_served,
+                "bytes_filled": self.bytes_filled,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _digest(object_name: str) -> str:
+    # Fixed-length, filesystem-safe names whatever the object key contains
+    return hashlib.sha256(object_name.encode()).hexdigest()
+
+def _slice(chunks: Iterable[bytes], first: int, last: int) -> Iterator[bytes]:
+    offset = 0
+    for chunk in chunks:
+        lo, hi = max(first - offset, 0), min(last + 1 - offset, len(chunk))
+        if lo < hi:
+            yield chunk[lo:hi]
+        offset += len(chunk)
+        if offset > last:
+            return
+
+def _touch(path: str):
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
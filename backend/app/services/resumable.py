@@ -0,0 +1,258 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.crypto_utils import CryptoUtils, KeyManager
+from app.core.executor import crypto_executor
+from app.models.user import File as FileModel, UploadChunk, UploadSession
+from app.services.encryption import FORMAT_SEGMENTED, NONCE_PREFIX_SIZE, SEGMENT_SIZE, encrypt_chunk
+from app.services.storage import get_storage
+from app.services.transfer import MAX_PARTS, MIN_PART_SIZE, PART_SIZE
+from app.services.usage import UsageService
+from app.utils.file_types import categorize, format_size
+
+# Plaintext bytes per chunk: whole segments, and at least S3's minimum part size
+CHUNK_SIZE = max(MIN_PART_SIZE, PART_SIZE) // SEGMENT_SIZE * SEGMENT_SIZE
+if CHUNK_SIZE < MIN_PART_SIZE:
+    CHUNK_SIZE += SEGMENT_SIZE
+UPLOAD_SESSION_TTL = timedelta(hours=settings.upload_session_ttl_hours)
+UPLOAD_GC_INTERVAL = settings.upload_gc_interval  # seconds between sweeps
+GC_BATCH_SIZE = 100
+
+_gc_lock = threading.Lock()
+_last_gc = 0.0
+
+
+class ResumableUploads:
+    """
+    Upload sessions: the client PUTs fixed-size chunks in any order (and in
+    parallel), each one is encrypted on arrival and staged as a storage part,
+    and completing joins the parts into the usual segmented object.
+
+    Chunk i holds segments [i * m, (i + 1) * m) of the object, so encrypting
+    a chunk only needs its index and the declared total size (to flag the
+    last segment). Chunk 0 also carries the format header. Chunk and segment
+    size are fixed on the session, so a restart with another
+    ENCRYPTION_SEGMENT_SIZE doesn't change the layout halfway.
+
+    The segment nonces are fixed by the session's nonce prefix and the
+    index, so a chunk may be sent again (lost response) but never with
+    other bytes: that would encrypt two plaintexts under one AES-GCM nonce.
+    """
+
+    @staticmethod
+    def create(db: Session, owner_id: int, filename: str, size: int, folder_id: Optional[int] = None) -> UploadSession:
+        if size < 0:
+            raise HTTPException(status_code=400, detail="Invalid size")
+        chunk_count = max(1, -(-size // CHUNK_SIZE))
+        if chunk_count > MAX_PARTS:
+            raise HTTPException(status_code=400, detail="File too large")
+
+        master_key = KeyManager.master_key(db, owner_id)
+        _, wrapped_key = KeyManager.new_file_key(master_key)
+        salt = CryptoUtils.generate_salt()
+        storage_path = f"enc_{CryptoUtils.encode_salt(salt)[:8]}_{filename}"
+
+        upload = UploadSession(
+            id=uuid.uuid4().hex,
+            owner_id=owner_id,
+            filename=filename,
+            folder_id=folder_id,
+            total_size=size,
+            chunk_size=CHUNK_SIZE,
+            chunk_count=chunk_count,
+            segment_size=SEGMENT_SIZE,
+            storage_path=storage_path,
+            storage_upload_id=get_storage().create_multipart(storage_path),
+            encryption_key=wrapped_key,
+            nonce=os.urandom(NONCE_PREFIX_SIZE).hex(),
+            status="open",
+            expires_at=datetime.utcnow() + UPLOAD_SESSION_TTL
+        )
+        db.add(upload)
+        db.commit()
+        db.refresh(upload)
+        return upload
+
+    @staticmethod
+    def get_owned(db: Session, owner_id: int, session_id: str) -> UploadSession:
+        upload = db.query(UploadSession).filter(
+            UploadSession.id == session_id, UploadSession.owner_id == owner_id
+        ).first()
+        if not upload:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        return upload
+
+    @staticmethod
+    def expected_size(upload: UploadSession, index: int) -> int:
+        if index < 0 or index >= upload.chunk_count:
+            raise HTTPException(status_code=400, detail=f"Chunk index must be 0..{upload.chunk_count - 1}")
+        if index < upload.chunk_count - 1:
+            return upload.chunk_size
+        return upload.total_size - upload.chunk_size * (upload.chunk_count - 1)
+
+    @staticmethod
+    def put_chunk(db: Session, upload: UploadSession, index: int, data: bytes) -> UploadChunk:
+        """Encrypts and stages one chunk. Re-sending identical bytes is safe; different bytes get a 409."""
+        if len(data) != ResumableUploads.expected_size(upload, index):
+            raise HTTPException(status_code=400, detail=f"Chunk {index} must be {ResumableUploads.expected_size(upload, index)} bytes")
+        ResumableUploads._claim_chunk(db, upload, index, hashlib.sha256(data).hexdigest(), len(data))
+
+        file_key = KeyManager.file_key(db, upload)
+        segment_size = upload.segment_size or SEGMENT_SIZE
+        segments_per_chunk = upload.chunk_size // segment_size
+        last_segment = max(0, -(-upload.total_size // segment_size) - 1)
+        ciphertext = crypto_executor.run_sync(
+            "aes_encrypt_chunk", encrypt_chunk, file_key, bytes.fromhex(upload.nonce), segment_size,
+            index * segments_per_chunk, data, last_segment, index == 0
+        )
+        etag = get_storage().upload_part(upload.storage_path, upload.storage_upload_id, index + 1, ciphertext)
+
+        chunk = db.get(UploadChunk, (upload.id, index))
+        chunk.etag = etag
+        db.commit()
+        return chunk
+
+    @staticmethod
+    def _claim_chunk(db: Session, upload: UploadSession, index: int, digest: str, size: int):
+        """
+        Records the chunk's hash before anything is encrypted. The primary key
+        makes the first sender of an index win; any later send must match it.
+        Runs in one transaction with a conditional update of the session, the
+        same row complete() flips to "completing": either the claim commits
+        first (and complete() sees the chunk, still pending) or it gets a 409.
+        """
+        chunk = None
+        try:
+            open_session = db.query(UploadSession).filter(
+                UploadSession.id == upload.id, UploadSession.status == "open"
+            ).update({UploadSession.expires_at: datetime.utcnow() + UPLOAD_SESSION_TTL}, synchronize_session=False)
+            if not open_session:
+                raise HTTPException(status_code=409, detail="Upload is being completed")
+            chunk = db.get(UploadChunk, (upload.id, index))
+            if chunk is None:
+                db.add(UploadChunk(session_id=upload.id, index=index, etag="", size=size, sha256=digest))
+            db.commit()
+        except IntegrityError:  # claimed by a concurrent request
+            db.rollback()
+            chunk = db.get(UploadChunk, (upload.id, index))
+        except HTTPException:
+            db.rollback()
+            raise
+        if chunk is not None and chunk.sha256 != digest:
+            raise HTTPException(status_code=409, detail=f"Chunk {index} was already received with different content")
+
+    @staticmethod
+    def received(db: Session, upload: UploadSession) -> list:
+        return [i for (i,) in db.query(UploadChunk.index).filter(
+            UploadChunk.session_id == upload.id, UploadChunk.etag != ""
+        ).order_by(UploadChunk.index).all()]
+
+    @staticmethod
+    def complete(db: Session, upload: UploadSession) -> FileModel:
+        """Joins the staged parts into the object and creates the File row."""
+        # Only one finalize call may proceed; chunks arriving from here on get a 409,
+        # so the parts listed below are final
+        claimed = db.query(UploadSession).filter(
+            UploadSession.id == upload.id, UploadSession.status == "open"
+        ).update({UploadSession.status: "completing"}, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            raise HTTPException(status_code=409, detail="Upload is being completed")
+
+        try:
+            chunks = db.query(UploadChunk.index, UploadChunk.etag).filter(
+                UploadChunk.session_id == upload.id, UploadChunk.etag != ""
+            ).all()
+            missing = sorted(set(range(upload.chunk_count)) - {i for i, _ in chunks})
+            if missing:
+                raise HTTPException(status_code=400, detail={"message": "Missing chunks", "missing": missing[:100]})
+            get_storage().complete_multipart(upload.storage_path, upload.storage_upload_id, [(i + 1, etag) for i, etag in chunks])
+        except Exception:
+            db.rollback()
+            db.query(UploadSession).filter(UploadSession.id == upload.id).update(
+                {UploadSession.status: "open"}, synchronize_session=False
+            )
+            db.commit()
+            raise
+
+        category = categorize(upload.filename)
+        new_file = FileModel(
+            filename=upload.filename,
+            file_type=upload.filename.split('.')[-1] if '.' in upload.filename else "unknown",
+            category=category,
+            size=format_size(upload.total_size),
+            size_bytes=upload.total_size,
+            stored_bytes=upload.total_size,
+            codec=None,
+            encryption_key=upload.encryption_key,
+            nonce=upload.nonce,
+            enc_version=FORMAT_SEGMENTED,
+            storage_path=upload.storage_path,
+            owner_id=upload.owner_id,
+            folder_id=upload.folder_id
+        )
+        db.add(new_file)
+        UsageService.record(db, upload.owner_id, category, upload.total_size, 1)
+        db.query(UploadChunk).filter(UploadChunk.session_id == upload.id).delete(synchronize_session=False)
+        db.query(UploadSession).filter(UploadSession.id == upload.id).delete(synchronize_session=False)
+        db.commit()
+        db.refresh(new_file)
+        return new_file
+
+    @staticmethod
+    def abort(db: Session, upload: UploadSession):
+        get_storage().abort_multipart(upload.storage_path, upload.storage_upload_id)
+        db.query(UploadChunk).filter(UploadChunk.session_id == upload.id).delete(synchronize_session=False)
+        db.query(UploadSession).filter(UploadSession.id == upload.id).delete(synchronize_session=False)
+        db.commit()
+
+    @staticmethod
+    def collect_expired(db: Session, now: Optional[datetime] = None) -> int:
+        """Aborts sessions nobody touched for UPLOAD_SESSION_TTL. Returns how many went."""
+        now = now or datetime.utcnow()
+        collected = 0
+        while True:
+            expired = db.query(UploadSession).filter(UploadSession.expires_at < now).limit(GC_BATCH_SIZE).all()
+            if not expired:
+                return collected
+            for upload in expired:
+                try:
+                    ResumableUploads.abort(db, upload)
+                    collected += 1
+                except Exception as e:
+                    db.rollback()
+                    print(f"❌ Upload GC Error ({upload.id}): {e}")
+                    return collected
+
+    @staticmethod
+    def maybe_collect():
+        """collect_expired() at most once per UPLOAD_GC_INTERVAL in this process (background task)."""
+        global _last_gc
+        with _gc_lock:
+            if time.monotonic() - _last_gc < UPLOAD_GC_INTERVAL:
+                return
+            _last_gc = time.monotonic()
+        from app.core.database import SessionLocal
+        db = SessionLocal()
+        try:
+            ResumableUploads.collect_expired(db)
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    # python -m app.services.resumable  (e.g. from cron)
+    from app.core.database import SessionLocal
+    db = SessionLocal()
+    try:
+        print(f"✅ Collected {ResumableUploads.collect_expired(db)} expired upload sessions")
+    finally:
+        db.close()
@@ -1,54 +1,153 @@
 import boto3
-import os
-from dotenv import load_dotenv
+import io
+from typing import Iterable, Iterator, Optional
 from fastapi import HTTPException
+from app.core.config import settings
+from app.services.storage import StorageBackend
+from app.services.transfer import TransferManager
 
-# 1. Load Environment Variables
-load_dotenv()
-
-AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-AWS_BUCKET_NAME = os.getenv("AWS_BUCKET_NAME")
-AWS_REGION = os.getenv("AWS_REGION")
-
-# 2. Create the S3 Client
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY,
-    region_name=AWS_REGION
-)
-
-class S3Service:
-    @staticmethod
-    def upload_file(file_bytes: bytes, object_name: str):
+# 1. Credentials and bucket (AWS_* settings)
+AWS_ACCESS_KEY = settings.aws_access_key_id
+AWS_SECRET_KEY = settings.aws_secret_access_key
+AWS_BUCKET_NAME = settings.aws_bucket_name
+AWS_REGION = settings.aws_region
+
+# Size of the pieces we pull off a streaming GET body
+STREAM_CHUNK_SIZE = 256 * 1024
+# DeleteObjects accepts at most 1,000 keys per call
+DELETE_BATCH_SIZE = 1000
+
+class S3Service(StorageBackend):
+    def __init__(self, client=None, bucket: Optional[str] = None):
+        # 2. Create the S3 Client (per backend instance, not at import time)
+        self.client = client or boto3.client(
+            "s3",
+            aws_access_key_id=AWS_ACCESS_KEY,
+            aws_secret_access_key=AWS_SECRET_KEY,
+            region_name=AWS_REGION
+        )
+        self.bucket = bucket or AWS_BUCKET_NAME
+        # 3. Multipart / parallel ranged transfers (S3_PART_SIZE_MB, S3_MAX_CONCURRENCY)
+        self.transfer_manager = TransferManager(self.client, self.bucket)
+
+    def upload_file(self, file_bytes: bytes, object_name: str):
         """Uploads encrypted bytes to S3"""
         try:
-            s3_client.put_object(
-                Bucket=AWS_BUCKET_NAME,
-                Key=object_name,
-                Body=file_bytes
-            )
+            self.transfer_manager.upload(io.BytesIO(file_bytes), object_name)
             return True
         except Exception as e:
             print(f"❌ S3 Upload Error: {e}")
             raise HTTPException(status_code=500, detail="Failed to upload to cloud storage")
 
-    @staticmethod
-    def download_file(object_name: str) -> bytes:
+    def upload_stream(self, file_obj, object_name: str):
+        """Streams a file-like object to S3 as concurrent multipart parts (bounded memory)"""
+        try:
+            self.transfer_manager.upload(file_obj, object_name)
+            return True
+        except Exception as e:
+            print(f"❌ S3 Upload Error: {e}")
+            raise HTTPException(status_code=500, detail="Failed to upload to cloud storage")
+
+    def download_file(self, object_name: str) -> bytes:
         """Downloads encrypted bytes from S3"""
         try:
-            response = s3_client.get_object(Bucket=AWS_BUCKET_NAME, Key=object_name)
-            return response['Body'].read()
+            return b"".join(self.transfer_manager.download(object_name))
         except Exception as e:
             print(f"❌ S3 Download Error: {e}")
             raise HTTPException(status_code=404, detail="File not found in cloud storage")
 
-    @staticmethod
-    def delete_file(object_name: str):
+    def get_stream(self, object_name: str, start: Optional[int] = None, end: Optional[int] = None) -> tuple[Iterator[bytes], int]:
+        """
+        Opens a (ranged, end inclusive) GET on S3 without reading the body.
+        Returns: (chunk iterator, total object size)
+        """
+        try:
+            params = {"Bucket": self.bucket, "Key": object_name}
+            if start is not None:
+                params["Range"] = f"bytes={start}-{'' if end is None else end}"
+            response = self.client.get_object(**params)
+        except Exception as e:
+            print(f"❌ S3 Download Error: {e}")
+            raise HTTPException(status_code=404, detail="File not found in cloud storage")
+
+        if response.get("ContentRange"):
+            total_size = int(response["ContentRange"].rsplit("/", 1)[1])
+        else:
+            total_size = response["ContentLength"]
+        return _iter_body(response["Body"]), total_size
+
+    def delete_file(self, object_name: str):
         """Deletes file from S3"""
         try:
-            s3_client.delete_object(Bucket=AWS_BUCKET_NAME, Key=object_name)
+            self.client.delete_object(Bucket=self.bucket, Key=object_name)
         except Exception as e:
             print(f"❌ S3 Delete Error: {e}")
-            raise HTTPException(status_code=500, detail="Failed to delete from cloud")
\ No newline at end of file
+            raise HTTPException(status_code=500, detail="Failed to delete from cloud")
+
+    def delete_files(self, object_names: Iterable[str]):
+        """Deletes many files with DeleteObjects, 1,000 keys per request"""
+        object_names = list(object_names)
+        for i in range(0, len(object_names), DELETE_BATCH_SIZE):
+            batch = object_names[i:i + DELETE_BATCH_SIZE]
+            try:
+                response = self.client.delete_objects(
+                    Bucket=self.bucket,
+                    Delete={"Objects": [{"Key": name} for name in batch], "Quiet": True},
+                )
+            except Exception as e:
+                print(f"❌ S3 Delete Error: {e}")
+                raise HTTPException(status_code=500, detail="Failed to delete from cloud")
+            if response.get("Errors"):
+                print(f"❌ S3 Delete Error: {response['Errors'][:5]}")
+                raise HTTPException(status_code=500, detail="Failed to delete from cloud")
+
+    def list_objects(self) -> Iterator[tuple[str, float]]:
+        """Pages through the bucket with ListObjectsV2 (1,000 keys per request)"""
+        try:
+            for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket):
+                for item in page.get("Contents", []):
+                    yield item["Key"], item["LastModified"].timestamp()
+        except Exception as e:
+            print(f"❌ S3 List Error: {e}")
+            raise HTTPException(status_code=500, detail="Failed to list cloud storage")
+
+    def create_multipart(self, object_name: str) -> str:
+        try:
+            return self.client.create_multipart_upload(Bucket=self.bucket, Key=object_name)["UploadId"]
+        except Exception as e:
+            print(f"❌ S3 Upload Error: {e}")
+            raise HTTPException(status_code=500, detail="Failed to upload to cloud storage")
+
+    def upload_part(self, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+        try:
+            return self.client.upload_part(
+                Bucket=self.bucket, Key=object_name, UploadId=upload_id, PartNumber=part_number, Body=data
+            )["ETag"]
+        except Exception as e:
+            print(f"❌ S3 Upload Error: {e}")
+            raise HTTPException(status_code=500, detail="Failed to upload to cloud storage")
+
+    def complete_multipart(self, object_name: str, upload_id: str, parts: list[tuple[int, str]]):
+        try:
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=object_name, UploadId=upload_id,
+                MultipartUpload={"Parts": [{"PartNumber": n, "ETag": etag} for n, etag in sorted(parts)]},
+            )
+        except Exception as e:
+            print(f"❌ S3 Upload Error: {e}")
+            raise HTTPException(status_code=500, detail="Failed to upload to cloud storage")
+
+    def abort_multipart(self, object_name: str, upload_id: str):
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=object_name, UploadId=upload_id)
+        except Exception as e:
+            # Already completed / aborted: a bucket lifecycle rule cleans up anything we miss
+            print(f"❌ S3 Abort Error: {e}")
+
+
+def _iter_body(body) -> Iterator[bytes]:
+    # Closing in finally releases the connection even if the client disconnects mid-download
+    try:
+        yield from body.iter_chunks(STREAM_CHUNK_SIZE)
+    finally:
+        body.close()
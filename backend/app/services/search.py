@@ -0,0 +1,239 @@
+import weakref
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import func, inspect, or_, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.user import File as FileModel, Folder
+from app.services.listing import FILE_COLUMNS, FOLDER_COLUMNS, encode_cursor, decode_cursor
+
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 200
+# Matches ranked per query and kind, newest first. Ranking inside the index
+# (bm25) needs statistics over every match, which grows with the library;
+# this bound keeps a query's cost flat at any size. Responses say when it cut
+# matches off (truncated): older ones are then only found by a narrower query.
+SEARCH_CANDIDATES = settings.search_candidates
+MAX_QUERY_LENGTH = 200
+KINDS = ("all", "files", "folders")
+
+# Trigrams: terms shorter than this cannot use the index
+MIN_INDEXED_TERM = 3
+
+# --- INDEX DDL ---
+# SQLite: FTS5 tables with the trigram tokenizer (substring matches), kept in
+# step with files / folders by triggers, so every write path (uploads, bulk
+# and resumable, rename, move, delete, cascades) updates them in the same
+# transaction. The owner is indexed as "<id>", a token no other owner's value
+# contains, so scoping happens inside the index.
+_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(owner, name, file_type, tokenize='trigram')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS folders_fts USING fts5(owner, name, tokenize='trigram')",
+    """CREATE TRIGGER IF NOT EXISTS files_fts_insert AFTER INSERT ON files BEGIN
+        INSERT INTO files_fts(rowid, owner, name, file_type)
+        VALUES (new.id, '<' || new.owner_id || '>', new.filename, new.file_type);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS files_fts_update AFTER UPDATE OF owner_id, filename, file_type ON files BEGIN
+        UPDATE files_fts SET owner = '<' || new.owner_id || '>', name = new.filename, file_type = new.file_type
+        WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS files_fts_delete AFTER DELETE ON files BEGIN
+        DELETE FROM files_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS folders_fts_insert AFTER INSERT ON folders BEGIN
+        INSERT INTO folders_fts(rowid, owner, name) VALUES (new.id, '<' || new.owner_id || '>', new.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS folders_fts_update AFTER UPDATE OF owner_id, name ON folders BEGIN
+        UPDATE folders_fts SET owner = '<' || new.owner_id || '>', name = new.name WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS folders_fts_delete AFTER DELETE ON folders BEGIN
+        DELETE FROM folders_fts WHERE rowid = old.id;
+    END""",
+)
+_SQLITE_BACKFILL = (
+    "INSERT INTO files_fts(rowid, owner, name, file_type) "
+    "SELECT id, '<' || owner_id || '>', filename, file_type FROM files",
+    "INSERT INTO folders_fts(rowid, owner, name) SELECT id, '<' || owner_id || '>', name FROM folders",
+)
+
+# PostgreSQL: trigram GIN indexes on the columns themselves (nothing to keep in sync)
+_POSTGRES_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_files_filename_trgm ON files USING gin (lower(filename) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_files_file_type_trgm ON files USING gin (lower(file_type) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_folders_name_trgm ON folders USING gin (lower(name) gin_trgm_ops)",
+)
+
+
+def create_search_index(engine):
+    """Idempotent; runs with the migrations. New FTS tables are filled from existing rows."""
+    dialect = engine.dialect.name
+    try:
+        if dialect == "sqlite":
+            fresh = not inspect(engine).has_table("files_fts")
+            with engine.begin() as conn:
+                for ddl in _SQLITE_DDL:
+                    conn.execute(text(ddl))
+                if fresh:
+                    for backfill in _SQLITE_BACKFILL:
+                        conn.execute(text(backfill))
+        elif dialect == "postgresql":
+            with engine.begin() as conn:
+                for ddl in _POSTGRES_DDL:
+                    conn.execute(text(ddl))
+    except DBAPIError as e:
+        # No FTS5 trigram tokenizer (SQLite < 3.34) / no rights to CREATE EXTENSION: search still works, unindexed
+        print(f"❌ Search index unavailable, falling back to LIKE scans: {e}")
+    _fts_tables.pop(engine, None)
+
+
+def _terms(q: str) -> list[str]:
+    q = (q or "").strip()
+    if not q:
+        raise HTTPException(status_code=400, detail="q is required")
+    if len(q) > MAX_QUERY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"q is limited to {MAX_QUERY_LENGTH} characters")
+    return [term.lower() for term in q.split()]
+
+def _phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+def _like(term: str) -> str:
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def _score(name: str, file_type: Optional[str], terms: list[str]) -> float:
+    """
+    Filename relevance: exact name > name prefix > word start > anywhere >
+    file type only, summed over the terms; shorter names win ties.
+    """
+    name = (name or "").lower()
+    stem = name.rsplit(".", 1)[0]
+    score = 0.0
+    for term in terms:
+        at = name.find(term)
+        if term in (name, stem):
+            score += 4
+        elif at == 0:
+            score += 3
+        elif at > 0 and not name[at - 1].isalnum():
+            score += 2
+        elif at > 0:
+            score += 1
+        elif file_type and term in file_type.lower():
+            score += 0.5
+    return score + 1 / (1 + len(name))
+
+
+class SearchService:
+    @staticmethod
+    def search(db: Session, owner_id: int, q: str, kind: str = "all", limit: int = SEARCH_PAGE_SIZE,
+               cursor: Optional[str] = None):
+        """
+        Best matches first across file names, file types and folder names.
+        Returns (rows, next_cursor, truncated); rows are dicts with kind "file" /
+        "folder". truncated: more than SEARCH_CANDIDATES files or folders
+        matched, and only the newest of them were ranked.
+        """
+        if kind not in KINDS:
+            raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(KINDS)}")
+        if not 1 <= limit <= SEARCH_MAX_PAGE_SIZE:
+            raise HTTPException(status_code=400, detail=f"limit must be between 1 and {SEARCH_MAX_PAGE_SIZE}")
+        terms = _terms(q)
+        offset = decode_cursor(cursor, "search")[0] if cursor else 0
+        if not isinstance(offset, int) or offset < 0:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+        rows, truncated = [], False
+        if kind in ("all", "files"):
+            files = SearchService._files(db, owner_id, terms)
+            truncated |= len(files) > SEARCH_CANDIDATES
+            rows += [_file_row(row, terms) for row in files[:SEARCH_CANDIDATES]]
+        if kind in ("all", "folders"):
+            folders = SearchService._folders(db, owner_id, terms)
+            truncated |= len(folders) > SEARCH_CANDIDATES
+            rows += [_folder_row(row, terms) for row in folders[:SEARCH_CANDIDATES]]
+        rows.sort(key=lambda row: (-row["score"], -row["id"], row["kind"]))
+
+        page = rows[offset:offset + limit]
+        return page, encode_cursor("search", offset + limit, 0) if len(rows) > offset + limit else None, truncated
+
+    @staticmethod
+    def _files(db: Session, owner_id: int, terms: list[str]):
+        """Newest SEARCH_CANDIDATES (+ 1, to tell truncation) files matching every term in the name or type."""
+        long_terms = [t for t in terms if len(t) >= MIN_INDEXED_TERM]
+        if long_terms and _has_fts(db):
+            short = [t for t in terms if len(t) < MIN_INDEXED_TERM]
+            match = " AND ".join([f"owner : {_phrase(f'<{owner_id}>')}"] +
+                                 [f"{{name file_type}} : {_phrase(t)}" for t in long_terms])
+            where = "".join(
+                f" AND (lower(f.filename) LIKE :s{i} ESCAPE '\\' OR lower(f.file_type) LIKE :s{i} ESCAPE '\\')"
+                for i in range(len(short))
+            )
+            # rowid order lets FTS5 stop after the first matches instead of scoring them all
+            return db.execute(text(
+                "SELECT f.id, f.filename, f.file_type, f.size, f.size_bytes, f.category, f.upload_date, f.folder_id "
+                "FROM files_fts JOIN files f ON f.id = files_fts.rowid "
+                f"WHERE files_fts MATCH :match AND f.owner_id = :owner AND f.deleted_at IS NULL{where} "
+                "ORDER BY files_fts.rowid DESC LIMIT :candidates"
+            ).columns(*FILE_COLUMNS), {
+                "match": match, "owner": owner_id, "candidates": SEARCH_CANDIDATES + 1,
+                **{f"s{i}": _like(t) for i, t in enumerate(short)},
+            }).all()
+
+        # PostgreSQL: LIKE '%term%' on lower() is served by the trigram indexes (same expressions;
+        # a NULL file_type just fails its LIKE)
+        name, file_type = func.lower(FileModel.filename), func.lower(FileModel.file_type)
+        query = db.query(*FILE_COLUMNS).filter(FileModel.owner_id == owner_id, FileModel.deleted_at.is_(None))
+        for term in terms:
+            query = query.filter(or_(name.like(_like(term), escape="\\"), file_type.like(_like(term), escape="\\")))
+        return query.order_by(FileModel.id.desc()).limit(SEARCH_CANDIDATES + 1).all()
+
+    @staticmethod
+    def _folders(db: Session, owner_id: int, terms: list[str]):
+        """Newest SEARCH_CANDIDATES (+ 1) folders whose name matches every term."""
+        long_terms = [t for t in terms if len(t) >= MIN_INDEXED_TERM]
+        if long_terms and _has_fts(db):
+            short = [t for t in terms if len(t) < MIN_INDEXED_TERM]
+            match = " AND ".join([f"owner : {_phrase(f'<{owner_id}>')}"] +
+                                 [f"name : {_phrase(t)}" for t in long_terms])
+            where = "".join(f" AND lower(d.name) LIKE :s{i} ESCAPE '\\'" for i in range(len(short)))
+            return db.execute(text(
+                "SELECT d.id, d.name, d.parent_id, d.created_at "
+                "FROM folders_fts JOIN folders d ON d.id = folders_fts.rowid "
+                f"WHERE folders_fts MATCH :match AND d.owner_id = :owner{where} "
+                "ORDER BY folders_fts.rowid DESC LIMIT :candidates"
+            ).columns(*FOLDER_COLUMNS), {
+                "match": match, "owner": owner_id, "candidates": SEARCH_CANDIDATES + 1,
+                **{f"s{i}": _like(t) for i, t in enumerate(short)},
+            }).all()
+
+        name = func.lower(Folder.name)
+        query = db.query(*FOLDER_COLUMNS).filter(Folder.owner_id == owner_id)
+        for term in terms:
+            query = query.filter(name.like(_like(term), escape="\\"))
+        return query.order_by(Folder.id.desc()).limit(SEARCH_CANDIDATES + 1).all()
+
+
+def _has_fts(db: Session) -> bool:
+    engine = db.get_bind()
+    if engine.dialect.name != "sqlite":
+        return False
+    if engine not in _fts_tables:
+        _fts_tables[engine] = inspect(engine).has_table("files_fts")
+    return _fts_tables[engine]
+
+_fts_tables = weakref.WeakKeyDictionary()  # engine -> FTS tables exist
+
+def _file_row(row, terms: list[str]) -> dict:
+    return {
+        "kind": "file", "id": row.id, "name": row.filename, "file_type": row.file_type, "size": row.size,
+        "size_bytes": row.size_bytes, "category": row.category, "date": row.upload_date,
+        "folder_id": row.folder_id, "score": round(_score(row.filename, row.file_type, terms), 4),
+    }
+
+def _folder_row(row, terms: list[str]) -> dict:
+    return {
+        "kind": "folder", "id": row.id, "name": row.name, "date": row.created_at,
+        "folder_id": row.parent_id, "score": round(_score(row.name, None, terms), 4),
+    }
@@ -0,0 +1,99 @@
+import base64
+import calendar
+import hashlib
+import hmac
+import time
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.crypto_utils import CryptoUtils
+from app.core.security import SECRET_KEY
+from app.core.ttl_cache import TTLCache
+from app.models.user import File as FileModel, SharedLink
+
+SHARE_CACHE_SIZE = settings.share_cache_size
+# Other workers see a revoke at most this late
+SHARE_CACHE_TTL = settings.share_cache_ttl  # seconds
+SHARE_TOKEN_TTL = settings.share_token_ttl  # seconds
+
+# A link and everything a download of its file needs, in one row
+LINK_COLUMNS = (
+    SharedLink.id.label("link_id"), SharedLink.unique_hash, SharedLink.password_hash, SharedLink.expires_at,
+    FileModel.id, FileModel.owner_id, FileModel.filename, FileModel.size, FileModel.size_bytes,
+    FileModel.upload_date, FileModel.storage_path, FileModel.encryption_key, FileModel.nonce,
+    FileModel.enc_version, FileModel.codec,
+)
+
+# unique_hash -> LINK_COLUMNS row (immutable, not bound to any Session)
+share_link_cache = TTLCache(SHARE_CACHE_SIZE, SHARE_CACHE_TTL)
+
+_token_key = CryptoUtils.hkdf(SECRET_KEY.encode(), b"ecd/share-token/v1")
+
+
+def _epoch(moment: datetime) -> int:
+    return calendar.timegm(moment.utctimetuple())
+
+
+class ShareLinks:
+    """
+    Public share lookups. Link metadata is cached per process, and a correct
+    password buys a short-lived signed download token, so retries and range
+    requests of a protected link cost an HMAC instead of a bcrypt verify.
+    """
+
+    @staticmethod
+    def lookup(db: Session, unique_hash: str):
+        """The link joined with its file (1 query on a miss). 404 unknown, 410 expired."""
+        link = share_link_cache.get(unique_hash)
+        if link is None:
+            link = db.query(*LINK_COLUMNS).join(FileModel, SharedLink.file_id == FileModel.id).filter(
+                SharedLink.unique_hash == unique_hash, FileModel.deleted_at.is_(None) # trashed: dead until restored
+            ).first()
+            if not link:
+                raise HTTPException(status_code=404, detail="Link not found")
+            ttl = None
+            if link.expires_at:
+                ttl = max(0, _epoch(link.expires_at) - time.time())
+            share_link_cache.put(unique_hash, link, ttl)
+
+        if link.expires_at and link.expires_at < datetime.utcnow():
+            share_link_cache.forget(unique_hash)
+            raise HTTPException(status_code=410, detail="Link expired")
+        return link
+
+    @staticmethod
+    def issue_token(link) -> tuple[str, int]:
+        """Signed token for downloading this link without the password. Returns (token, expires_in)."""
+        expires = int(time.time()) + SHARE_TOKEN_TTL
+        if link.expires_at:
+            expires = min(expires, _epoch(link.expires_at))
+        return f"{expires}.{ShareLinks._sign(link, expires)}", max(0, expires - int(time.time()))
+
+    @staticmethod
+    def check_token(link, token: Optional[str]) -> bool:
+        try:
+            expires, signature = token.split(".", 1)
+            expires = int(expires)
+        except (AttributeError, ValueError):
+            return False
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(signature, ShareLinks._sign(link, expires))
+
+    @staticmethod
+    def _sign(link, expires: int) -> str:
+        # Bound to the link row and its password: a revoked or re-protected link voids old tokens
+        message = f"{link.link_id}:{link.unique_hash}:{link.password_hash or ''}:{expires}".encode()
+        digest = hmac.new(_token_key, message, hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+    @staticmethod
+    def forget(unique_hash: str):
+        share_link_cache.forget(unique_hash)
+
+    @staticmethod
+    def forget_owner(owner_id: int) -> int:
+        """Drops the cached links to any of a user's files (after their files were deleted)."""
+        return share_link_cache.forget_where(lambda _, link: link.owner_id == owner_id)
@@ -0,0 +1,193 @@
+import os
+from typing import Iterable, Iterator, Optional
+from fastapi.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.metrics import STORAGE_BYTES, STORAGE_OPERATIONS, span, timed_iter
+
+# "s3" (default) or "local"
+STORAGE_BACKEND = settings.storage_backend.lower()
+
+
+class StorageBackend:
+    """
+    Where encrypted objects live. Object names are flat keys.
+    Methods are blocking (sync routes already run in the threadpool); async
+    routes use the `a*` wrappers so disk/network I/O never runs on the event loop.
+    Failures surface as HTTPException, like the original S3Service did.
+    """
+
+    def upload_file(self, file_bytes: bytes, object_name: str):
+        raise NotImplementedError
+
+    def upload_stream(self, file_obj, object_name: str):
+        """Stores everything readable from a file-like object."""
+        raise NotImplementedError
+
+    def download_file(self, object_name: str) -> bytes:
+        raise NotImplementedError
+
+    def get_stream(self, object_name: str, start: Optional[int] = None, end: Optional[int] = None) -> tuple[Iterator[bytes], int]:
+        """
+        Opens a (ranged, end inclusive) read without loading the object.
+        Returns: (chunk iterator, total object size)
+        """
+        raise NotImplementedError
+
+    def delete_file(self, object_name: str):
+        raise NotImplementedError
+
+    def delete_files(self, object_names: Iterable[str]):
+        for object_name in object_names:
+            self.delete_file(object_name)
+
+    def list_objects(self) -> Iterator[tuple[str, float]]:
+        """Every stored object as (name, last modified epoch seconds), lazily (reconciliation)."""
+        raise NotImplementedError
+
+    # --- staged (multipart) writes: parts arrive in any order, the object appears on complete ---
+    def create_multipart(self, object_name: str) -> str:
+        """Returns an upload id."""
+        raise NotImplementedError
+
+    def upload_part(self, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+        """Stores part `part_number` (1-based; re-sending replaces it). Returns its ETag."""
+        raise NotImplementedError
+
+    def complete_multipart(self, object_name: str, upload_id: str, parts: list[tuple[int, str]]):
+        """Joins the (part_number, etag) parts, in part order, into the object."""
+        raise NotImplementedError
+
+    def abort_multipart(self, object_name: str, upload_id: str):
+        """Drops staged parts. Safe to call for unknown / finished uploads."""
+        raise NotImplementedError
+
+    # --- async wrappers ---
+    async def aupload_stream(self, file_obj, object_name: str):
+        return await run_in_threadpool(self.upload_stream, file_obj, object_name)
+
+    async def adownload_file(self, object_name: str) -> bytes:
+        return await run_in_threadpool(self.download_file, object_name)
+
+    async def adelete_files(self, object_names: Iterable[str]):
+        return await run_in_threadpool(self.delete_files, list(object_names))
+
+
+class MeteredStorage(StorageBackend):
+    """
+    Wraps a backend with byte / call counters and timing spans ("storage_write",
+    "storage_read"); everything else is passed through to it.
+    """
+
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def upload_file(self, file_bytes: bytes, object_name: str):
+        STORAGE_OPERATIONS.inc(1, "upload")
+        with span("storage_write"):
+            result = self.backend.upload_file(file_bytes, object_name)
+        STORAGE_BYTES.inc(len(file_bytes), "write")
+        return result
+
+    def upload_stream(self, file_obj, object_name: str):
+        STORAGE_OPERATIONS.inc(1, "upload")
+        reader = _MeteredReader(file_obj)
+        with span("storage_write"):
+            return self.backend.upload_stream(reader, object_name)
+
+    def download_file(self, object_name: str) -> bytes:
+        STORAGE_OPERATIONS.inc(1, "download")
+        with span("storage_read"):
+            data = self.backend.download_file(object_name)
+        STORAGE_BYTES.inc(len(data), "read")
+        return data
+
+    def get_stream(self, object_name: str, start: Optional[int] = None, end: Optional[int] = None) -> tuple[Iterator[bytes], int]:
+        STORAGE_OPERATIONS.inc(1, "download")
+        with span("storage_read"):
+            chunks, total_size = self.backend.get_stream(object_name, start, end)
+        # The body is read lazily, as the response streams
+        return timed_iter(chunks, "storage_read", lambda n: STORAGE_BYTES.inc(n, "read")), total_size
+
+    def delete_file(self, object_name: str):
+        STORAGE_OPERATIONS.inc(1, "delete")
+        with span("storage_delete"):
+            return self.backend.delete_file(object_name)
+
+    def delete_files(self, object_names: Iterable[str]):
+        STORAGE_OPERATIONS.inc(1, "delete")
+        with span("storage_delete"):
+            return self.backend.delete_files(object_names)
+
+    def list_objects(self) -> Iterator[tuple[str, float]]:
+        STORAGE_OPERATIONS.inc(1, "list")
+        return self.backend.list_objects()
+
+    def create_multipart(self, object_name: str) -> str:
+        STORAGE_OPERATIONS.inc(1, "create_multipart")
+        with span("storage_write"):
+            return self.backend.create_multipart(object_name)
+
+    def upload_part(self, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+        STORAGE_OPERATIONS.inc(1, "upload_part")
+        with span("storage_write"):
+            etag = self.backend.upload_part(object_name, upload_id, part_number, data)
+        STORAGE_BYTES.inc(len(data), "write")
+        return etag
+
+    def complete_multipart(self, object_name: str, upload_id: str, parts: list[tuple[int, str]]):
+        STORAGE_OPERATIONS.inc(1, "complete_multipart")
+        with span("storage_write"):
+            return self.backend.complete_multipart(object_name, upload_id, parts)
+
+    def abort_multipart(self, object_name: str, upload_id: str):
+        STORAGE_OPERATIONS.inc(1, "abort_multipart")
+        with span("storage_delete"):
+            return self.backend.abort_multipart(object_name, upload_id)
+
+
+class _MeteredReader:
+    """read()-only view of an upload source that counts what the backend pulled."""
+
+    def __init__(self, source):
+        self._source = source
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._source.read(size)
+        STORAGE_BYTES.inc(len(data), "write")
+        return data
+
+
+_storage: Optional[StorageBackend] = None
+_storage_pid: Optional[int] = None
+
+def get_storage() -> StorageBackend:
+    """
+    Returns the configured backend, created on first use in each process:
+    a worker forked after the parent touched storage gets its own client
+    (boto3 clients and their connection pools aren't fork-safe).
+    """
+    global _storage, _storage_pid
+    if _storage is None or _storage_pid != os.getpid():
+        if STORAGE_BACKEND == "local":
+            from app.services.local_storage import LocalStorage
+            _storage = MeteredStorage(LocalStorage())
+        elif STORAGE_BACKEND == "s3":
+            from app.services.s3 import S3Service
+            from app.services.object_cache import OBJECT_CACHE_DIR, CachingStorage
+            _storage = MeteredStorage(S3Service())
+            if OBJECT_CACHE_DIR:
+                # Outside the meter: ecd_storage_* keeps counting only real S3 traffic
+                _storage = CachingStorage(_storage)
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+        _storage_pid = os.getpid()
+    return _storage
+
+def set_storage(backend: Optional[StorageBackend]):
+    """Swaps the backend (tests, benchmarks); None drops it, the next get_storage() builds a new one."""
+    global _storage, _storage_pid
+    _storage = MeteredStorage(backend) if backend is not None else None
+    _storage_pid = os.getpid()
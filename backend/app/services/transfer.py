@@ -0,0 +1,150 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+from app.core.config import settings
+from app.services.encryption import INFLIGHT_BYTES
+
+# Tunables (S3 rules: every part but the last >= 5 MB, at most 10,000 parts)
+PART_SIZE = int(settings.s3_part_size_mb * 1024 * 1024)
+MAX_CONCURRENCY = settings.s3_max_concurrency
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10_000
+
+
+def working_set(size_bytes: Optional[int]) -> int:
+    """Memory a streamed transfer of `size_bytes` may hold: its windows of parts and segment batches in flight, at most the file."""
+    window = PART_SIZE * MAX_CONCURRENCY + INFLIGHT_BYTES
+    return window if size_bytes is None else min(size_bytes, window)
+
+
+class TransferStats:
+    """Bytes moved and wall time of one transfer, for throughput numbers."""
+
+    def __init__(self):
+        self.bytes = 0
+        self.parts = 0
+        self.seconds = 0.0
+
+    @property
+    def mb_per_s(self) -> float:
+        return self.bytes / (1024 * 1024) / self.seconds if self.seconds else 0.0
+
+
+class TransferManager:
+    """
+    Moves objects over several S3 connections at once.
+    Uploads: multipart with at most `max_concurrency` parts being read/sent at a
+    time, aborted on any failure. Downloads: ranged GETs of `part_size` issued
+    concurrently and yielded back in order, with a bounded prefetch window.
+    """
+
+    def __init__(self, client, bucket: str, part_size: int = PART_SIZE, max_concurrency: int = MAX_CONCURRENCY):
+        self.client = client
+        self.bucket = bucket
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.max_concurrency = max(1, max_concurrency)
+
+    # --- UPLOAD ---
+    def upload(self, file_obj, key: str) -> TransferStats:
+        """Uploads everything readable from `file_obj`."""
+        stats = TransferStats()
+        started = time.perf_counter()
+
+        first = _read_part(file_obj, self.part_size)
+        if len(first) < self.part_size:
+            # Fits in one request: no multipart bookkeeping needed
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=first)
+            stats.bytes, stats.parts = len(first), 1
+            stats.seconds = time.perf_counter() - started
+            return stats
+
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=key)["UploadId"]
+        try:
+            parts = self._upload_parts(file_obj, key, upload_id, first, stats)
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            # Otherwise the uploaded parts linger (and are billed) until a lifecycle rule clears them
+            try:
+                self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            except Exception as e:
+                print(f"❌ S3 Abort Error: {e}")
+            raise
+
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+    def _upload_parts(self, file_obj, key: str, upload_id: str, first: bytes, stats: TransferStats) -> list:
+        parts = []
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            number, data = 1, first
+            while data:
+                if number > MAX_PARTS:
+                    raise ValueError("Object too large for a multipart upload")
+                in_flight.append(pool.submit(self._upload_part, key, upload_id, number, data))
+                stats.bytes += len(data)
+                # Bounded: never hold more than max_concurrency parts in memory
+                if len(in_flight) >= self.max_concurrency:
+                    parts.append(in_flight.popleft().result())
+                number += 1
+                data = _read_part(file_obj, self.part_size)
+            while in_flight:
+                parts.append(in_flight.popleft().result())
+        stats.parts = len(parts)
+        return parts
+
+    def _upload_part(self, key: str, upload_id: str, number: int, data: bytes) -> dict:
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=data,
+        )
+        return {"PartNumber": number, "ETag": response["ETag"]}
+
+    # --- DOWNLOAD ---
+    def download(self, key: str, size: Optional[int] = None, stats: Optional[TransferStats] = None) -> Iterator[bytes]:
+        """Yields the object in order, fetching up to `max_concurrency` parts at once."""
+        stats = stats if stats is not None else TransferStats()
+        started = time.perf_counter()
+        if size is None:
+            size = self.client.head_object(Bucket=self.bucket, Key=key)["ContentLength"]
+        ranges = [(start, min(start + self.part_size, size) - 1) for start in range(0, size, self.part_size)]
+
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            try:
+                for byte_range in ranges:
+                    pending.append(pool.submit(self._get_range, key, *byte_range))
+                    if len(pending) >= self.max_concurrency:
+                        data = pending.popleft().result()
+                        stats.bytes += len(data)
+                        stats.parts += 1
+                        yield data
+                while pending:
+                    data = pending.popleft().result()
+                    stats.bytes += len(data)
+                    stats.parts += 1
+                    yield data
+            finally:
+                # Consumer stopped early (client went away): don't fetch the rest
+                for future in pending:
+                    future.cancel()
+        stats.seconds = time.perf_counter() - started
+
+    def _get_range(self, key: str, start: int, end: int) -> bytes:
+        response = self.client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes={start}-{end}")
+        return response["Body"].read()
+
+
+def _read_part(file_obj, size: int) -> bytes:
+    chunks = []
+    remaining = size
+    while remaining:
+        data = file_obj.read(remaining)
+        if not data:
+            break
+        chunks.append(data)
+        remaining -= len(data)
+    return b"".join(chunks)
@@ -0,0 +1,295 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.user import File as FileModel, Folder, PendingDeletion, StoredObject, UploadSession
+from app.services.bulk import BulkService, PURGE_BATCH_SIZE
+from app.services.listing import FILE_COLUMNS, keyset_page
+from app.services.share_links import ShareLinks
+from app.services.storage import get_storage
+
+# Trashed files are restorable this long, then purged for good
+TRASH_RETENTION_DAYS = settings.trash_retention_days
+PURGE_INTERVAL_SECONDS = settings.purge_interval_seconds
+# Failed storage deletes: retried after base * 2^attempts, capped
+PURGE_RETRY_BASE_SECONDS = settings.purge_retry_base_seconds
+PURGE_RETRY_MAX_SECONDS = settings.purge_retry_max_seconds
+# A claimed batch is invisible to other purgers (other workers) this long
+PURGE_LEASE_SECONDS = 300
+# Orphan scan of the whole bucket (0 = never); objects younger than the grace period are
+# skipped, since an upload stores its object before its row is committed
+RECONCILE_INTERVAL_HOURS = settings.reconcile_interval_hours
+RECONCILE_GRACE_HOURS = settings.reconcile_grace_hours
+
+TRASH_COLUMNS = FILE_COLUMNS + (FileModel.deleted_at,)
+
+
+class TrashService:
+    """
+    Deleting a file only marks it (File.deleted_at): the request never waits
+    on storage. Trashed files keep their share links (dead until restored),
+    dedup references and usage until they are purged: on empty-trash, or by
+    the purger after TRASH_RETENTION_DAYS. Purging removes the rows and
+    queues their objects (PendingDeletion) in the same transaction, so a
+    crash can't strand an object without a record of it.
+    """
+
+    @staticmethod
+    def trash(db: Session, owner_id: int, *file_filter) -> int:
+        """Moves a user's live files matching `file_filter` to the trash. Doesn't commit."""
+        trashed = db.query(FileModel).filter(
+            FileModel.owner_id == owner_id, FileModel.deleted_at.is_(None), *file_filter
+        ).update({FileModel.deleted_at: datetime.utcnow()}, synchronize_session=False)
+        ShareLinks.forget_owner(owner_id)
+        return trashed
+
+    @staticmethod
+    def restore(db: Session, owner_id: int, file_ids: list) -> int:
+        """
+        Takes files out of the trash. Those whose folder was deleted meanwhile
+        come back to Home. Doesn't commit.
+        """
+        in_trash = (FileModel.owner_id == owner_id, FileModel.id.in_(file_ids), FileModel.deleted_at.isnot(None))
+        db.query(FileModel).filter(
+            *in_trash, FileModel.folder_id.isnot(None),
+            FileModel.folder_id.notin_(select(Folder.id).where(Folder.owner_id == owner_id))
+        ).update({FileModel.folder_id: None}, synchronize_session=False)
+        restored = db.query(FileModel).filter(*in_trash).update({FileModel.deleted_at: None}, synchronize_session=False)
+        ShareLinks.forget_owner(owner_id)
+        return restored
+
+    @staticmethod
+    def page(db: Session, owner_id: int, limit: int, cursor: Optional[str] = None):
+        """Trash contents, most recently deleted first (keyset on deleted_at)."""
+        query = db.query(*TRASH_COLUMNS).filter(FileModel.owner_id == owner_id, FileModel.deleted_at.isnot(None))
+        return keyset_page(query, FileModel.deleted_at, FileModel.id, "date", "desc", limit, cursor)
+
+    @staticmethod
+    def purge(db: Session, owner_id: int, *file_filter) -> int:
+        """
+        Deletes trashed files for good and queues the objects nothing references
+        any more. Doesn't commit. Returns the number of objects queued.
+
+        Rows are claimed first (FOR UPDATE SKIP LOCKED on PostgreSQL; SQLite
+        has a single writer): a purger in another worker, or an empty-trash
+        request, skips them instead of releasing the same dedup references
+        and usage a second time.
+        """
+        queued = 0
+        while True:
+            claimed = [file_id for (file_id,) in db.query(FileModel.id).filter(
+                FileModel.owner_id == owner_id, FileModel.deleted_at.isnot(None), *file_filter
+            ).order_by(FileModel.id).limit(PURGE_BATCH_SIZE).with_for_update(skip_locked=True).all()]
+            if not claimed:
+                return queued
+            storage_paths = BulkService.delete_where(db, owner_id, FileModel.id.in_(claimed))
+            TrashService.enqueue(db, storage_paths)
+            queued += len(storage_paths)
+
+    @staticmethod
+    def enqueue(db: Session, storage_paths: list):
+        if storage_paths:
+            db.execute(insert(PendingDeletion), [{"storage_path": path} for path in storage_paths])
+
+    @staticmethod
+    def expire(db: Session, retention_days: float = TRASH_RETENTION_DAYS) -> int:
+        """Purges files trashed longer than the retention, a batch per commit. Returns files purged."""
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        purged = 0
+        while True:
+            # Claimed until the commit below; rows another worker holds are left to it
+            batch = db.query(FileModel.owner_id, FileModel.id).filter(
+                FileModel.deleted_at.isnot(None), FileModel.deleted_at < cutoff
+            ).order_by(FileModel.id).limit(PURGE_BATCH_SIZE).with_for_update(skip_locked=True).all()
+            if not batch:
+                return purged
+            by_owner = {}
+            for owner_id, file_id in batch:
+                by_owner.setdefault(owner_id, []).append(file_id)
+            for owner_id, file_ids in by_owner.items():
+                TrashService.purge(db, owner_id, FileModel.id.in_(file_ids))
+            db.commit()
+            purged += len(batch)
+
+    @staticmethod
+    def drain(db: Session, storage=None) -> tuple[int, int]:
+        """
+        Deletes queued objects in multi-object batches. A failed batch is put
+        back with exponential backoff and the round ends (storage is likely
+        down). Returns (objects deleted, batches failed).
+        """
+        storage = storage or get_storage()
+        deleted = 0
+        while True:
+            now = datetime.utcnow()
+            batch = db.query(PendingDeletion.id, PendingDeletion.storage_path, PendingDeletion.attempts).filter(
+                PendingDeletion.next_attempt_at <= now
+            ).order_by(PendingDeletion.id).limit(PURGE_BATCH_SIZE).all()
+            if not batch:
+                return deleted, 0
+            ids = [row.id for row in batch]
+            # Lease: another worker's purger skips these meanwhile (a double delete would be harmless anyway)
+            db.query(PendingDeletion).filter(PendingDeletion.id.in_(ids)).update(
+                {PendingDeletion.next_attempt_at: now + timedelta(seconds=PURGE_LEASE_SECONDS)}, synchronize_session=False
+            )
+            db.commit()
+            try:
+                storage.delete_files(sorted({row.storage_path for row in batch}))
+            except Exception as e:
+                print(f"❌ Storage Purge Error ({len(batch)} objects): {e}")
+                by_attempts = {}
+                for row in batch:
+                    by_attempts.setdefault(row.attempts, []).append(row.id)
+                for attempts, retry_ids in by_attempts.items():
+                    delay = min(PURGE_RETRY_BASE_SECONDS * 2 ** attempts, PURGE_RETRY_MAX_SECONDS)
+                    db.query(PendingDeletion).filter(PendingDeletion.id.in_(retry_ids)).update({
+                        PendingDeletion.attempts: attempts + 1,
+                        PendingDeletion.next_attempt_at: datetime.utcnow() + timedelta(seconds=delay),
+                        PendingDeletion.last_error: str(e)[:500],
+                    }, synchronize_session=False)
+                db.commit()
+                return deleted, 1
+            db.query(PendingDeletion).filter(PendingDeletion.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            deleted += len(batch)
+
+    @staticmethod
+    def reconcile(db: Session, storage=None, apply: bool = False, grace_hours: float = RECONCILE_GRACE_HOURS) -> dict:
+        """
+        Finds stored objects no file, dedup object, upload session or queued
+        deletion refers to, a page of keys at a time (memory stays flat at
+        any bucket size). With apply=True they are queued for deletion.
+        """
+        storage = storage or get_storage()
+        cutoff = time.time() - grace_hours * 3600
+        scanned, orphans, sample = 0, 0, []
+
+        def check(names: list):
+            nonlocal orphans
+            referenced = set()
+            for column in (FileModel.storage_path, StoredObject.storage_path,
+                           UploadSession.storage_path, PendingDeletion.storage_path):
+                referenced.update(p for (p,) in db.query(column).filter(column.in_(names)).all())
+            missing = [name for name in names if name not in referenced]
+            orphans += len(missing)
+            sample.extend(missing[:20 - len(sample)])
+            if apply and missing:
+                TrashService.enqueue(db, missing)
+                db.commit()
+
+        page = []
+        for name, modified in storage.list_objects():
+            scanned += 1
+            if modified > cutoff:
+                continue
+            page.append(name)
+            if len(page) == PURGE_BATCH_SIZE:
+                check(page)
+                page = []
+        if page:
+            check(page)
+        return {"scanned": scanned, "orphans": orphans, "queued": orphans if apply else 0, "sample": sample}
+
+
+class TrashPurger:
+    """
+    Background thread: expires old trash, drains the deletion queue and,
+    every RECONCILE_INTERVAL_HOURS, queues orphaned objects. wake() skips
+    the wait (after empty-trash). Every worker may run one: expired files
+    are claimed with row locks and queued deletions leased, so they don't
+    trip over each other.
+    """
+
+    def __init__(self, session_factory=SessionLocal, interval: float = PURGE_INTERVAL_SECONDS):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.expired_files = 0
+        self.purged_objects = 0
+        self.failed_batches = 0
+        self.orphans_queued = 0
+        self.last_run = None
+        self.last_reconcile = None
+        self._next_reconcile = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            # The first bucket scan waits a full interval: restarts don't each trigger one
+            if RECONCILE_INTERVAL_HOURS:
+                self._next_reconcile = time.time() + RECONCILE_INTERVAL_HOURS * 3600
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._loop, name="trash-purger", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        if self._thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def wake(self):
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"❌ Trash Purger Error: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def run_once(self, storage=None, reconcile: bool = False) -> dict:
+        with self.session_factory() as db:
+            expired = TrashService.expire(db)
+            orphans = 0
+            if reconcile or (self._next_reconcile is not None and time.time() >= self._next_reconcile):
+                self.last_reconcile = time.time()
+                if RECONCILE_INTERVAL_HOURS:
+                    self._next_reconcile = self.last_reconcile + RECONCILE_INTERVAL_HOURS * 3600
+                orphans = TrashService.reconcile(db, storage, apply=True)["queued"]
+            deleted, failed = TrashService.drain(db, storage)
+        self.expired_files += expired
+        self.purged_objects += deleted
+        self.failed_batches += failed
+        self.orphans_queued += orphans
+        self.last_run = time.time()
+        return {"expired_files": expired, "purged_objects": deleted, "failed_batches": failed, "orphans_queued": orphans}
+
+    def snapshot(self, db: Session) -> dict:
+        return {
+            "running": self._thread is not None,
+            "pending_deletions": db.query(PendingDeletion.id).count(),
+            "expired_files": self.expired_files,
+            "purged_objects": self.purged_objects,
+            "failed_batches": self.failed_batches,
+            "orphans_queued": self.orphans_queued,
+            "last_run": self.last_run,
+            "last_reconcile": self.last_reconcile,
+        }
+
+
+trash_purger = TrashPurger()
+
+
+if __name__ == "__main__":
+    # python -m app.services.trash reconcile [--apply]   |   python -m app.services.trash purge
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=("reconcile", "purge"))
+    parser.add_argument("--apply", action="store_true", help="queue the orphans found for deletion")
+    args = parser.parse_args()
+    with SessionLocal() as db:
+        if args.command == "reconcile":
+            print(json.dumps(TrashService.reconcile(db, apply=args.apply), indent=2))
+        else:
+            print(json.dumps({"expired_files": TrashService.expire(db), "drained": TrashService.drain(db)}))
@@ -0,0 +1,73 @@
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models.user import File as FileModel, UserUsage
+from app.utils.file_types import CATEGORIES
+
+class UsageService:
+    @staticmethod
+    def record(db: Session, user_id: int, category: str, delta_bytes: int, delta_count: int,
+               delta_stored: Optional[int] = None):
+        """
+        Adds deltas to a user's usage row inside the caller's transaction, so the
+        totals commit (or roll back) together with the File insert/delete.
+        A single atomic upsert: no read-modify-write race between requests.
+        `delta_stored` is the size after compression (defaults to delta_bytes).
+        """
+        dialect = db.get_bind().dialect.name
+        if delta_stored is None:
+            delta_stored = delta_bytes
+        values = {"user_id": user_id, "category": category, "total_bytes": delta_bytes,
+                  "stored_bytes": delta_stored, "file_count": delta_count}
+        if dialect in ("sqlite", "postgresql"):
+            insert = sqlite_insert if dialect == "sqlite" else pg_insert
+            stmt = insert(UserUsage).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[UserUsage.user_id, UserUsage.category],
+                set_={
+                    "total_bytes": UserUsage.total_bytes + stmt.excluded.total_bytes,
+                    "stored_bytes": UserUsage.stored_bytes + stmt.excluded.stored_bytes,
+                    "file_count": UserUsage.file_count + stmt.excluded.file_count,
+                },
+            )
+            db.execute(stmt)
+            return
+        # Other databases: update, insert if the row does not exist yet
+        updated = db.query(UserUsage).filter(
+            UserUsage.user_id == user_id, UserUsage.category == category
+        ).update({
+            UserUsage.total_bytes: UserUsage.total_bytes + delta_bytes,
+            UserUsage.stored_bytes: UserUsage.stored_bytes + delta_stored,
+            UserUsage.file_count: UserUsage.file_count + delta_count,
+        }, synchronize_session=False)
+        if not updated:
+            db.add(UserUsage(**values))
+
+    @staticmethod
+    def summary(db: Session, user_id: int) -> dict:
+        """O(categories) read of a user's totals."""
+        rows = db.query(UserUsage.category, UserUsage.total_bytes, UserUsage.stored_bytes, UserUsage.file_count).filter(
+            UserUsage.user_id == user_id
+        ).all()
+        by_category = {cat: {"bytes": 0, "stored_bytes": 0, "count": 0} for cat in CATEGORIES}
+        for category, total_bytes, stored_bytes, file_count in rows:
+            by_category[category] = {"bytes": total_bytes or 0, "stored_bytes": stored_bytes or 0, "count": file_count or 0}
+        return by_category
+
+    @staticmethod
+    def rebuild(db: Session):
+        """Recomputes every user's totals from the files table (backfill / repair)."""
+        db.query(UserUsage).delete(synchronize_session=False)
+        rows = db.query(
+            FileModel.owner_id, FileModel.category,
+            func.coalesce(func.sum(FileModel.size_bytes), 0),
+            func.coalesce(func.sum(func.coalesce(FileModel.stored_bytes, FileModel.size_bytes)), 0),
+            func.count(FileModel.id)
+        ).group_by(FileModel.owner_id, FileModel.category).all()
+        db.add_all([
+            UserUsage(user_id=owner_id, category=category or "Others", total_bytes=total, stored_bytes=stored, file_count=count)
+            for owner_id, category, total, stored, count in rows
+        ])
+        db.commit()
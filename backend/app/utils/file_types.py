@@ -0,0 +1,36 @@
+# Definition of types (shared by upload, stats and anything else that buckets files)
+CATEGORY_EXTENSIONS = {
+    "Images": ['jpg', 'jpeg', 'png', 'gif', 'svg', 'webp'],
+    "Documents": ['pdf', 'doc', 'docx', 'txt', 'xls', 'xlsx', 'ppt', 'pptx'],
+    "Videos": ['mp4', 'mov', 'avi', 'mkv', 'webm'],
+    "Audio": ['mp3', 'wav', 'aac', 'ogg']
+}
+CATEGORIES = list(CATEGORY_EXTENSIONS) + ["Others"]
+
+# Formats that are already compressed: another compression pass only costs CPU
+COMPRESSED_EXTENSIONS = (
+    {ext for cat in ("Images", "Videos", "Audio") for ext in CATEGORY_EXTENSIONS[cat]} - {'svg', 'wav'}
+) | {'docx', 'xlsx', 'pptx', 'zip', 'gz', 'tgz', 'bz2', 'xz', '7z', 'rar', 'zst', 'br', 'jar', 'apk', 'heic', 'flac'}
+
+_EXTENSION_TO_CATEGORY = {ext: cat for cat, exts in CATEGORY_EXTENSIONS.items() for ext in exts}
+
+def file_extension(filename: str) -> str:
+    return filename.split('.')[-1].lower() if '.' in filename else "unknown"
+
+def categorize(filename: str) -> str:
+    return _EXTENSION_TO_CATEGORY.get(file_extension(filename), "Others")
+
+def format_size(size_bytes: int) -> str:
+    """Display string shown by the frontend, e.g. "5.20 MB" """
+    size_mb = size_bytes / (1024 * 1024)
+    return f"{size_mb:.2f} MB" if size_mb > 1 else f"{size_bytes/1024:.2f} KB"
+
+def parse_size(size_str: str) -> int:
+    """Best-effort inverse of format_size() for rows that only have the string."""
+    try:
+        val_str, unit = size_str.split()
+        val = float(val_str)
+    except (AttributeError, ValueError):
+        return 0
+    multiplier = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}.get(unit.upper(), 1)
+    return int(val * multiplier)
@@ -1,4 +1,5 @@
 from passlib.context import CryptContext
+from app.core.executor import crypto_executor
 
 # Setup the password hashing logic (using bcrypt)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -10,4 +11,13 @@ class Hash:
 
     @staticmethod
     def verify(plain_password, hashed_password):
-        return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+        return pwd_context.verify(plain_password, hashed_password)
+
+    # Routes use these: the ~100ms of bcrypt runs in the crypto pool, not on the event loop
+    @staticmethod
+    async def abcrypt(password: str):
+        return await crypto_executor.run("bcrypt_hash", Hash.bcrypt, password)
+
+    @staticmethod
+    async def averify(plain_password, hashed_password):
+        return await crypto_executor.run("bcrypt_verify", Hash.verify, plain_password, hashed_password)
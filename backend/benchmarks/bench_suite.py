@@ -0,0 +1,405 @@
+"""
+Offline benchmark suite for the API hot paths. Every case runs in its own
+interpreter against a throwaway SQLite database and local object storage,
+so the numbers (peak RSS included) don't leak from one case into the next.
+
+    python -m benchmarks.bench_suite --out bench.json                 # full run
+    python -m benchmarks.bench_suite --quick --cases crypto transfer  # smoke
+    python -m benchmarks.bench_suite --compare bench.json             # run + fail on regressions
+    python -m benchmarks.bench_suite --compare old.json --report new.json  # compare two reports
+
+Metric names carry their direction: *_mb_s / *_per_s are better higher,
+*_ms / *_mb (memory) are better lower. --compare exits with status 1 when
+any of them moved the wrong way by more than --tolerance.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASES = ("crypto", "transfer", "listing", "login", "share", "startup")
+DEFAULT_TOLERANCE = 0.25
+# Differences below these are noise, whatever the percentage
+NOISE_FLOOR_MS = 2.0
+NOISE_FLOOR_MB = 8.0
+
+FULL = {"crypto_sizes_mb": [1, 16, 64], "transfer_sizes_mb": [1, 16], "repeat": 10,
+        "scales": [10_000, 100_000], "logins": 10, "login_concurrency": 4, "share_downloads": 20, "startups": 10}
+QUICK = {"crypto_sizes_mb": [1, 8], "transfer_sizes_mb": [1], "repeat": 3,
+         "scales": [10_000], "logins": 3, "login_concurrency": 2, "share_downloads": 5, "startups": 3}
+
+
+# --- helpers (run inside a case process) ---
+def _latency(name: str, samples: list) -> dict:
+    ms = sorted(s * 1000 for s in samples)
+    p95 = ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))]
+    return {f"{name}_p50_ms": round(statistics.median(ms), 3), f"{name}_p95_ms": round(p95, 3)}
+
+def _timed(call, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss: KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _label(size_mb: int) -> str:
+    return f"{size_mb}mb"
+
+def _client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    client = TestClient(app)
+    client.__enter__()  # lifespan startup (schema, storage); the case process exits without shutdown
+    return client
+
+def _register(client, email: str = "bench@example.com", password: str = "bench-password") -> dict:
+    response = client.post("/register", json={"email": email, "password": password, "full_name": "Bench"})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+# --- cases ---
+def case_crypto(params: dict) -> dict:
+    """
+    Segmented AES-GCM throughput by file size (no I/O), then by segment pool
+    size on the largest file: MB/s should grow with the workers up to the cores.
+    """
+    import io
+    from app.services.encryption import StreamDecryptor, StreamEncryptor, HEADER_SIZE, ENCRYPTION_WORKERS
+    key = os.urandom(32)
+    metrics = {"crypto_cpus": os.cpu_count() or 1, "crypto_workers": ENCRYPTION_WORKERS}
+
+    def measure(size_mb: int, label: str, workers: int = ENCRYPTION_WORKERS):
+        payload = os.urandom(size_mb * 1024 * 1024)
+        holder = {}
+
+        def encrypt():
+            holder["data"] = b"".join(StreamEncryptor(key, workers=workers).encrypt_stream(io.BytesIO(payload)))
+
+        def decrypt():
+            data = holder["data"]
+            assert StreamDecryptor(key, data[:HEADER_SIZE], workers=workers).decrypt(data) == payload
+
+        repeat = max(3, min(params["repeat"], 64 // size_mb))
+        metrics[f"encrypt_{label}_mb_s"] = round(size_mb / statistics.median(_timed(encrypt, repeat)), 1)
+        metrics[f"decrypt_{label}_mb_s"] = round(size_mb / statistics.median(_timed(decrypt, repeat)), 1)
+
+    for size_mb in params["crypto_sizes_mb"]:
+        measure(size_mb, _label(size_mb))
+    size_mb = max(params["crypto_sizes_mb"])
+    cpus = os.cpu_count() or 1
+    for workers in sorted({1, cpus} | {2 ** i for i in range(1, cpus.bit_length()) if 2 ** i < cpus}):
+        measure(size_mb, f"{_label(size_mb)}_w{workers}", workers)
+    return metrics
+
+def case_transfer(params: dict) -> dict:
+    """Upload / download latency through the ASGI app (multipart form in, streamed body out)."""
+    client = _client()
+    headers = _register(client)
+    metrics = {}
+    for size_mb in params["transfer_sizes_mb"]:
+        payload = os.urandom(size_mb * 1024 * 1024)
+        file_ids = []
+
+        def upload():
+            response = client.post("/upload", files={"file": ("bench.bin", payload)}, headers=headers)
+            response.raise_for_status()
+            file_ids.append(response.json()["file_id"])
+
+        def download():
+            response = client.get(f"/files/{file_ids[-1]}/download", headers=headers)
+            assert response.status_code == 200 and len(response.content) == len(payload)
+
+        metrics.update(_latency(f"upload_{_label(size_mb)}", _timed(upload, params["repeat"])))
+        metrics.update(_latency(f"download_{_label(size_mb)}", _timed(download, params["repeat"])))
+
+        # Revalidation of a copy the client already has: no storage fetch, no decryption
+        conditional = {**headers, "If-None-Match": client.get(f"/files/{file_ids[-1]}/download", headers=headers).headers["etag"]}
+
+        def revalidate():
+            assert client.get(f"/files/{file_ids[-1]}/download", headers=conditional).status_code == 304
+
+        metrics.update(_latency(f"download_not_modified_{_label(size_mb)}", _timed(revalidate, params["repeat"])))
+    return metrics
+
+def case_listing(params: dict) -> dict:
+    """Listing / stats / search latency with many files (rows seeded directly, no objects)."""
+    from sqlalchemy import insert
+    from app.core.database import SessionLocal
+    from app.models.user import File as FileModel, User
+    from app.services.listing import encode_cursor
+    from app.services.usage import UsageService
+    from app.utils.file_types import categorize, format_size
+
+    client = _client()
+    metrics = {}
+    for scale in params["scales"]:
+        headers = _register(client, email=f"list{scale}@example.com")
+        db = SessionLocal()
+        try:
+            owner_id = db.query(User.id).filter(User.email == f"list{scale}@example.com").scalar()
+            now = datetime.datetime.utcnow()
+            names = ("report.pdf", "photo.jpg", "song.mp3", "clip.mp4", "notes.txt", "archive.zip")
+            rows = []
+            for i in range(scale):
+                filename = f"{i:07d}-{names[i % len(names)]}"
+                size_bytes = (i * 7919) % 50_000_000
+                rows.append({
+                    "filename": filename, "file_type": filename.rsplit(".", 1)[-1], "category": categorize(filename),
+                    "size": format_size(size_bytes), "size_bytes": size_bytes, "stored_bytes": size_bytes,
+                    "encryption_key": "00" * 32, "nonce": "00" * 12, "enc_version": 2,
+                    "storage_path": f"bench-{scale}-{i}", "owner_id": owner_id,
+                    "upload_date": now - datetime.timedelta(seconds=i),
+                })
+            started = time.perf_counter()
+            for i in range(0, len(rows), 10_000):
+                db.execute(insert(FileModel), rows[i:i + 10_000])
+            UsageService.rebuild(db)
+            db.commit()
+            metrics[f"seed_{scale}_rows_per_s"] = round(scale / (time.perf_counter() - started))
+            middle = rows[scale // 2]["filename"]
+            middle_id = db.query(FileModel.id).filter(FileModel.owner_id == owner_id, FileModel.filename == middle).scalar()
+        finally:
+            db.close()
+
+        deep_cursor = encode_cursor("name", middle, middle_id)
+        checks = {
+            f"list_first_page_{scale}": ("/files", {"limit": 100}),
+            f"list_deep_page_{scale}": ("/files", {"limit": 100, "sort": "name", "order": "asc", "cursor": deep_cursor}),
+            f"folder_content_{scale}": ("/folders/content", {"limit": 100}),
+            f"stats_{scale}": ("/files/stats", {}),
+            f"search_common_{scale}": ("/search", {"q": "report"}),
+            f"search_selective_{scale}": ("/search", {"q": f"{scale // 3:07d}"}),
+        }
+        for name, (path, query) in checks.items():
+            def call():
+                response = client.get(path, params=query, headers=headers)
+                response.raise_for_status()
+            call()  # warm caches / statement cache
+            metrics.update(_latency(name, _timed(call, params["repeat"] * 2)))
+
+        # Polling an unchanged first page: answered from the listing version alone
+        conditional = {**headers, "If-None-Match": client.get("/files", params={"limit": 100}, headers=headers).headers["etag"]}
+
+        def revalidate():
+            assert client.get("/files", params={"limit": 100}, headers=conditional).status_code == 304
+
+        metrics.update(_latency(f"list_not_modified_{scale}", _timed(revalidate, params["repeat"] * 2)))
+    return metrics
+
+def case_login(params: dict) -> dict:
+    """bcrypt-bound login throughput, sequential and concurrent."""
+    from concurrent.futures import ThreadPoolExecutor
+    client = _client()
+    _register(client, email="login@example.com", password="login-password")
+
+    def login():
+        response = client.post("/login", data={"username": "login@example.com", "password": "login-password"})
+        response.raise_for_status()
+
+    samples = _timed(login, params["logins"])
+    metrics = _latency("login", samples)
+    metrics["login_per_s"] = round(len(samples) / sum(samples), 2)
+
+    n = params["logins"] * params["login_concurrency"]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(params["login_concurrency"]) as pool:
+        list(pool.map(lambda _: login(), range(n)))
+    metrics["login_concurrent_per_s"] = round(n / (time.perf_counter() - started), 2)
+    return metrics
+
+def case_share(params: dict) -> dict:
+    """Public downloads of a password-protected link: first with the password, then with the token."""
+    client = _client()
+    headers = _register(client)
+    payload = os.urandom(1024 * 1024)
+    file_id = client.post("/upload", files={"file": ("shared.bin", payload)}, headers=headers).json()["file_id"]
+    unique_hash = client.post("/share/create", json={"file_id": file_id, "password": "open-sesame"}, headers=headers).json()["hash"]
+
+    started = time.perf_counter()
+    first = client.post(f"/share/{unique_hash}/download", json={"password": "open-sesame"})
+    metrics = {"share_password_download_ms": round((time.perf_counter() - started) * 1000, 3)}
+    assert first.content == payload
+    token = first.headers["x-download-token"]
+
+    def info():
+        client.get(f"/share/{unique_hash}/info").raise_for_status()
+
+    def download():
+        response = client.post(f"/share/{unique_hash}/download", json={"token": token})
+        assert response.status_code == 200 and len(response.content) == len(payload)
+
+    metrics.update(_latency("share_info", _timed(info, params["share_downloads"])))
+    metrics.update(_latency("share_token_download", _timed(download, params["share_downloads"])))
+    return metrics
+
+# Runs in a fresh interpreter per start: module import, lifespan startup, first requests
+STARTUP_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    ready = time.perf_counter()
+    client.get("/health").raise_for_status()
+    first = time.perf_counter()
+    token = client.post("/register", json={"email": sys.argv[1], "password": "bench-password"}).json()["access_token"]
+    listed = time.perf_counter()
+    client.get("/files", headers={"Authorization": "Bearer " + token}).raise_for_status()
+    print(json.dumps({"import": imported - started, "startup": ready - imported,
+                      "first_request": first - ready, "first_listing": time.perf_counter() - listed}))
+"""
+
+def case_startup(params: dict) -> dict:
+    """Cold start of a worker: import app.main, lifespan startup (schema, storage), first requests."""
+    samples = {"import": [], "startup": [], "first_request": [], "first_listing": []}
+    for i in range(params["startups"]):
+        result = subprocess.run([sys.executable, "-c", STARTUP_PROBE, f"start{i}@example.com"],
+                                cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+        for name, seconds in json.loads(result.stdout.strip().splitlines()[-1]).items():
+            samples[name].append(seconds)
+    metrics = {}
+    for name, values in samples.items():
+        metrics.update(_latency(name, values))
+    return metrics
+
+
+def run_case(name: str, params: dict) -> dict:
+    started = time.perf_counter()
+    metrics = globals()[f"case_{name}"](params)
+    return {"metrics": metrics, "peak_rss_mb": _peak_rss_mb(), "seconds": round(time.perf_counter() - started, 2)}
+
+
+# --- runner (parent process) ---
+def spawn_case(name: str, params: dict) -> dict:
+    workdir = tempfile.mkdtemp(prefix=f"ecd-bench-{name}-")
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "STORAGE_BACKEND": "local",
+        "LOCAL_STORAGE_DIR": os.path.join(workdir, "objects"),
+        "SLOW_REQUEST_MS": "0",
+        "MASTER_KEY_SECRET": "bench-master-key-secret",
+    })
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_suite", "--run-case", name, "--params", json.dumps(params)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"case {name} failed:\n{result.stderr[-4000:]}")
+    # The case prints its result as the last stdout line (app startup may print before it)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def run_suite(cases, params: dict) -> dict:
+    report = {
+        "suite": "ecd-api",
+        "created": datetime.datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "params": params,
+        "cases": {},
+    }
+    for name in cases:
+        print(f"⏱  {name} ...", file=sys.stderr)
+        report["cases"][name] = spawn_case(name, params)
+    return report
+
+def flatten(report: dict) -> dict:
+    flat = {}
+    for case, result in report["cases"].items():
+        for metric, value in result["metrics"].items():
+            flat[f"{case}.{metric}"] = value
+        flat[f"{case}.peak_rss_mb"] = result["peak_rss_mb"]
+    return flat
+
+def direction(metric: str) -> int:
+    """+1 higher is better, -1 lower is better, 0 informational."""
+    if metric.endswith("_mb_s") or metric.endswith("_per_s"):
+        return 1
+    if metric.endswith("_ms") or metric.endswith("_mb"):
+        return -1
+    return 0
+
+def compare(baseline: dict, current: dict, tolerance: float = DEFAULT_TOLERANCE) -> tuple[list, list]:
+    """Returns (rows of (metric, base, now, change), regressed metric names)."""
+    base, now = flatten(baseline), flatten(current)
+    rows, regressions = [], []
+    for metric in sorted(base.keys() & now.keys()):
+        sign = direction(metric)
+        old, new = base[metric], now[metric]
+        change = (new - old) / old if old else 0.0
+        rows.append((metric, old, new, change))
+        if sign == 0 or not old:
+            continue
+        floor = NOISE_FLOOR_MS if metric.endswith("_ms") else NOISE_FLOOR_MB if metric.endswith("_mb") else 0.0
+        worse = (old - new) if sign > 0 else (new - old)
+        if worse > floor and worse / old > tolerance:
+            regressions.append(metric)
+    return rows, regressions
+
+def print_table(report: dict):
+    print(f"{'metric':<48} | {'value':>12}")
+    for metric, value in flatten(report).items():
+        print(f"{metric:<48} | {value:>12}")
+
+def print_comparison(rows: list, regressions: list):
+    print(f"{'metric':<48} | {'baseline':>12} | {'current':>12} | change")
+    for metric, old, new, change in rows:
+        flag = "  ❌" if metric in regressions else ""
+        print(f"{metric:<48} | {old:>12} | {new:>12} | {change:+.1%}{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES))
+    parser.add_argument("--quick", action="store_true", help="small sizes and one scale (CI smoke)")
+    parser.add_argument("--scales", type=int, nargs="+", help="file counts for the listing case")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", metavar="BASELINE", help="baseline report; exit 1 on regressions")
+    parser.add_argument("--report", help="compare this existing report instead of running")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed relative regression")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    parser.add_argument("--params", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case, json.loads(args.params))))
+        sys.exit(0)
+
+    if args.report:
+        with open(args.report) as f:
+            report = json.load(f)
+    else:
+        params = dict(QUICK if args.quick else FULL)
+        if args.scales:
+            params["scales"] = args.scales
+        report = run_suite(args.cases, params)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if not args.compare:
+        print_table(report)
+        sys.exit(0)
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    rows, regressions = compare(baseline, report, args.tolerance)
+    print_comparison(rows, regressions)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        sys.exit(1)
+    print("✅ No regressions")
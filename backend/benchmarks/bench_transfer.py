@@ -0,0 +1,37 @@
+"""
+Upload/download throughput of the S3 transfer manager vs. part concurrency,
+against an in-memory S3 stand-in that simulates per-connection bandwidth.
+
+    python -m benchmarks.bench_transfer --size-mb 64 --stream-mbps 40
+"""
+import argparse
+import io
+import os
+from app.services.transfer import TransferManager, TransferStats
+from benchmarks.fake_s3 import FakeS3Client
+
+
+def run(size_mb: int, part_mb: int, stream_mbps: float, latency: float, concurrency_levels):
+    payload = os.urandom(size_mb * 1024 * 1024)
+    print(f"{'concurrency':>11} | {'upload MB/s':>11} | {'download MB/s':>13} | parts")
+    for concurrency in concurrency_levels:
+        client = FakeS3Client(latency=latency, stream_mbps=stream_mbps)
+        manager = TransferManager(client, "bench", part_size=part_mb * 1024 * 1024, max_concurrency=concurrency)
+
+        up = manager.upload(io.BytesIO(payload), "bench-object")
+        down = TransferStats()
+        data = b"".join(manager.download("bench-object", len(payload), stats=down))
+        assert data == payload
+
+        print(f"{concurrency:>11} | {up.mb_per_s:>11.1f} | {down.mb_per_s:>13.1f} | {up.parts}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--part-mb", type=int, default=8)
+    parser.add_argument("--stream-mbps", type=float, default=40.0, help="simulated bandwidth of one connection")
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated seconds per request")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    run(args.size_mb, args.part_mb, args.stream_mbps, args.latency, args.concurrency)
@@ -0,0 +1,111 @@
+import io
+import threading
+import time
+import uuid
+
+
+class FakeBody:
+    def __init__(self, data: bytes):
+        self._stream = io.BytesIO(data)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._stream.read(size)
+
+    def iter_chunks(self, chunk_size: int = 1024):
+        while True:
+            chunk = self._stream.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        pass
+
+
+class FakeS3Client:
+    """
+    In-memory stand-in for the boto3 S3 client calls we use.
+    `latency` (seconds per request) and `stream_mbps` (bandwidth of a single
+    connection) make it behave like a remote store, so parallel transfers
+    show the same kind of speed-up they get against real S3.
+    """
+
+    def __init__(self, latency: float = 0.0, stream_mbps: float = 0.0):
+        self.latency = latency
+        self.stream_mbps = stream_mbps
+        self.objects = {}
+        self.uploads = {}
+        self.calls = []
+        self.fail_part = None  # part number whose upload should blow up
+        self._lock = threading.Lock()
+
+    def _wire(self, name: str, nbytes: int = 0):
+        with self._lock:
+            self.calls.append(name)
+        delay = self.latency
+        if self.stream_mbps:
+            delay += nbytes / (self.stream_mbps * 1024 * 1024)
+        if delay:
+            time.sleep(delay)
+
+    def put_object(self, Bucket, Key, Body):
+        data = Body if isinstance(Body, bytes) else Body.read()
+        self._wire("put_object", len(data))
+        self.objects[Key] = data
+        return {"ETag": f'"{uuid.uuid4().hex}"'}
+
+    def create_multipart_upload(self, Bucket, Key):
+        self._wire("create_multipart_upload")
+        upload_id = uuid.uuid4().hex
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self._wire("upload_part", len(Body))
+        if PartNumber == self.fail_part:
+            raise IOError(f"Injected failure on part {PartNumber}")
+        etag = f'"{uuid.uuid4().hex}"'
+        self.uploads[UploadId][PartNumber] = (etag, bytes(Body))
+        return {"ETag": etag}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self._wire("complete_multipart_upload")
+        stored = self.uploads.pop(UploadId)
+        parts = MultipartUpload["Parts"]
+        assert [p["PartNumber"] for p in parts] == sorted(stored), "parts must be listed in order"
+        assert all(stored[p["PartNumber"]][0] == p["ETag"] for p in parts), "ETag mismatch"
+        self.objects[Key] = b"".join(stored[p["PartNumber"]][1] for p in parts)
+        return {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self._wire("abort_multipart_upload")
+        self.uploads.pop(UploadId, None)
+        return {}
+
+    def head_object(self, Bucket, Key):
+        self._wire("head_object")
+        return {"ContentLength": len(self.objects[Key])}
+
+    def get_object(self, Bucket, Key, Range=None):
+        data = self.objects[Key]
+        total = len(data)
+        if Range:
+            first, last = Range[len("bytes="):].split("-")
+            start = int(first)
+            end = min(int(last), total - 1) if last else total - 1
+            data = data[start:end + 1]
+            self._wire("get_object", len(data))
+            return {"Body": FakeBody(data), "ContentLength": len(data), "ContentRange": f"bytes {start}-{end}/{total}"}
+        self._wire("get_object", total)
+        return {"Body": FakeBody(data), "ContentLength": total}
+
+    def delete_object(self, Bucket, Key):
+        self._wire("delete_object")
+        self.objects.pop(Key, None)
+        return {}
+
+    def delete_objects(self, Bucket, Delete):
+        self._wire("delete_objects")
+        for obj in Delete["Objects"]:
+            self.objects.pop(obj["Key"], None)
+        return {}
@@ -0,0 +1,72 @@
+import threading
+import time
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from app.core.admission import AdmissionController
+
+def _status(call):
+    try:
+        call()
+    except HTTPException as e:
+        return e.status_code, e.headers.get("Retry-After")
+    return 200, None
+
+def test_budget_caps_and_queue():
+    controller = AdmissionController(budget_bytes=100, per_user=2, queue_timeout=0.2, max_waiting=4)
+
+    a = controller.admit_sync(1, 60)
+    b = controller.admit_sync(2, 40)
+    assert controller.snapshot()["in_flight_bytes"] == 100
+
+    # Per-user cap -> 429, budget exhausted -> 503 after the queue timeout
+    extra = controller.admit_sync(1, 0)
+    assert _status(lambda: controller.admit_sync(1, 0)) == (429, "2")
+    extra.release()
+    assert _status(lambda: controller.admit_sync(3, 10)) == (503, "2")
+    assert controller.snapshot()["timed_out"] == 1
+
+    # A queued transfer starts as soon as enough budget comes back
+    threading.Timer(0.05, a.release).start()
+    with controller.admit_sync(3, 50):
+        assert controller.snapshot()["in_flight_bytes"] == 90
+    b.release()
+    b.release() # idempotent
+    # Oversized transfers are clamped to the budget and run alone
+    with controller.admit_sync(4, 10_000):
+        assert controller.snapshot()["budget_used"] == 1.0
+    snapshot = controller.snapshot()
+    assert snapshot["in_flight_bytes"] == 0 and snapshot["active"] == 0 and snapshot["users"] == 0
+    print("✅ Admission budget OK")
+
+def test_ticket_held_until_body_sent():
+    controller = AdmissionController(budget_bytes=100, per_user=2)
+    app = FastAPI()
+    seen = []
+
+    def body():
+        seen.append(controller.snapshot()["in_flight_bytes"])
+        yield b"data"
+
+    @app.get("/stream")
+    def stream():
+        with controller.admit_sync("u", 70) as ticket:
+            return ticket.until_sent(StreamingResponse(body(), headers={"X-Test": "1"}))
+
+    @app.get("/fail")
+    def fail():
+        with controller.admit_sync("u", 70):
+            raise HTTPException(status_code=404)
+
+    client = TestClient(app)
+    r = client.get("/stream")
+    assert r.content == b"data" and r.headers["x-test"] == "1"
+    assert seen == [70]
+    assert client.get("/fail").status_code == 404
+    time.sleep(0.01)
+    assert controller.snapshot()["in_flight_bytes"] == 0 and controller.snapshot()["admitted"] == 2
+    print("✅ Admission tickets OK")
+
+if __name__ == "__main__":
+    test_budget_caps_and_queue()
+    test_ticket_held_until_body_sent()
@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+from contextlib import contextmanager
+from fastapi.testclient import TestClient
+from app.core import config
+from app.core.config import Settings
+from app.core.crypto_utils import check_master_key_secret
+from app.main import create_app
+
+@contextmanager
+def _settings(**values):
+    """Overrides fields of the process settings for one test."""
+    saved = {name: getattr(config.settings, name) for name in values}
+    for name, value in values.items():
+        setattr(config.settings, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(config.settings, name, value)
+
+def test_settings_parsing():
+    os.environ["SEARCH_CANDIDATES"] = "25"
+    try:
+        settings = Settings(_env_file=None, trash_purger="false", s3_part_size_mb="16")
+    finally:
+        del os.environ["SEARCH_CANDIDATES"]
+    assert settings.search_candidates == 25 and settings.trash_purger is False and settings.s3_part_size_mb == 16.0
+    assert Settings(_env_file=None).create_schema is True
+    print("✅ Settings parsing OK")
+
+def test_master_key_secret_required():
+    try:
+        check_master_key_secret(Settings(_env_file=None))
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("started without MASTER_KEY_SECRET")
+    check_master_key_secret(Settings(_env_file=None, master_key_secret="s3cret"))
+    print("✅ MASTER_KEY_SECRET required OK")
+
+def test_import_has_no_side_effects():
+    # Fresh interpreter: importing the app must not open the database or build a storage client
+    probe = (
+        "import app.main\n"
+        "from app.core import database\n"
+        "from app.services import storage\n"
+        "assert not database._engines and storage._storage is None\n"
+    )
+    subprocess.run([sys.executable, "-c", probe], cwd=os.path.dirname(os.path.abspath(__file__)), check=True,
+                   env=dict(os.environ, DATABASE_URL="sqlite:///./must-not-exist.db"))
+    assert not os.path.exists(os.path.join(os.path.dirname(os.path.abspath(__file__)), "must-not-exist.db"))
+    print("✅ Import without side effects OK")
+
+def test_factory():
+    app = create_app()
+    routes = [(method, route.path) for route in app.routes for method in getattr(route, "methods", ())]
+    assert len(routes) == len(set(routes))  # every router registered once
+    with _settings(create_schema=False, trash_purger=False, allow_insecure_master_key=True, system_token=None), \
+            TestClient(app) as client:
+        assert client.get("/health").json() == {"status": "ok"}
+        assert client.get("/metrics").status_code == 404  # no SYSTEM_TOKEN: operational endpoints off
+    print("✅ App factory OK")
+
+def test_system_endpoints_need_token():
+    with _settings(create_schema=False, trash_purger=False, allow_insecure_master_key=True, system_token="ops-token"), \
+            TestClient(create_app()) as client:
+        assert client.get("/metrics").status_code == 401
+        assert client.get("/system/crypto", headers={"Authorization": "Bearer wrong"}).status_code == 401
+        assert client.get("/system/crypto", headers={"Authorization": "Bearer ops-token"}).status_code == 200
+        assert client.get("/metrics", headers={"Authorization": "Bearer ops-token"}).status_code == 200
+    print("✅ System endpoints behind SYSTEM_TOKEN OK")
+
+if __name__ == "__main__":
+    test_settings_parsing()
+    test_master_key_secret_required()
+    test_import_has_no_side_effects()
+    test_factory()
+    test_system_endpoints_need_token()
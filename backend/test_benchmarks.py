@@ -0,0 +1,21 @@
+from benchmarks.bench_suite import compare, direction
+
+def _report(**metrics):
+    return {"cases": {"case": {"metrics": metrics, "peak_rss_mb": metrics.pop("rss", 100.0)}}}
+
+def test_compare_flags_regressions():
+    assert direction("encrypt_1mb_mb_s") == 1 and direction("login_per_s") == 1
+    assert direction("upload_1mb_p50_ms") == -1 and direction("peak_rss_mb") == -1
+    assert direction("seed_count") == 0
+
+    baseline = _report(encrypt_1mb_mb_s=800.0, upload_1mb_p50_ms=40.0, stats_p50_ms=3.0, rss=100.0)
+    same = _report(encrypt_1mb_mb_s=780.0, upload_1mb_p50_ms=45.0, stats_p50_ms=4.5, rss=104.0)
+    assert compare(baseline, same)[1] == []  # within tolerance / under the noise floor
+
+    worse = _report(encrypt_1mb_mb_s=500.0, upload_1mb_p50_ms=80.0, stats_p50_ms=3.0, rss=200.0)
+    _, regressions = compare(baseline, worse)
+    assert regressions == ["case.encrypt_1mb_mb_s", "case.peak_rss_mb", "case.upload_1mb_p50_ms"]
+    print("✅ Benchmark comparison OK")
+
+if __name__ == "__main__":
+    test_compare_flags_regressions()
@@ -0,0 +1,31 @@
+import io
+import os
+from app.services.compression import CompressingReader, available_codecs, choose_codec, decompress_stream, entropy
+from app.services.encryption import EncryptingReader, StreamDecryptor, StreamEncryptor
+
+def test_codec_choice():
+    text = b"timestamp,level,message\n" * 5000
+    upload = io.BytesIO(text)
+    assert choose_codec(upload, "app.log", "zlib") == "zlib" and upload.tell() == 0
+    assert choose_codec(io.BytesIO(text), "holiday.jpg", "zlib") is None   # by extension
+    assert choose_codec(io.BytesIO(os.urandom(100_000)), "blob.bin", "zlib") is None  # by entropy
+    assert entropy(b"aaaa") == 0.0 and entropy(bytes(range(256))) == 8.0
+    print("✅ Codec choice OK")
+
+def test_compress_encrypt_round_trip():
+    plaintext = b"".join(b"row %d,value,%d\n" % (i, i * 7) for i in range(50_000))
+    key = os.urandom(32)
+    for codec in available_codecs():
+        source = CompressingReader(io.BytesIO(plaintext), codec)
+        stored = EncryptingReader(source, StreamEncryptor(key, segment_size=4096)).read()
+        assert source.raw_bytes == len(plaintext)
+        assert len(stored) < len(plaintext) // 3
+
+        decryptor = StreamDecryptor(key, stored[:16])
+        chunks = (stored[i:i + 1000] for i in range(16, len(stored), 1000))
+        assert b"".join(decompress_stream(decryptor.decrypt_stream(chunks), codec)) == plaintext
+    print("✅ Compress + encrypt round trip OK")
+
+if __name__ == "__main__":
+    test_codec_choice()
+    test_compress_encrypt_round_trip()
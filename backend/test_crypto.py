@@ -1,5 +1,12 @@
-from app.core.crypto_utils import CryptoUtils
-from app.services.encryption import FileEncryptor
+import os
+import time
+from app.core.crypto_utils import CryptoUtils, MasterKeyCache
+import io
+from cryptography.exceptions import InvalidTag
+from app.services.encryption import (
+    FileEncryptor, StreamEncryptor, StreamDecryptor, EncryptingReader,
+    HEADER_SIZE, TAG_SIZE, BATCH_SEGMENTS, encrypted_size, plaintext_size, encrypt_chunk,
+)
 
 def test_system():
     # 1. Simulate User Inputs
@@ -29,5 +36,165 @@ def test_system():
     assert original_data == decrypted_data
     print("\n✅ SUCCESS: The Crypto Engine is working perfectly!")
 
+def test_segmented_stream():
+    key = CryptoUtils.generate_salt() * 2  # any 32 bytes will do here
+    segment = 1024
+
+    for size in (0, 1, segment - 1, segment, segment + 1, 5 * segment, 5 * segment + 7):
+        original_data = bytes(i % 251 for i in range(size))
+        reader = EncryptingReader(io.BytesIO(original_data), StreamEncryptor(key, segment_size=segment))
+        encrypted_data = reader.read()
+
+        assert reader.plaintext_bytes == size
+        assert len(encrypted_data) == encrypted_size(size, segment)
+        assert plaintext_size(len(encrypted_data), segment) == size
+        assert StreamDecryptor(key, encrypted_data).decrypt(encrypted_data) == original_data
+    print("✅ Segmented round trip OK for all sizes")
+
+def test_segmented_stream_tampering():
+    key = CryptoUtils.generate_salt() * 2
+    segment = 1024
+    enc_segment = segment + TAG_SIZE
+    original_data = b"x" * (3 * segment + 10)
+    encrypted_data = EncryptingReader(io.BytesIO(original_data), StreamEncryptor(key, segment_size=segment)).read()
+    header, body = encrypted_data[:HEADER_SIZE], encrypted_data[HEADER_SIZE:]
+    segments = [body[i:i + enc_segment] for i in range(0, len(body), enc_segment)]
+
+    tampered = {
+        "truncated": header + b"".join(segments[:2]),
+        "reordered": header + segments[1] + segments[0] + b"".join(segments[2:]),
+        "last segment dropped": header + b"".join(segments[:3]),
+    }
+    for name, data in tampered.items():
+        try:
+            StreamDecryptor(key, data).decrypt(data)
+        except InvalidTag:
+            print(f"🛡️ Rejected {name} stream")
+        else:
+            raise AssertionError(f"{name} stream was accepted")
+
+def test_key_hierarchy():
+    kek = CryptoUtils.hkdf(b"server-secret", b"ecd/kek/v1")
+    master_key = CryptoUtils.generate_key()
+    wrapped_master = CryptoUtils.wrap_key(kek, master_key)
+    assert CryptoUtils.is_wrapped(wrapped_master)
+    assert CryptoUtils.unwrap_key(kek, wrapped_master) == master_key
+
+    # Legacy File.encryption_key values (raw hex) are not mistaken for wrapped keys
+    assert not CryptoUtils.is_wrapped(CryptoUtils.generate_key().hex())
+    print("✅ Key wrap / unwrap OK")
+
+def test_master_key_cache():
+    cache = MasterKeyCache(max_size=2, ttl=0.05)
+    cache.put(1, b"a")
+    cache.put(2, b"b")
+    assert cache.get(1) == b"a"   # 1 is now most recently used
+    cache.put(3, b"c")            # evicts 2
+    assert cache.get(2) is None and cache.get(3) == b"c"
+    time.sleep(0.06)
+    assert cache.get(1) is None   # expired
+    print("✅ Master key cache LRU + TTL OK")
+
+def test_chunks_match_stream():
+    # Resumable uploads encrypt chunks independently; joined, they must equal the streamed object
+    key, prefix, seg = b"k" * 32, b"p" * 7, 1024
+    plaintext = b"0123456789abcdef" * 700  # 11,200 bytes -> 11 segments, last one short
+    chunk = 4 * seg
+    expected = b"".join(StreamEncryptor(key, seg, prefix).encrypt_stream(io.BytesIO(plaintext)))
+    last_segment = -(-len(plaintext) // seg) - 1
+    parts = {}
+    for i in (2, 0, 1):  # any order
+        parts[i] = encrypt_chunk(key, prefix, seg, i * 4, plaintext[i * chunk:(i + 1) * chunk], last_segment, i == 0)
+    assert b"".join(parts[i] for i in range(3)) == expected
+    assert StreamDecryptor(key, expected[:HEADER_SIZE]).decrypt(expected) == plaintext
+    print("✅ Chunked encryption matches the stream format")
+
+class _Reads(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+def test_parallel_segments():
+    # Segment pool: same bytes as the serial path, in order, and tampering still caught
+    key, prefix, seg = b"k" * 32, b"p" * 7, 1024
+    batch = BATCH_SEGMENTS * seg
+    for size in (0, batch, 7 * batch + 100, 40 * batch):
+        plaintext = os.urandom(size)
+        serial = b"".join(StreamEncryptor(key, seg, prefix, workers=1).encrypt_stream(io.BytesIO(plaintext)))
+        parallel = b"".join(StreamEncryptor(key, seg, prefix, workers=3).encrypt_stream(io.BytesIO(plaintext)))
+        assert parallel == serial
+        decryptor = StreamDecryptor(key, parallel, workers=3)
+        for step in (5000, 3 * batch + 17):  # unaligned network chunks, smaller and larger than a batch
+            chunks = [parallel[i:i + step] for i in range(HEADER_SIZE, len(parallel), step)]
+            assert b"".join(decryptor.decrypt_stream(chunks)) == plaintext
+
+    # Ranged: segments 9..30 of a 41-segment object
+    enc_segment = seg + TAG_SIZE
+    ranged = parallel[HEADER_SIZE + 9 * enc_segment:HEADER_SIZE + 31 * enc_segment]
+    plain = b"".join(decryptor.decrypt_stream([ranged], first_segment=9, last_segment=-(-size // seg) - 1))
+    assert plain == plaintext[9 * seg:31 * seg]
+
+    flipped = bytearray(parallel)
+    flipped[HEADER_SIZE + 20 * enc_segment] ^= 1
+    try:
+        b"".join(decryptor.decrypt_stream([bytes(flipped[HEADER_SIZE:])]))
+    except InvalidTag:
+        pass
+    else:
+        raise AssertionError("tampered segment accepted")
+    truncated = parallel[:HEADER_SIZE + 16 * enc_segment]
+    try:
+        decryptor.decrypt(truncated)
+    except InvalidTag:
+        pass
+    else:
+        raise AssertionError("truncated stream accepted")
+
+    # Bounded read ahead: taking the first segment doesn't pull the whole source
+    source = _Reads(os.urandom(200 * batch))
+    segments = StreamEncryptor(key, seg, prefix, workers=3).encrypt_stream(source)
+    next(segments), next(segments)
+    assert source.bytes_read <= (2 * 3 + 2) * batch
+    segments.close()
+    print("✅ Parallel segment crypto OK")
+
+def test_legacy_master_key_leaves_caller_session():
+    import tempfile
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from app.core.crypto_utils import KeyManager, master_key_cache
+    from app.core.database import Base
+    from app.models.user import Folder, User
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'keys.db')}")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add(User(id=1, email="a@b.c"))  # created before the key hierarchy: no master key
+        db.commit()
+
+    master_key_cache.clear()
+    with Session(engine) as db:
+        db.add(Folder(name="pending", owner_id=1, path="/"))
+        key = KeyManager.master_key(db, 1)
+        db.rollback()  # the request fails: its work goes, the new key stays
+    with Session(engine) as db:
+        assert db.query(Folder).count() == 0
+        wrapped = db.query(User.wrapped_master_key).scalar()
+    master_key_cache.clear()
+    with Session(engine) as db:
+        assert wrapped and KeyManager.master_key(db, 1) == key
+    print("✅ Legacy master key created in its own transaction")
+
 if __name__ == "__main__":
-    test_system()
\ No newline at end of file
+    test_system()
+    test_segmented_stream()
+    test_segmented_stream_tampering()
+    test_key_hierarchy()
+    test_master_key_cache()
+    test_chunks_match_stream()
+    test_parallel_segments()
+    test_legacy_master_key_leaves_caller_session()
@@ -0,0 +1,70 @@
+import asyncio
+import inspect
+import os
+import tempfile
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.api import deps
+from app.core import database
+from app.core.database import async_url, configure_sqlite, engine_options
+
+def test_engine_options():
+    assert engine_options("sqlite://") == {"connect_args": {"check_same_thread": False}}
+    file_options = engine_options("sqlite:///./x.db")
+    assert file_options["pool_size"] == database.DB_POOL_SIZE and file_options["max_overflow"] == database.DB_MAX_OVERFLOW
+    pg_options = engine_options("postgresql://u:p@db/app")
+    assert pg_options["pool_pre_ping"] and "connect_args" not in pg_options
+
+    assert async_url("sqlite:///./x.db") == "sqlite+aiosqlite:///./x.db"
+    assert engine_options(async_url("sqlite:///./x.db"))["poolclass"] is AsyncAdaptedQueuePool
+    assert async_url("postgresql://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+    print("✅ Engine options OK")
+
+def test_sqlite_pragmas():
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'wal.db')}"
+    engine = create_engine(url, **engine_options(url))
+    configure_sqlite(engine, url)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1 # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == database.SQLITE_BUSY_TIMEOUT_MS
+    print("✅ SQLite pragmas OK")
+
+def test_async_session():
+    # DATABASE_ASYNC=true against a SQLite file: same pragmas, a working AsyncSession (needs aiosqlite)
+    saved = database.SQLALCHEMY_DATABASE_URL, database.DATABASE_ASYNC
+    database.SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'async.db')}"
+    database.DATABASE_ASYNC = True
+
+    async def run():
+        agen = database.get_async_db()
+        db = await agen.__anext__()
+        try:
+            assert (await db.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            await db.execute(text("CREATE TABLE t (x INTEGER)"))
+            await db.execute(text("INSERT INTO t VALUES (42)"))
+            await db.commit()
+            assert (await db.execute(text("SELECT x FROM t"))).scalar() == 42
+            assert await db.run_sync(lambda session: session.execute(text("SELECT count(*) FROM t")).scalar()) == 1
+        finally:
+            await agen.aclose()
+        await database.dispose_async_engine()
+
+    try:
+        asyncio.run(run())
+        assert "async" not in database._engines
+    finally:
+        database.SQLALCHEMY_DATABASE_URL, database.DATABASE_ASYNC = saved
+    print("✅ Async session OK")
+
+def test_single_session_dependency():
+    # Same callable everywhere, so FastAPI hands one Session to the whole request
+    assert not hasattr(deps, "get_db") or deps.get_db is database.get_db
+    assert inspect.signature(deps.get_current_user).parameters["db"].default.dependency is database.get_db
+    print("✅ One session per request OK")
+
+if __name__ == "__main__":
+    test_engine_options()
+    test_sqlite_pragmas()
+    test_async_session()
+    test_single_session_dependency()
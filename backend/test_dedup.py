@@ -0,0 +1,63 @@
+import io
+import os
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.core.database import Base
+from app.models.user import User, File, StoredObject
+from app.services.dedup import DedupService
+
+def _db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = Session(engine)
+    db.add_all([User(id=1, email="a@b.c"), User(id=2, email="d@e.f")])
+    db.commit()
+    return db
+
+def _upload(db, owner_id, fingerprint, name):
+    shared = DedupService.acquire(db, owner_id, fingerprint)
+    if shared:
+        record = File(filename=name, owner_id=owner_id, storage_path=shared.storage_path, encryption_key=shared.encryption_key,
+                      nonce=shared.nonce, enc_version=shared.enc_version, size_bytes=shared.size_bytes, object_id=shared.id)
+        db.add(record)
+    else:
+        record = File(filename=name, owner_id=owner_id, storage_path=f"obj_{name}", encryption_key="w1:k",
+                      nonce="n", enc_version=2, size_bytes=10)
+        db.add(record)
+        DedupService.register(db, record, fingerprint)
+    db.commit()
+    return record
+
+def test_fingerprints_are_per_user():
+    data = io.BytesIO(b"skip" + os.urandom(3 * 1024 * 1024))
+    data.seek(4)
+    fp_a = DedupService.fingerprint(data, DedupService.fingerprint_key(b"a" * 32))
+    assert data.tell() == 4
+    fp_b = DedupService.fingerprint(data, DedupService.fingerprint_key(b"b" * 32))
+    assert fp_a != fp_b
+    print("✅ Per-user fingerprints OK")
+
+def test_refcounted_objects():
+    db = _db()
+    first = _upload(db, 1, "fp", "one")
+    second = _upload(db, 1, "fp", "two")
+    third = _upload(db, 1, "fp", "three")
+    other_user = _upload(db, 2, "fp", "theirs")  # same fingerprint string, still its own object
+    assert second.storage_path == first.storage_path == third.storage_path
+    assert other_user.storage_path != first.storage_path and other_user.object_id != first.object_id
+    assert db.query(StoredObject).filter(StoredObject.owner_id == 1).one().ref_count == 3
+
+    # Dropping references: the object survives until the last one goes
+    assert DedupService.release(db, first) == []
+    db.delete(first)
+    db.commit()
+    assert DedupService.release_where(db, 1, File.id.in_([second.id, third.id])) == ["obj_one"]
+    db.query(File).filter(File.id.in_([second.id, third.id])).delete(synchronize_session=False)
+    db.commit()
+    assert db.query(StoredObject).filter(StoredObject.owner_id == 1).count() == 0
+    assert db.query(StoredObject).filter(StoredObject.owner_id == 2).count() == 1
+    print("✅ Refcounted dedup OK")
+
+if __name__ == "__main__":
+    test_fingerprints_are_per_user()
+    test_refcounted_objects()
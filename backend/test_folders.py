@@ -0,0 +1,66 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from app.core.database import Base
+from app.models.user import User, File, Folder, PendingDeletion
+from app.services.folder_tree import FolderTree
+from app.services.trash import TrashService
+from app.services.usage import UsageService
+
+def _db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = Session(engine)
+    db.add(User(id=1, email="a@b.c"))
+    db.commit()
+    return db, engine
+
+def _count_queries(engine):
+    counter = {"n": 0}
+    event.listen(engine, "before_cursor_execute", lambda *a: counter.__setitem__("n", counter["n"] + 1))
+    return counter
+
+def test_subtree_operations():
+    db, engine = _db()
+    # Home > a > b > c (deep), plus a sibling d
+    a = FolderTree.create(db, 1, "a", None)
+    b = FolderTree.create(db, 1, "b", a.id)
+    c = FolderTree.create(db, 1, "c", b.id)
+    d = FolderTree.create(db, 1, "d", None)
+    assert c.path == f"/{a.id}/{b.id}/{c.id}/"
+    for folder, size in ((a, 10), (b, 20), (c, 30), (d, 40)):
+        db.add(File(filename="x.png", size_bytes=size, category="Images", owner_id=1, folder_id=folder.id,
+                    encryption_key="k", nonce="n", storage_path=f"obj{folder.id}"))
+        UsageService.record(db, 1, "Images", size, 1)
+    db.commit()
+
+    assert [crumb["name"] for crumb in FolderTree.breadcrumbs(db, 1, c.id)] == ["a", "b", "c"]
+    assert FolderTree.size(db, 1, a.id) == {"folder_id": a.id, "total_bytes": 60, "file_count": 3, "folder_count": 2}
+
+    # Move b (with c) under d: paths of the whole subtree follow
+    try:
+        FolderTree.move(db, 1, a.id, c.id)
+    except Exception as e:
+        assert e.status_code == 400
+    else:
+        raise AssertionError("moved a folder into its own subtree")
+    FolderTree.move(db, 1, b.id, d.id)
+    db.refresh(c)
+    assert c.path == f"/{d.id}/{b.id}/{c.id}/"
+    assert FolderTree.size(db, 1, d.id)["total_bytes"] == 90
+
+    # Query count does not grow with the tree
+    expected = sorted([f"obj{d.id}", f"obj{b.id}", f"obj{c.id}"])
+    queries = _count_queries(engine)
+    assert FolderTree.delete(db, 1, d.id) == 3
+    assert queries["n"] <= 15
+    # Files went to the trash (back to Home if restored); objects go when the trash is emptied
+    assert db.query(Folder).count() == 1 and db.query(File).filter(File.deleted_at.is_(None)).count() == 1
+    assert db.query(File).filter(File.deleted_at.isnot(None), File.folder_id.is_(None)).count() == 3
+    assert TrashService.purge(db, 1) == 3
+    db.commit()
+    assert sorted(p for (p,) in db.query(PendingDeletion.storage_path).all()) == expected
+    assert UsageService.summary(db, 1)["Images"] == {"bytes": 10, "stored_bytes": 10, "count": 1}
+    print("✅ Folder subtree operations OK")
+
+if __name__ == "__main__":
+    test_subtree_operations()
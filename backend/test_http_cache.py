@@ -0,0 +1,103 @@
+import os
+import tempfile
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from app.api import deps
+from app.core.database import Base, get_db
+from app.core.principal_cache import Principal
+from app.main import create_app
+from app.models.user import User, File, Folder
+from app.services.http_cache import create_listing_triggers, listing_version
+from app.services.storage import StorageBackend, set_storage
+from app.services.usage import UsageService
+
+class NoStorage(StorageBackend):
+    """Any storage access fails the test: a 304 must not touch it."""
+
+    def get_stream(self, object_name, start=None, end=None):
+        raise AssertionError("storage read on a conditional hit")
+
+    download_file = get_stream
+
+def _setup():
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'etag.db')}")
+    Base.metadata.create_all(bind=engine)
+    create_listing_triggers(engine)
+    with Session(engine) as db:
+        db.add_all([User(id=1, email="a@b.c"), User(id=2, email="d@e.f")])
+        db.commit()
+    return engine
+
+def test_version_bumps():
+    engine = _setup()
+    with Session(engine) as db:
+        assert listing_version(db, 1) == 0
+        db.add(File(id=1, filename="a.txt", owner_id=1, size_bytes=1))
+        db.commit()
+        after_insert = listing_version(db, 1)
+        assert after_insert > 0 and listing_version(db, 2) == 0
+
+        db.query(File).filter(File.id == 1).update({File.filename: "b.txt"})
+        db.commit()
+        assert listing_version(db, 1) > after_insert
+        renamed = listing_version(db, 1)
+
+        db.add(Folder(name="docs", owner_id=1, path="/"))
+        UsageService.record(db, 1, "Documents", 1, 1)
+        db.commit()
+        assert listing_version(db, 1) >= renamed + 2
+
+        # Moving a file to another owner changes both listings
+        db.query(File).filter(File.id == 1).update({File.owner_id: 2})
+        db.commit()
+        assert listing_version(db, 2) == 1
+    print("✅ Listing version triggers OK")
+
+def test_conditional_requests():
+    engine = _setup()
+    SessionFactory = sessionmaker(bind=engine)
+    with Session(engine) as db:
+        db.add(File(id=1, filename="a.txt", owner_id=1, size_bytes=1, category="Documents",
+                    nonce="00" * 12, storage_path="obj1", enc_version=2))
+        db.commit()
+
+    def session():
+        db = SessionFactory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = create_app()
+    app.dependency_overrides[get_db] = session
+    app.dependency_overrides[deps.get_current_user] = lambda: Principal(1, "a@b.c", "A")
+    set_storage(NoStorage())
+    try:
+        client = TestClient(app)
+        for path in ("/files", "/folders/content", "/files/stats"):
+            first = client.get(path)
+            assert first.status_code == 200 and first.headers["cache-control"] == "private, no-cache"
+            again = client.get(path, headers={"If-None-Match": first.headers["etag"]})
+            assert again.status_code == 304 and again.content == b""
+            assert again.headers["etag"] == first.headers["etag"]
+        # Another page of the same listing is another representation
+        etag = client.get("/files").headers["etag"]
+        assert client.get("/files", params={"limit": 1}, headers={"If-None-Match": etag}).status_code == 200
+
+        # Any write to the user's files invalidates the tag
+        with Session(engine) as db:
+            db.query(File).filter(File.id == 1).update({File.filename: "renamed.txt"})
+            db.commit()
+        assert client.get("/files", headers={"If-None-Match": etag}).status_code == 200
+
+        # Downloads revalidate against the nonce without reading storage
+        download = client.get("/files/1/download", headers={"If-None-Match": 'W/"other", "' + "00" * 12 + '"'})
+        assert download.status_code == 304 and download.headers["etag"] == '"' + "00" * 12 + '"'
+    finally:
+        set_storage(None)
+    print("✅ ETag / If-None-Match OK")
+
+if __name__ == "__main__":
+    test_version_bumps()
+    test_conditional_requests()
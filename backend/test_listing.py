@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.core.database import Base
+from app.models.user import User, File, Folder
+from app.services.listing import ListingService
+from app.schemas.file import FileShow
+
+def _db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = Session(engine)
+    db.add_all([User(id=1, email="a@b.c"), User(id=2, email="d@e.f")])
+    start = datetime(2024, 1, 1)
+    for i in range(25):
+        db.add(File(filename=f"f{i % 7}.txt", size_bytes=(i * 37) % 11, upload_date=start + timedelta(minutes=i % 5),
+                    owner_id=1, folder_id=None if i % 2 else 1, encryption_key="k", nonce="n", storage_path=str(i)))
+    db.add(File(filename="other.txt", size_bytes=1, owner_id=2, encryption_key="k", nonce="n", storage_path="x"))
+    db.add_all([Folder(id=1, name="b", owner_id=1), Folder(id=2, name="a", owner_id=1), Folder(id=3, name="c", owner_id=2)])
+    db.commit()
+    return db
+
+def _walk(fetch, limit):
+    seen, cursor = [], None
+    while True:
+        rows, cursor = fetch(cursor, limit)
+        seen.extend(rows)
+        if cursor is None:
+            return seen
+
+def test_keyset_pages_match_full_sort():
+    db = _db()
+    for sort, column in (("name", "filename"), ("date", "upload_date"), ("size", "size_bytes")):
+        for order in ("asc", "desc"):
+            rows = _walk(lambda c, n: ListingService.files(db, 1, sort, order, n, c), 4)
+            expected = sorted(rows, key=lambda r: (getattr(r, column), r.id), reverse=order == "desc")
+            assert [r.id for r in rows] == [r.id for r in expected]
+            assert len(rows) == 25 and len({r.id for r in rows}) == 25
+
+    in_root = _walk(lambda c, n: ListingService.files(db, 1, "name", "asc", n, c, folder_id=None, all_folders=False), 3)
+    assert len(in_root) == 12 and all(r.folder_id is None for r in in_root)
+    folders, cursor = ListingService.folders(db, 1, None, "name", "asc", 10)
+    assert [f.name for f in folders] == ["a", "b"] and cursor is None
+    print("✅ Keyset pagination OK")
+
+def test_listing_rows_carry_no_key_material():
+    db = _db()
+    rows, _ = ListingService.files(db, 1, "date", "desc", 1)
+    shown = FileShow.model_validate(rows[0]).model_dump()
+    assert "encryption_key" not in shown and "nonce" not in shown and "storage_path" not in shown
+    print("✅ Lean listing rows OK")
+
+if __name__ == "__main__":
+    test_keyset_pages_match_full_sort()
+    test_listing_rows_carry_no_key_material()
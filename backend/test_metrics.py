@@ -0,0 +1,96 @@
+import logging
+import tempfile
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from app.core.metrics import (
+    Histogram, MetricsMiddleware, REQUEST_QUERIES, REQUEST_SECONDS, STAGE_SECONDS, STORAGE_BYTES, slow_request_log, span,
+)
+from app.services.local_storage import LocalStorage
+from app.services.storage import MeteredStorage
+
+def test_histogram_text_format():
+    h = Histogram("t_seconds", "help", ("route",), buckets=(0.1, 1.0))
+    h.observe(0.05, "/a")
+    h.observe(0.5, "/a")
+    h.observe(5, "/a")
+    lines = list(h.render())
+    assert 't_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 't_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 't_seconds_count{route="/a"} 3' in lines
+    print("✅ Histogram format OK")
+
+def test_request_trace():
+    engine = create_engine("sqlite://")
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, slow_request_ms=0)
+
+    @app.get("/work/{item_id}")
+    def work(item_id: int):
+        with span("outer"):
+            time.sleep(0.02)
+            with span("inner"):
+                time.sleep(0.02)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return {"id": item_id}
+
+    before = REQUEST_SECONDS.count("GET", "/work/{item_id}", "200")
+    assert TestClient(app).get("/work/7").json() == {"id": 7}
+
+    # Labelled by route template; nested time is not counted twice
+    assert REQUEST_SECONDS.count("GET", "/work/{item_id}", "200") == before + 1
+    assert REQUEST_QUERIES.count("/work/{item_id}") >= 1
+    outer = STAGE_SECONDS._series[("outer",)][-1]
+    inner = STAGE_SECONDS._series[("inner",)][-1]
+    assert 0.015 < outer < 0.035 and 0.015 < inner < 0.035
+    print("✅ Request trace OK")
+
+def test_metered_storage():
+    storage = MeteredStorage(LocalStorage(tempfile.mkdtemp()))
+    written, read = STORAGE_BYTES.value("write"), STORAGE_BYTES.value("read")
+    storage.upload_file(b"x" * 1000, "a")
+    chunks, size = storage.get_stream("a")
+    assert size == 1000 and b"".join(chunks) == b"x" * 1000
+    assert STORAGE_BYTES.value("write") - written == 1000
+    assert STORAGE_BYTES.value("read") - read == 1000
+    assert storage.root  # passes through to the backend
+    print("✅ Metered storage OK")
+
+class _Records(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def test_slow_request_log():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, slow_request_ms=5)
+
+    @app.get("/slow")
+    def slow():
+        with span("work"):
+            time.sleep(0.01)
+        return {}
+
+    handler = _Records()
+    slow_request_log.addHandler(handler)
+    try:
+        TestClient(app).get("/slow")
+    finally:
+        slow_request_log.removeHandler(handler)
+    [record] = handler.records
+    assert record.levelno == logging.WARNING and record.route == "/slow" and record.duration_ms >= 10
+    assert "work" in record.stages_ms
+    print("✅ Slow request log OK")
+
+if __name__ == "__main__":
+    test_histogram_text_format()
+    test_request_trace()
+    test_metered_storage()
+    test_slow_request_log()
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import threading
+import time
+from app.services.local_storage import LocalStorage
+from app.services.object_cache import CachingStorage
+
+class SlowCountingStorage(LocalStorage):
+    """Stands in for S3: counts GETs and makes them slow enough to overlap."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.gets = 0
+
+    def get_stream(self, object_name, start=None, end=None):
+        self.gets += 1
+        time.sleep(0.05)
+        return super().get_stream(object_name, start, end)
+
+def make_cache(max_bytes=10_000):
+    backend = SlowCountingStorage(tempfile.mkdtemp())
+    return backend, CachingStorage(backend, tempfile.mkdtemp(), max_bytes=max_bytes)
+
+def test_hit_miss_and_ranges():
+    backend, cache = make_cache()
+    backend.upload_file(b"0123456789" * 100, "a")
+
+    chunks, size = cache.get_stream("a")
+    assert size == 1000 and b"".join(chunks) == b"0123456789" * 100
+    assert cache.download_file("a") == b"0123456789" * 100
+    chunks, size = cache.get_stream("a", 5, 14)
+    assert size == 1000 and b"".join(chunks) == b"5678901234"
+    assert backend.gets == 1
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["bytes"] == 1000
+    print("✅ Object cache hit / miss OK")
+
+def test_single_flight():
+    backend, cache = make_cache()
+    backend.upload_file(b"x" * 5000, "a")
+    results = []
+
+    def read():
+        chunks, _ = cache.get_stream("a")
+        results.append(b"".join(chunks))
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [b"x" * 5000] * 8
+    assert backend.gets == 1
+    print("✅ Object cache single flight OK")
+
+def test_eviction_and_invalidation():
+    backend, cache = make_cache(max_bytes=2500)
+    for name in ("a", "b", "c"):
+        backend.upload_file(name.encode() * 1000, name)
+        cache.download_file(name)
+    # "a" was least recently used
+    assert cache.stats()["evictions"] == 1 and cache.stats()["bytes"] == 2000
+    assert cache.download_file("a") == b"a" * 1000 and backend.gets == 4
+
+    cache.delete_file("a")
+    assert not os.path.exists(backend._path("a"))
+    assert cache.stats()["invalidations"] == 1
+    # Restart: the index comes back from disk
+    assert CachingStorage(backend, cache.root, max_bytes=2500).stats()["entries"] == cache.stats()["entries"]
+    print("✅ Object cache eviction / invalidation OK")
+
+def test_shared_directory():
+    # Two workers over one directory: the cap holds for the directory, not per worker
+    backend, first = make_cache(max_bytes=2500)
+    second = CachingStorage(backend, first.root, max_bytes=2500, scan_interval=0)
+    for name in "abc":
+        backend.upload_file(name.encode() * 1000, name)
+    first.download_file("a")
+    first.download_file("b")
+    assert second.download_file("a") == b"a" * 1000 and backend.gets == 2  # filled by the other worker
+    second.download_file("c")  # rescans: "b" is the oldest in the directory
+    assert sum(os.path.getsize(os.path.join(first.root, f)) for f in os.listdir(first.root) if not f.startswith(".")) <= 2500
+    assert first.download_file("b") == b"b" * 1000 and backend.gets == 4  # evicted by the other worker: a miss
+    print("✅ Object cache shared directory OK")
+
+if __name__ == "__main__":
+    test_hit_miss_and_ranges()
+    test_single_flight()
+    test_eviction_and_invalidation()
+    test_shared_directory()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.core.database import Base
+from app.models.user import UploadSession, User
+from app.services.downloads import plaintext_stream
+from app.core.crypto_utils import KeyManager
+from app.services.local_storage import LocalStorage
+from app.services.resumable import ResumableUploads
+from app.services.storage import set_storage
+
+def _setup():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    set_storage(LocalStorage(tempfile.mkdtemp()))
+    db = Session(engine)
+    db.add(User(id=1, email="a@b.c"))
+    db.commit()
+    return db
+
+def _conflict(fn, *args) -> bool:
+    try:
+        fn(*args)
+    except HTTPException as e:
+        return e.status_code == 409
+    return False
+
+def test_resend_must_match():
+    db = _setup()
+    try:
+        data = os.urandom(1000)
+        upload = ResumableUploads.create(db, 1, "a.bin", len(data))
+        ResumableUploads.put_chunk(db, upload, 0, data)
+        ResumableUploads.put_chunk(db, upload, 0, data)  # lost response: same bytes again is fine
+        # Other bytes under the same segment nonces would break AES-GCM
+        assert _conflict(ResumableUploads.put_chunk, db, upload, 0, os.urandom(1000))
+        assert ResumableUploads.received(db, upload) == [0]
+
+        new_file = ResumableUploads.complete(db, upload)
+        assert b"".join(plaintext_stream(new_file, KeyManager.file_key(db, new_file))) == data
+    finally:
+        set_storage(None)
+    print("✅ Resumable chunk re-sends OK")
+
+def test_no_chunks_after_complete():
+    db = _setup()
+    try:
+        upload = ResumableUploads.create(db, 1, "b.bin", 10)
+        try:
+            ResumableUploads.complete(db, upload)
+        except HTTPException as e:
+            assert e.status_code == 400
+        assert db.get(UploadSession, upload.id).status == "open"  # missing chunk: claim released
+
+        # complete() has claimed the session in another request: the chunk is refused before it is staged
+        db.query(UploadSession).filter(UploadSession.id == upload.id).update({UploadSession.status: "completing"})
+        db.commit()
+        assert _conflict(ResumableUploads.put_chunk, db, upload, 0, b"x" * 10)
+        assert ResumableUploads.received(db, upload) == []
+    finally:
+        set_storage(None)
+    print("✅ Chunks refused once completing OK")
+
+def test_segment_size_fixed_per_session():
+    import app.services.resumable as resumable
+    db = _setup()
+    saved = resumable.SEGMENT_SIZE
+    try:
+        data = os.urandom(resumable.CHUNK_SIZE + 1000)
+        upload = ResumableUploads.create(db, 1, "c.bin", len(data))
+        ResumableUploads.put_chunk(db, upload, 0, data[:upload.chunk_size])
+        # Restarted with another ENCRYPTION_SEGMENT_SIZE halfway through the upload
+        resumable.SEGMENT_SIZE = saved * 2
+        ResumableUploads.put_chunk(db, upload, 1, data[upload.chunk_size:])
+        new_file = ResumableUploads.complete(db, upload)
+        assert b"".join(plaintext_stream(new_file, KeyManager.file_key(db, new_file))) == data
+    finally:
+        resumable.SEGMENT_SIZE = saved
+        set_storage(None)
+    print("✅ Segment size fixed per session OK")
+
+if __name__ == "__main__":
+    test_resend_must_match()
+    test_no_chunks_after_complete()
+    test_segment_size_fixed_per_session()
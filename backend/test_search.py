@@ -0,0 +1,94 @@
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.core.database import Base
+from app.models.user import User, File, Folder
+from app.services.search import SearchService, create_search_index
+
+def _setup():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add_all([User(id=1, email="a@b.c", hashed_password="x"), User(id=2, email="d@e.f", hashed_password="x")])
+        # Existing rows are indexed when the index is created
+        db.add(File(filename="Quarterly Report.pdf", file_type="application/pdf", owner_id=1))
+        db.commit()
+    create_search_index(engine)
+    return engine
+
+def _names(db, owner_id, q, **kwargs):
+    items, _, _ = SearchService.search(db, owner_id, q, **kwargs)
+    return [item["name"] for item in items]
+
+def test_search_sync_and_scope():
+    engine = _setup()
+    with Session(engine) as db:
+        folder = Folder(name="Reports 2024", owner_id=1, path="/")
+        db.add_all([
+            folder,
+            File(filename="report-draft.docx", file_type="application/msword", owner_id=1),
+            File(filename="holiday.jpg", file_type="image/jpeg", owner_id=1),
+            File(filename="report.txt", file_type="text/plain", owner_id=2),
+        ])
+        db.commit()
+
+        assert set(_names(db, 1, "REPORT")) == {"Quarterly Report.pdf", "report-draft.docx", "Reports 2024"}
+        assert _names(db, 2, "report") == ["report.txt"]  # owner-scoped
+        assert _names(db, 1, "jpeg") == ["holiday.jpg"]  # file types too
+        assert _names(db, 1, "report pdf") == ["Quarterly Report.pdf"]
+        assert _names(db, 1, "report dr") == ["report-draft.docx"]  # short terms filter the indexed match
+        assert _names(db, 1, "report", kind="folders") == ["Reports 2024"]
+
+        # Rename, delete
+        db.query(File).filter(File.filename == "holiday.jpg").update({File.filename: "beach report.jpg"})
+        db.query(Folder).filter(Folder.id == folder.id).delete()
+        db.commit()
+        assert "beach report.jpg" in _names(db, 1, "report")
+        assert "Reports 2024" not in _names(db, 1, "report")
+        assert _names(db, 1, "holiday") == []
+    print("✅ Search index sync + scoping OK")
+
+def test_search_pagination():
+    engine = _setup()
+    with Session(engine) as db:
+        db.add_all([File(filename=f"invoice-{i:03}.pdf", file_type="application/pdf", owner_id=1) for i in range(25)])
+        db.commit()
+        seen, cursor = [], None
+        while True:
+            items, cursor, truncated = SearchService.search(db, 1, "invoice", limit=10, cursor=cursor)
+            assert not truncated
+            seen += [item["id"] for item in items]
+            if cursor is None:
+                break
+        assert len(seen) == len(set(seen)) == 25
+
+        for bad in ({"q": " "}, {"q": "x", "kind": "nope"}, {"q": "x", "cursor": "garbage"}):
+            try:
+                SearchService.search(db, 1, **bad)
+                assert False, bad
+            except HTTPException as e:
+                assert e.status_code == 400
+    print("✅ Search pagination OK")
+
+def test_search_truncated():
+    import app.services.search as search
+    engine = _setup()
+    saved = search.SEARCH_CANDIDATES
+    search.SEARCH_CANDIDATES = 5
+    try:
+        with Session(engine) as db:
+            db.add_all([File(filename=f"memo-{i}.txt", file_type="text/plain", owner_id=1) for i in range(6)])
+            db.commit()
+            items, _, truncated = SearchService.search(db, 1, "memo")
+            assert truncated and len(items) == 5
+            assert {item["name"] for item in items} == {f"memo-{i}.txt" for i in range(1, 6)}  # newest
+            _, _, truncated = SearchService.search(db, 1, "memo-5")
+            assert not truncated
+    finally:
+        search.SEARCH_CANDIDATES = saved
+    print("✅ Search truncation flag OK")
+
+if __name__ == "__main__":
+    test_search_sync_and_scope()
+    test_search_pagination()
+    test_search_truncated()
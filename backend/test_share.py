@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from app.core.database import Base
+from app.models.user import User, File, SharedLink
+from app.services.bulk import BulkService
+from app.services.share_links import ShareLinks, share_link_cache
+
+def _count_queries(engine):
+    counter = {"n": 0}
+    event.listen(engine, "before_cursor_execute", lambda *a: counter.__setitem__("n", counter["n"] + 1))
+    return counter
+
+def _status(call):
+    try:
+        call()
+    except HTTPException as e:
+        return e.status_code
+    return 200
+
+def test_share_lookup_and_tokens():
+    share_link_cache.clear()
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add(User(id=1, email="a@b.c", hashed_password="x"))
+        f = File(filename="a.txt", size="1 B", size_bytes=1, owner_id=1, encryption_key="k", nonce="n", storage_path="a")
+        db.add(f)
+        db.flush()
+        db.add_all([
+            SharedLink(file_id=f.id, unique_hash="open", password_hash=None),
+            SharedLink(file_id=f.id, unique_hash="locked", password_hash="bcrypt-hash"),
+            SharedLink(file_id=f.id, unique_hash="old", expires_at=datetime.utcnow() - timedelta(minutes=1)),
+        ])
+        db.commit()
+
+        # Link + file in one query, then served from the cache
+        queries = _count_queries(engine)
+        link = ShareLinks.lookup(db, "locked")
+        assert link.filename == "a.txt" and link.storage_path == "a"
+        assert ShareLinks.lookup(db, "locked") is link
+        assert queries["n"] == 1
+        assert _status(lambda: ShareLinks.lookup(db, "nope")) == 404
+        assert _status(lambda: ShareLinks.lookup(db, "old")) == 410
+
+        # Tokens are bound to the link and expire
+        token, expires_in = ShareLinks.issue_token(link)
+        assert 0 < expires_in <= 600
+        assert ShareLinks.check_token(link, token)
+        assert not ShareLinks.check_token(ShareLinks.lookup(db, "open"), token)
+        assert not ShareLinks.check_token(link, token[:-2] + "AA")
+        assert not ShareLinks.check_token(link, "1." + token.split(".", 1)[1])
+        assert not ShareLinks.check_token(link, None)
+
+        # Deleting the file drops its cached links
+        BulkService.delete_where(db, 1, File.id == f.id)
+        db.commit()
+        assert _status(lambda: ShareLinks.lookup(db, "locked")) == 404
+    print("✅ Share links OK")
+
+if __name__ == "__main__":
+    test_share_lookup_and_tokens()
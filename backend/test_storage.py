@@ -0,0 +1,62 @@
+import io
+import os
+import tempfile
+from fastapi import HTTPException
+from app.services.local_storage import LocalStorage
+
+def test_local_storage_round_trip():
+    storage = LocalStorage(tempfile.mkdtemp(), fsync="always")
+    payload = os.urandom(700_000)
+
+    storage.upload_stream(io.BytesIO(payload), "enc_abc_report.pdf")
+    assert storage.download_file("enc_abc_report.pdf") == payload
+
+    chunks, total = storage.get_stream("enc_abc_report.pdf", 1000, 299_999)
+    assert total == len(payload)
+    assert b"".join(chunks) == payload[1000:300_000]
+
+    # Real files are copied with sendfile, from their current offset
+    with tempfile.TemporaryFile() as f:
+        f.write(b"skip" + payload)
+        f.seek(4)
+        storage.upload_stream(f, "copied")
+    assert storage.download_file("copied") == payload
+
+    storage.delete_files(["enc_abc_report.pdf", "copied", "never-existed"])
+    try:
+        storage.download_file("copied")
+    except HTTPException as e:
+        assert e.status_code == 404
+    else:
+        raise AssertionError("deleted object is still readable")
+    # Only the temp dir remains: writes were renamed into place, nothing leaked
+    assert os.listdir(storage.root) == [".tmp"] and not os.listdir(storage.tmp_dir)
+    print("✅ Local storage round trip OK")
+
+def test_local_storage_keys_stay_inside_root():
+    root = tempfile.mkdtemp()
+    storage = LocalStorage(os.path.join(root, "objects"))
+    storage.upload_file(b"x", "../../escape")
+    storage.upload_file(b"y", "..")
+    assert sorted(os.listdir(root)) == ["objects"]
+    assert storage.download_file("../../escape") == b"x"
+
+def test_local_storage_multipart():
+    storage = LocalStorage(tempfile.mkdtemp())
+    upload_id = storage.create_multipart("staged")
+    etags = {n: storage.upload_part("staged", upload_id, n, bytes([n]) * 1000) for n in (3, 1, 2)}
+    storage.upload_part("staged", upload_id, 2, b"re-sent")  # replaces part 2
+    storage.complete_multipart("staged", upload_id, [(n, etags[n]) for n in (1, 2, 3)])
+    assert storage.download_file("staged") == b"\x01" * 1000 + b"re-sent" + b"\x03" * 1000
+    assert not os.listdir(storage.parts_dir)
+
+    aborted = storage.create_multipart("never")
+    storage.upload_part("never", aborted, 1, b"x")
+    storage.abort_multipart("never", aborted)
+    assert not os.listdir(storage.parts_dir)
+    print("✅ Local multipart staging OK")
+
+if __name__ == "__main__":
+    test_local_storage_round_trip()
+    test_local_storage_keys_stay_inside_root()
+    test_local_storage_multipart()
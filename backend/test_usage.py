@@ -0,0 +1,50 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.core.database import Base
+from app.models.user import User, File
+from app.services.usage import UsageService
+from app.utils.file_types import categorize, format_size, parse_size
+
+def test_size_helpers():
+    assert categorize("Holiday.JPG") == "Images"
+    assert categorize("notes") == "Others"
+    assert format_size(5 * 1024 * 1024) == "5.00 MB"
+    assert parse_size(format_size(2048)) == 2048
+    assert parse_size(None) == 0
+    print("✅ Size helpers OK")
+
+def test_usage_totals_follow_deltas():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add(User(id=1, email="a@b.c", hashed_password="x"))
+        db.commit()
+
+        UsageService.record(db, 1, "Images", 1000, 1)
+        UsageService.record(db, 1, "Images", 500, 1)
+        UsageService.record(db, 1, "Documents", 900, 1, delta_stored=300)
+        UsageService.record(db, 1, "Audio", 50, 1)
+        UsageService.record(db, 1, "Images", -1000, -1)
+        db.commit()
+        summary = UsageService.summary(db, 1)
+        assert summary["Images"] == {"bytes": 500, "stored_bytes": 500, "count": 1}
+        assert summary["Audio"] == {"bytes": 50, "stored_bytes": 50, "count": 1}
+        assert summary["Videos"] == {"bytes": 0, "stored_bytes": 0, "count": 0}
+        assert summary["Documents"] == {"bytes": 900, "stored_bytes": 300, "count": 1}
+
+        # Rebuild recomputes from the files table
+        db.add_all([
+            File(filename="a.png", size_bytes=10, category="Images", owner_id=1, encryption_key="k", nonce="n", storage_path="a"),
+            File(filename="b.pdf", size_bytes=20, stored_bytes=8, codec="zlib", category="Documents", owner_id=1, encryption_key="k", nonce="n", storage_path="b"),
+        ])
+        db.commit()
+        UsageService.rebuild(db)
+        summary = UsageService.summary(db, 1)
+        assert summary["Images"] == {"bytes": 10, "stored_bytes": 10, "count": 1}
+        assert summary["Documents"] == {"bytes": 20, "stored_bytes": 8, "count": 1}
+        assert summary["Audio"] == {"bytes": 0, "stored_bytes": 0, "count": 0}
+    print("✅ Usage totals OK")
+
+if __name__ == "__main__":
+    test_size_helpers()
+    test_usage_totals_follow_deltas()
@@ -17,6 +17,8 @@ const Dashboard = () => {
   // DATA STATES
   const [files, setFiles] = useState([]);
   const [folders, setFolders] = useState([]); 
+  const [nextCursor, setNextCursor] = useState(null); // more files to fetch
+  const [nextFolderCursor, setNextFolderCursor] = useState(null); // more subfolders to fetch
   const [stats, setStats] = useState(null); 
   const [currentFolder, setCurrentFolder] = useState(null); 
   const [breadcrumbs, setBreadcrumbs] = useState([{ id: null, name: 'Home' }]); 
@@ -24,6 +26,7 @@ const Dashboard = () => {
   // UI STATES
   const [isLoading, setIsLoading] = useState(true);
   const [isUploading, setIsUploading] = useState(false);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
   const [isDragging, setIsDragging] = useState(false);
   
@@ -53,16 +56,37 @@ const Dashboard = () => {
       const data = await fetchFolderContent(currentFolder);
       setFiles(data?.files || []);
       setFolders(data?.folders || []);
+      setNextCursor(data?.next_cursor || null);
+      setNextFolderCursor(data?.next_folder_cursor || null);
     } catch (err) {
       console.error(err);
       toast.error("Failed to load content");
       setFiles([]);
       setFolders([]);
+      setNextCursor(null);
+      setNextFolderCursor(null);
     } finally {
       setIsLoading(false);
     }
   };
 
+  // The listing comes in pages: append the next one
+  const loadMore = async () => {
+    setIsLoadingMore(true);
+    try {
+      const data = await fetchFolderContent(currentFolder, { cursor: nextCursor, folderCursor: nextFolderCursor });
+      setFiles([...files, ...(data?.files || [])]);
+      setFolders([...folders, ...(data?.folders || [])]);
+      if (nextCursor) setNextCursor(data?.next_cursor || null);
+      if (nextFolderCursor) setNextFolderCursor(data?.next_folder_cursor || null);
+    } catch (err) {
+      console.error(err);
+      toast.error("Failed to load more");
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const loadStats = async () => {
     try {
       const data = await fetchStorageStats();
@@ -292,6 +316,13 @@ const Dashboard = () => {
               )}
             </tbody>
           </table>
+          {!isLoading && (nextCursor || nextFolderCursor) && (
+            <div className="flex justify-center py-4 border-t border-architect-steel/10">
+              <button onClick={loadMore} disabled={isLoadingMore} className="text-sm font-bold text-architect-navy dark:text-architect-ice px-4 py-2 rounded-xl flex items-center gap-2 hover:bg-black/5 dark:hover:bg-white/10 transition-all">
+                {isLoadingMore && <Loader2 className="w-4 h-4 animate-spin" />} {isLoadingMore ? "Loading..." : "Load more"}
+              </button>
+            </div>
+          )}
         </motion.div>
         
         <ShareModal file={fileToShare} isOpen={isShareOpen} onClose={() => setIsShareOpen(false)} />
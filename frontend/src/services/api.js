@@ -47,9 +47,11 @@ export const loginUser = async (email, password) => {
 
 // --- FOLDER FUNCTIONS ---
 
-export const fetchFolderContent = async (folderId = null) => {
+// One page of a folder: { folders, files, next_folder_cursor, next_cursor }.
+// Pass the cursors of the previous page to get the next one.
+export const fetchFolderContent = async (folderId = null, { cursor = null, folderCursor = null } = {}) => {
   const response = await api.get('/folders/content', {
-    params: { folder_id: folderId } 
+    params: { folder_id: folderId, cursor: cursor || undefined, folder_cursor: folderCursor || undefined }
   });
   return response.data;
 };
@@ -64,8 +66,9 @@ export const createFolder = async (name, parentId = null) => {
 
 // --- FILE FUNCTIONS ---
 
-export const fetchFiles = async () => {
-  const response = await api.get('/files');
+// One page of all files: { items, next_cursor }
+export const fetchFiles = async (cursor = null) => {
+  const response = await api.get('/files', { params: { cursor: cursor || undefined } });
   return response.data;
 };
 